@@ -1,74 +1,468 @@
-import random
 from PIL import Image
-import math
 from steganography import ForwardSteganography, BackwardSteganography, dec_2_bin, TERMINATION_SEQUENCE, \
-    bin_2_dec, FileTooLargeException
+    bin_2_dec, FileTooLargeException, SteganograpyException, ChecksumMismatch, BadLengthHeader, pack_length_header, \
+    LENGTH_HEADER_SIZE, CHECKSUM_SIZE, get_channel_depth, get_recommended_encoding, get_recommended_encoding_for_size
+from bytes_steganography import BytesForwardSteganography, BytesBackwardSteganography
+from batch import encode_batch, decode_batch
+from sharding import encode_sharded, decode_sharded
+from cache import DecodeCache, MemoryCacheStorage, DiskCacheStorage
+from compression import register_codec, compress_payload, decompress_payload, AUTO
+from header import Config, NoConfigHeader, read_config_header, write_config_header, get_config_header_pixels
+from output import save_image, image_to_bytes, LOSSLESS_FORMATS, FAST_COMPRESS_LEVEL, DEFAULT_COMPRESS_LEVEL, \
+    BEST_COMPRESS_LEVEL, DEFAULT_STRATEGY
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def encode(image, encode_data, color_bits=None, forward=True):
+NUMPY_BACKEND = 'numpy'
+PYTHON_BACKEND = 'python'
+
+# The forward and backward encoder classes of each installed backend, by name
+backends = {PYTHON_BACKEND: (BytesForwardSteganography, BytesBackwardSteganography)}
+
+if numpy is not None:
+    from numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+    from parallel import ParallelForwardSteganography, ParallelBackwardSteganography
+    from keyed import KeyedForwardSteganography, KeyedBackwardSteganography
+    from scanline import open_scanline_image
+    from mapped import MappedImage, open_mapped_image
+    backends[NUMPY_BACKEND] = (NumpyForwardSteganography, NumpyBackwardSteganography)
+
+
+def encode(image, encode_data, color_bits=None, forward=True, length_prefixed=False, workers=1, compression=None,
+           config_header=False, key=None, checksum=False, backend=None):
     """
     Encode text data into an image file.
     :param image: A PIL image object of the Image to encode data into
     :param encode_data: a string of the data to encode into the image
-    :param color_bits: [red_bits, green_bits, blue_bits] where each value describes the number of
-    that color's bits to use for data encoding
+    :param color_bits: the number of bits of each of the image's channels to use for data encoding, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
     :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
     or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: if True put a header with the data length before the data instead of
+    ending it with the termination sequence, so the data may contain the termination sequence
+    :param workers: the number of processes to split the image between, or None for one per CPU
+    :param compression: the name of a codec to compress the data with first, or AUTO to use
+    whichever codec makes it smallest, if any. The codec is recorded with the data.
+    :param config_header: if True record the encoding policy in a header in the first pixels, so
+    the data can be decoded without knowing it
+    :param key: if given, scatter the data over the pixels in an order chosen by this string rather
+    than in raster order. The same key is needed to decode it, and workers are not used.
+    :param checksum: if True put a CRC-32 of the data after it, so decoding checks it and verify can
+    check the image without decoding the data
+    :param backend: the backend to encode with, NUMPY_BACKEND or PYTHON_BACKEND, or None to use numpy
+    if it is installed. Every backend gives the same image.
     :return: A tuple with two items. A PIL Image object that has the data encoded into the image.
     And the color_bits encoding used to encode that image  i.e. (image, color_bits)
     """
 
+    if compression is not None:
+        # Compressed here rather than by the encoder so the recommended encoding fits the compressed size
+        encode_data = compress_payload(encode_data, compression, None if length_prefixed else TERMINATION_SEQUENCE)
+    header_pixels = get_config_header_pixels(len(image.getbands())) if config_header else 0
     if color_bits is None:
-        color_bits = get_recommended_encoding(encode_data, image, TERMINATION_SEQUENCE)
+        framing_size = (LENGTH_HEADER_SIZE if length_prefixed else len(TERMINATION_SEQUENCE)) + \
+            (CHECKSUM_SIZE if checksum else 0)
+        color_bits = get_recommended_encoding_for_size(len(encode_data) + framing_size, image, header_pixels)
+
+    encoder = get_encoder(color_bits, forward, length_prefixed, workers, key=key, checksum=checksum, backend=backend)
+    encoder.pixel_offset = header_pixels
+    out_image = encoder.encode(encode_data, image)
+    if config_header:
+        write_config_header(out_image, Config(color_bits, forward, length_prefixed, compression is not None,
+                                              key is not None, checksum))
+    return (out_image, color_bits)
 
-    if forward:
-        encoder = ForwardSteganography(color_bits)
-    else:
-        encoder = BackwardSteganography(color_bits)
 
-    return (encoder.encode(encode_data, image), color_bits)
+def encode_to(image, encode_data, fp, color_bits=None, forward=True, length_prefixed=False, format='PNG',
+              compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False, strategy=DEFAULT_STRATEGY, compression=None,
+              config_header=False, key=None, checksum=False, backend=None):
+    """
+    Encode text data into an image file and write it straight to a file.
+    :param image: A PIL image object of the Image to encode data into
+    :param encode_data: a string of the data to encode into the image
+    :param fp: a file name or a file object opened for writing in binary mode
+    :param color_bits: the number of bits of each of the image's channels to use for data encoding, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: if True put a header with the data length before the data instead of
+    ending it with the termination sequence, so the data may contain the termination sequence
+    :param format: the image format to write, one of LOSSLESS_FORMATS
+    :param compress_level: the PNG zlib compression level, FAST_COMPRESS_LEVEL to BEST_COMPRESS_LEVEL
+    :param optimize: if True search for the smallest PNG, which is much slower
+    :param strategy: the PNG zlib compression strategy
+    :param compression: the codec to compress the data with, see encode
+    :param config_header: if True record the encoding policy in the image, see encode
+    :param key: the key to scatter the data with, see encode
+    :param checksum: if True put a checksum after the data, see encode
+    :param backend: the backend to encode with, see encode
+    :return: the color_bits encoding used to encode the image
+    """
+    out_image, color_bits = encode(image, encode_data, color_bits, forward, length_prefixed,
+                                   compression=compression, config_header=config_header, key=key,
+                                   checksum=checksum, backend=backend)
+    save_image(out_image, fp, format, compress_level, optimize, strategy)
+    return color_bits
 
 
-def decode(im_dec, color_bits=None, forward=True):
+def encode_to_bytes(image, encode_data, color_bits=None, forward=True, length_prefixed=False, format='PNG',
+                    compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False, strategy=DEFAULT_STRATEGY,
+                    compression=None, config_header=False, key=None, checksum=False, backend=None):
+    """
+    Encode text data into an image file, see encode_to
+    :return: A tuple with two items. A string of the encoded image file.
+    And the color_bits encoding used to encode that image  i.e. (image_bytes, color_bits)
+    """
+    out_image, color_bits = encode(image, encode_data, color_bits, forward, length_prefixed,
+                                   compression=compression, config_header=config_header, key=key,
+                                   checksum=checksum, backend=backend)
+    return (image_to_bytes(out_image, format, compress_level, optimize, strategy), color_bits)
+
+
+def decode(im_dec, color_bits=None, forward=True, length_prefixed=False, workers=1, compression=None,
+           config_header=False, key=None, checksum=False, backend=None, cache=None):
     """
     Remove text data from an image file
-    :param im_dec: The image file containing encoded data
-    :param color_bits: [red_bits, green_bits, blue_bits] where each value describes the number of
-    that color's bits that containes encoded data
+    :param im_dec: The image file containing encoded data, or a PIL Image object
+    :param color_bits: the number of bits of each of the image's channels that hold encoded data, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
     :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
     or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data was encoded with a length header rather than a termination sequence
+    :param workers: the number of processes to split the image between, or None for one per CPU
+    :param compression: any codec name or AUTO if the data was encoded with compression, as the
+    codec used is read from the data
+    :param config_header: True if the image was encoded with a config header, which is read in place
+    of color_bits, forward, length_prefixed and compression
+    :param key: the key the data was scattered with, if any. It is never recorded in a config header.
+    :param checksum: True if the data was encoded with a checksum, which is checked. ChecksumMismatch
+    is raised if it doesn't match.
+    :param backend: the backend to decode with, NUMPY_BACKEND or PYTHON_BACKEND, or None to use numpy
+    if it is installed
+    :param cache: a DecodeCache to look the data up in first, and to store it in once decoded.
+    Image files are looked up without opening the image, see DecodeCache.
     :return: A string of the data that was encoded in the file
     """
-    if color_bits is None:
-        color_bits = [1, 1, 1]
+    if cache is not None:
+        options = (color_bits, forward, length_prefixed, compression, config_header, key, checksum)
+        return cache.get(cache.get_key(im_dec, options),
+                         lambda: decode(im_dec, color_bits, forward, length_prefixed, workers, compression,
+                                        config_header, key, checksum, backend))
+    image = open_decode_image(im_dec)
+    if config_header:
+        return get_header_decoder(image, workers, key, backend).decode(image)
+    return get_decoder(color_bits, forward, length_prefixed, workers, compression, image, key,
+                       checksum, backend).decode(image)
+
+
+def decode_iter(im_dec, color_bits=None, forward=True, length_prefixed=False, compression=None, config_header=False,
+                key=None, checksum=False, backend=None):
+    """
+    Remove text data from an image file a chunk at a time, as it is extracted
+    :param im_dec: The image file containing encoded data, or a PIL Image object
+    :param color_bits: the number of bits of each of the image's channels that hold encoded data, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data was encoded with a length header rather than a termination sequence
+    :param compression: any codec name or AUTO if the data was encoded with compression
+    :param config_header: True if the image was encoded with a config header
+    :param key: the key the data was scattered with, if any
+    :param checksum: True if the data was encoded with a checksum, which is checked after the last chunk
+    :param backend: the backend to decode with, see decode
+    :return: A generator of strings that join to the data that was encoded in the file
+    """
+    image = open_decode_image(im_dec)
+    if config_header:
+        return get_header_decoder(image, key=key, backend=backend).decode_iter(image)
+    decoder = get_decoder(color_bits, forward, length_prefixed, compression=compression, image=image, key=key,
+                          checksum=checksum, backend=backend)
+    return decoder.decode_iter(image)
 
-    in_image = Image.open(im_dec)
 
+def decode_to_file(im_dec, fileobj, color_bits=None, forward=True, length_prefixed=False, compression=None,
+                   config_header=False, key=None, checksum=False, backend=None):
+    """
+    Remove text data from an image file, writing it to a file as it is extracted
+    :param im_dec: The image file containing encoded data, or a PIL Image object
+    :param fileobj: a file-like object with a write method to write the data to
+    :param color_bits: the number of bits of each of the image's channels that hold encoded data, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data was encoded with a length header rather than a termination sequence
+    :param compression: any codec name or AUTO if the data was encoded with compression
+    :param config_header: True if the image was encoded with a config header
+    :param key: the key the data was scattered with, if any
+    :param checksum: True if the data was encoded with a checksum, which is checked after the last write
+    :param backend: the backend to decode with, see decode
+    :return: The number of bytes written
+    """
+    image = open_decode_image(im_dec)
+    if config_header:
+        return get_header_decoder(image, key=key, backend=backend).decode_to_file(image, fileobj)
+    decoder = get_decoder(color_bits, forward, length_prefixed, compression=compression, image=image, key=key,
+                          checksum=checksum, backend=backend)
+    return decoder.decode_to_file(image, fileobj)
+
+
+def get_encoder(color_bits, forward=True, length_prefixed=False, workers=1, compression=None, key=None,
+                checksum=False, backend=None):
+    """
+    Get the encoder for an encoding policy
+    :param color_bits: the number of bits of each of the image's channels used for data encoding, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data is framed with a length header rather than a termination sequence
+    :param workers: the number of processes to split images between, or None for one per CPU
+    :param compression: the codec the data is compressed with, or None
+    :param key: the key the data is scattered over the pixels with, or None for raster order.
+    workers are not used with a key.
+    :param checksum: True if a CRC-32 of the data follows it
+    :param backend: the name of the backend to use, or None to use numpy if it is installed. A key
+    and workers need numpy.
+    :return: A SimpleSteganography object
+    """
+    backend = get_backend(backend)
+    options = {'length_prefixed': length_prefixed, 'compression': compression, 'checksum': checksum}
+    if (key is not None or workers != 1) and backend != NUMPY_BACKEND:
+        raise SteganograpyException("Keyed and parallel encoding need the {} backend.".format(NUMPY_BACKEND))
+    if key is not None:
+        if forward:
+            return KeyedForwardSteganography(color_bits, key, **options)
+        return KeyedBackwardSteganography(color_bits, key, **options)
+    if workers != 1:
+        if forward:
+            return ParallelForwardSteganography(color_bits, workers, **options)
+        return ParallelBackwardSteganography(color_bits, workers, **options)
+    forward_class, backward_class = backends[backend]
     if forward:
-        encoder = ForwardSteganography(color_bits)
+        return forward_class(color_bits, **options)
+    return backward_class(color_bits, **options)
+
+
+def get_backend(backend=None):
+    """
+    Get the name of the backend to use
+    :param backend: a backend name, or None for numpy if it is installed and pure Python otherwise
+    :return: the name of an installed backend
+    """
+    if backend is None:
+        return NUMPY_BACKEND if NUMPY_BACKEND in backends else PYTHON_BACKEND
+    if backend not in backends:
+        raise SteganograpyException("The {} backend isn't available, use one of {}.".format(
+            backend, ', '.join(sorted(backends))))
+    return backend
+
+
+def require_numpy(feature):
+    """
+    Raise a SteganograpyException if numpy isn't installed
+    :param feature: a description of what needs numpy, for the message
+    """
+    if numpy is None:
+        raise SteganograpyException("{} needs numpy, which isn't installed.".format(feature))
+
+
+def get_decoder(color_bits=None, forward=True, length_prefixed=False, workers=1, compression=None, image=None,
+                key=None, checksum=False, backend=None):
+    """
+    Get the encoder to decode with, defaulting to 1 bit of each of the image's channels, or of each
+    color if no image is given, when color_bits is None
+    """
+    if color_bits is None:
+        color_bits = [1] * (len(image.getbands()) if image is not None else 3)
+    return get_encoder(color_bits, forward, length_prefixed, workers, compression, key, checksum, backend)
+
+
+def get_header_decoder(image, workers=1, key=None, backend=None):
+    """
+    Get the decoder for the encoding policy recorded in an image's config header
+    :param image: an image object encoded with a config header
+    :param workers: the number of processes to split the image between, or None for one per CPU
+    :param key: the key the data was scattered with, required if the header says it was keyed
+    :param backend: the name of the backend to decode with, or None to use numpy if it is installed
+    :return: A SimpleSteganography object that decodes the data after the header
+    """
+    config = read_config_header(image)
+    if config.keyed and key is None:
+        raise SteganograpyException("The data was scattered with a key, give the key to decode it.")
+    decoder = get_decoder(config.color_bits, config.forward, config.length_prefixed, workers,
+                          AUTO if config.compressed else None, key=key if config.keyed else None,
+                          checksum=config.checksummed, backend=backend)
+    decoder.pixel_offset = get_config_header_pixels(len(config.color_bits))
+    return decoder
+
+
+def probe(im_dec):
+    """
+    Check whether an image carries data encoded with a config header, reading only the first pixels.
+    This is much faster than decoding an image that turns out to hold no data.
+    :param im_dec: The image file to check, or a PIL Image object
+    :return: the Config recorded in the image's header, or None if it has no config header or is in
+    a mode that can't hold data, such as a palette or 1 bit image
+    """
+    image = open_decode_image(im_dec)
+    try:
+        get_channel_depth(image.mode)
+    except SteganograpyException:
+        return None
+    try:
+        return read_config_header(image)
+    except NoConfigHeader:
+        return None
+
+
+def verify(im_dec, color_bits=None, forward=True, length_prefixed=False, config_header=False, key=None):
+    """
+    Check the data encoded in an image matches the checksum encoded with it. The data is read a
+    chunk at a time and never joined or decompressed.
+    :param im_dec: The image file containing encoded data, or a PIL Image object
+    :param color_bits: the number of bits of each of the image's channels that hold encoded data, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data was encoded with a length header rather than a termination sequence
+    :param config_header: True if the image was encoded with a config header, which is read in place
+    of color_bits, forward and length_prefixed
+    :param key: the key the data was scattered with, if any
+    :return: True if the data matches its checksum, False if it doesn't or its length header is damaged
+    """
+    image = open_decode_image(im_dec)
+    if config_header:
+        decoder = get_header_decoder(image, key=key)
+        if not decoder.checksum:
+            raise SteganograpyException("The data was encoded without a checksum.")
+    else:
+        decoder = get_decoder(color_bits, forward, length_prefixed, image=image, key=key, checksum=True)
+    try:
+        # The checksum covers the data as it was encoded, so compressed data isn't decompressed
+        for _ in decoder.iter_encoded_data(image):
+            pass
+    except (ChecksumMismatch, BadLengthHeader):
+        # A damaged length header is reported like damaged data
+        return False
+    return True
+
+
+def open_image(im_dec):
+    """
+    Open an image file, passing through anything that is already a PIL Image object
+    """
+    if isinstance(im_dec, Image.Image):
+        return im_dec
+    return Image.open(im_dec)
+
+
+def open_decode_image(im_dec):
+    """
+    Open an image file to decode, memory mapping it or reading it a scanline at a time where its
+    format allows so only the rows holding data are read, passing through anything already an image.
+    Without numpy the whole image file is opened.
+    """
+    if numpy is None:
+        return open_image(im_dec)
+    return open_scanline_image(open_mapped_image(im_dec))
+
+
+def encode_in_place(filename, encode_data, color_bits=None, forward=True, length_prefixed=False,
+                    copy_on_write=False):
+    """
+    Encode text data straight into the pixels of a BMP, PPM, PGM or .npy file by memory mapping it,
+    without loading or re-saving the image.
+    :param filename: the name of the image file to encode data into
+    :param encode_data: a string of the data to encode into the image
+    :param color_bits: the number of bits of each of the image's channels to use for data encoding, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: if True put a header with the data length before the data instead of
+    ending it with the termination sequence, so the data may contain the termination sequence
+    :param copy_on_write: if True leave the file unchanged and keep the encoded pixels in a
+    copy-on-write mapping, which only copies the pages that change
+    :return: A tuple with two items. A MappedImage object of the encoded image.
+    And the color_bits encoding used to encode that image  i.e. (image, color_bits)
+    """
+    require_numpy("Encoding in place")
+    image = MappedImage(filename, 'c' if copy_on_write else 'r+')
+    if color_bits is None:
+        framing = pack_length_header(encode_data) if length_prefixed else TERMINATION_SEQUENCE
+        color_bits = get_recommended_encoding(encode_data, image, framing)
+
+    return (get_encoder(color_bits, forward, length_prefixed).encode_in_place(encode_data, image), color_bits)
+
+
+def update(image, encode_data, color_bits=None, forward=True, length_prefixed=False, compression=None,
+           config_header=False, key=None, checksum=False):
+    """
+    Replace the data encoded in an image with new data, in place, writing only the pixels whose
+    bits change. The original image isn't needed.
+    :param image: A PIL image object already encoded with data, or the name of a BMP, PPM, PGM or
+    .npy file, which is memory mapped and updated in the file
+    :param encode_data: a string of the new data
+    :param color_bits: the number of bits of each of the image's channels that hold data, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images, defaulting to 1 bit of each
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data is framed with a length header rather than a termination sequence
+    :param compression: the codec to compress the new data with, see encode
+    :param config_header: True if the image was encoded with a config header, which is read in place
+    of color_bits, forward, length_prefixed and compression
+    :param key: the key the data is scattered with, if any
+    :param checksum: True if the data is encoded with a checksum, which is updated with it
+    :return: A tuple with two items. The updated image object. And the number of pixels
+    that were written i.e. (image, pixels_written)
+    """
+    require_numpy("Updating")
+    if not isinstance(image, Image.Image):
+        image = MappedImage(image, 'r+')
+    if config_header:
+        encoder = get_header_decoder(image, key=key)
     else:
-        encoder = BackwardSteganography(color_bits)
-
-    return encoder.decode(in_image)
-
-
-def get_recommended_encoding(encode_data, image, termination_sequence):
-    '''
-    This will return a list that is the recommended encoding policy for the
-    given file to encode (en_filename) and image (image_filename)
-    '''
-    data_bits = len(encode_data) * 8 + len(termination_sequence) * 8
-
-    num_pix = image.size[0] * image.size[1]
-    bits_per_pix = math.ceil(float(data_bits) / num_pix)
-    bits_config = []
-    for i in xrange(3, 0, -1):
-        bits_config.append(int(math.floor(bits_per_pix / float(i))))
-        bits_per_pix = bits_per_pix - bits_config[-1]
-    if max(bits_config) > 8:
-        raise FileTooLargeException("The given data file will not fit into the given image file")
-    random.shuffle(bits_config)
-    return bits_config
+        encoder = get_decoder(color_bits, forward, length_prefixed, compression=compression, image=image, key=key,
+                              checksum=checksum)
+    return (image, encoder.update(encode_data, image))
+
+
+def encode_stream(image, stream, color_bits=None, forward=True, length_prefixed=False, data_length=None):
+    """
+    Encode data from a stream into an image file without holding all of the data in memory.
+    :param image: A PIL image object of the Image to encode data into
+    :param stream: a file-like object with a read method, or an iterable of strings, holding the data to encode
+    :param color_bits: the number of bits of each of the image's channels to use for data encoding, e.g.
+    [red_bits, green_bits, blue_bits] for RGB or [bits] for L. Each is at most the channel
+    depth: 8, or 16 for 16 bit images
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: if True put a header with the data length before the data instead of
+    ending it with the termination sequence, so the data may contain the termination sequence
+    :param data_length: the number of bytes in the stream. Required when length_prefixed is True or
+    color_bits is None, otherwise only used to check the data will fit before starting
+    :return: A tuple with two items. A PIL Image object that has the data encoded into the image.
+    And the color_bits encoding used to encode that image  i.e. (image, color_bits)
+    """
+    require_numpy("Encoding a stream")
+    if color_bits is None:
+        if data_length is None:
+            raise SteganograpyException("The data length is required to recommend an encoding for a stream.")
+        framing_size = LENGTH_HEADER_SIZE if length_prefixed else len(TERMINATION_SEQUENCE)
+        color_bits = get_recommended_encoding_for_size(data_length + framing_size, image)
+
+    encoder = get_encoder(color_bits, forward, length_prefixed)
+    return (encoder.encode_stream(stream, image, data_length), color_bits)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,4 @@
+import sys
+from stegapy.cli import main
+
+sys.exit(main())
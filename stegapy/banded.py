@@ -0,0 +1,165 @@
+from steganography import SimpleSteganography, SteganograpyException, FileTooLargeException, LENGTH_HEADER_SIZE, \
+    iter_verified
+from metrics import Metrics
+from compression import iter_decompress
+
+# The number of pixels to decode at a time before checking for the end of the data
+DECODE_BAND_PIXELS = 1 << 16
+
+
+class BandedSteganography(SimpleSteganography):
+    """
+    Steganography that reads and writes the pixels of an image a band of rows at a time, so decoding
+    stops at the end of the data. Subclasses provide the backend that embeds data bits into pixels
+    and extracts them, and share the framing, checksums and compression here.
+    """
+
+    band_pixels = DECODE_BAND_PIXELS
+
+    def encode(self, encode_data, image):
+        """
+        Encode text data into an image file.
+        :param image: a PIL Image object to use as the original image to encode into
+        :param encode_data: a string of the data to be encoded in the image
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        metrics = Metrics('encode')
+        self.check_image(image)
+        encode_data = self.frame_data(self.add_checksum(self.compress_data(encode_data)))
+        if not self.data_fits(len(encode_data) * 8, image):
+            raise FileTooLargeException("Image to small for current settings.")
+        metrics.lap('frame')
+
+        out_image = self.embed_data(encode_data, image, metrics)
+        self.report_metrics(metrics)
+        return out_image
+
+    def decode(self, image):
+        """
+        Remove text data from an image file
+        :param image: a PIL Image object containing encoded data
+        :return: A string of the data that was encoded in the file
+        """
+        metrics = Metrics('decode')
+        # The whole of the data is checked against any checksum before it is decompressed
+        decoded = self.decompress_data(''.join(self.iter_encoded_data(image, metrics)))
+        metrics.allocated(len(decoded))
+        metrics.lap('join')
+        self.report_metrics(metrics)
+        return decoded
+
+    def decode_iter(self, image, metrics=None):
+        """
+        Remove text data from an image file a chunk at a time, as it is extracted. A checksum is
+        checked after the last chunk, but damaged compressed data may raise before then.
+        :param image: a PIL Image object containing encoded data
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings that join to the data that was encoded in the file
+        """
+        chunks = self.iter_encoded_data(image, metrics)
+        if self.compression is not None:
+            return iter_decompress(chunks)
+        return chunks
+
+    def iter_encoded_data(self, image, metrics=None):
+        """
+        Get the data as it was encoded, still compressed if it was, a chunk at a time. Any checksum
+        is removed and checked after the last chunk.
+        :param image: a PIL Image object containing encoded data
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings
+        """
+        metrics = metrics or Metrics('decode')
+        if self.length_prefixed:
+            # Read the header now so a bad header raises here rather than on the first chunk
+            data_length = self.check_length_header(self.read_bytes(image, LENGTH_HEADER_SIZE, metrics), image)
+            chunks = self._iter_length_prefixed(image, data_length, metrics)
+        else:
+            chunks = self._iter_terminated(image, metrics)
+        if self.checksum:
+            return iter_verified(chunks)
+        return chunks
+
+    def decode_to_file(self, image, fileobj):
+        """
+        Remove text data from an image file, writing it to a file as it is extracted
+        :param image: a PIL Image object containing encoded data
+        :param fileobj: a file-like object with a write method
+        :return: the number of bytes written
+        """
+        metrics = Metrics('decode')
+        written = 0
+        for chunk in self.decode_iter(image, metrics):
+            fileobj.write(chunk)
+            written += len(chunk)
+            metrics.lap('write')
+        self.report_metrics(metrics)
+        return written
+
+    def _iter_length_prefixed(self, image, data_length, metrics):
+        end = LENGTH_HEADER_SIZE + data_length
+        position = 0
+        stop = self.pixel_offset + -(-end * 8 // sum(self.get_color_bits_used()))
+        for chunk in self.iter_bytes(image, stop, metrics):
+            # Drop the header from the front and any padding bits from the back
+            chunk_start = max(0, LENGTH_HEADER_SIZE - position)
+            chunk_end = min(len(chunk), end - position)
+            position += len(chunk)
+            if chunk_start < chunk_end:
+                yield chunk[chunk_start:chunk_end]
+
+    def _iter_terminated(self, image, metrics):
+        termination_sequence = self.termination_sequence
+        # The end of the data read so far, held back in case it is the start of the termination sequence
+        held = ''
+        for chunk in self.iter_bytes(image, metrics=metrics):
+            # held has already been searched so only a termination sequence that ends in chunk is new
+            search_start = max(0, len(held) - len(termination_sequence) + 1)
+            data = held + chunk
+            end = data.find(termination_sequence, search_start)
+            metrics.lap('search')
+            if end != -1:
+                if end:
+                    yield data[:end]
+                return
+            split = max(0, len(data) - len(termination_sequence))
+            if split:
+                yield data[:split]
+            held = data[split:]
+        # Without a termination sequence the final bytes are dropped as if they were one
+
+    def read_bytes(self, image, byte_count, metrics=None):
+        """
+        Read a fixed number of bytes from the start of the data encoded in an image
+        :param image: a PIL Image object containing encoded data
+        :param byte_count: the number of bytes to read
+        :param metrics: a Metrics object to record the work in
+        :return: a string of byte_count bytes
+        """
+        bits_per_pix = sum(self.get_color_bits_used())
+        if not self.data_fits(byte_count * 8, image):
+            raise SteganograpyException("Image to small to hold {} bytes.".format(byte_count))
+        if byte_count == 0:
+            return ''
+        stop = self.pixel_offset + -(-byte_count * 8 // bits_per_pix)
+        return ''.join(self.iter_bytes(image, stop, metrics))[:byte_count]
+
+    def embed_data(self, data, image, metrics=None):
+        """
+        Encode a string of bytes, already framed and checked to fit, into an image file.
+        :param data: the string of bytes to encode
+        :param image: a PIL Image object to use as the original image to encode into
+        :param metrics: a Metrics object to record the work in
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        raise NotImplementedError("Not Implemented")
+
+    def iter_bytes(self, image, stop=None, metrics=None):
+        """
+        Read the bytes encoded in an image a band of rows at a time
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings of whole bytes, in order
+        """
+        raise NotImplementedError("Not Implemented")
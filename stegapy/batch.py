@@ -0,0 +1,137 @@
+import csv
+import os
+import time
+import multiprocessing
+from collections import namedtuple
+from PIL import Image
+
+import stegapy
+from output import save_image, DEFAULT_COMPRESS_LEVEL
+
+# The result of encoding or decoding one item of a batch. data is the decoded data when a decode
+# item has no output file, and error is the error message if the item failed.
+BatchResult = namedtuple('BatchResult', ['item', 'color_bits', 'data_size', 'seconds', 'error', 'data'])
+
+
+def _encode_item(args):
+    (carrier, payload, output), color_bits, forward, length_prefixed, compress_level = args
+    start = time.time()
+    try:
+        with open(payload, 'rb') as payload_file:
+            data = payload_file.read()
+        image, color_bits = stegapy.encode(Image.open(carrier), data, color_bits, forward, length_prefixed)
+        save_image(image, output, 'PNG', compress_level)
+    except Exception as e:
+        return BatchResult((carrier, payload, output), color_bits, 0, time.time() - start, str(e), None)
+    return BatchResult((carrier, payload, output), color_bits, len(data), time.time() - start, None, None)
+
+
+def _decode_item(args):
+    (image, output, item_color_bits), color_bits, forward, length_prefixed = args
+    color_bits = item_color_bits or color_bits
+    start = time.time()
+    try:
+        data = stegapy.decode(image, color_bits, forward, length_prefixed)
+        if output is not None:
+            with open(output, 'wb') as output_file:
+                output_file.write(data)
+    except Exception as e:
+        return BatchResult((image, output), color_bits, 0, time.time() - start, str(e), None)
+    return BatchResult((image, output), color_bits, len(data), time.time() - start, None,
+                       data if output is None else None)
+
+
+def map_tasks(function, tasks, processes):
+    """
+    Map a function over tasks in a pool of processes, or in this process if processes is 1
+    """
+    if processes == 1:
+        return map(function, tasks)
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(function, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+
+
+def encode_batch(items, color_bits=None, forward=True, length_prefixed=False, processes=None,
+                 compress_level=DEFAULT_COMPRESS_LEVEL):
+    """
+    Encode many payload files into many images across a pool of processes
+    :param items: an iterable of (carrier, payload, output) file names. Each output is saved as a PNG
+    :param color_bits: the color_bits to use for every item, or None to use the recommended encoding for each
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True to frame the data with a length header rather than a termination sequence
+    :param processes: the number of processes to use, or None for one per CPU
+    :param compress_level: the zlib compression level of the output PNGs, from 0 to 9
+    :return: a list of BatchResult in the same order as items. A failed item does not stop the others.
+    """
+    tasks = [(tuple(item), color_bits, forward, length_prefixed, compress_level) for item in items]
+    return map_tasks(_encode_item, tasks, processes)
+
+
+def decode_batch(items, color_bits=None, forward=True, length_prefixed=False, processes=None):
+    """
+    Decode the data from many images across a pool of processes
+    :param items: an iterable of (image, output) or (image, output, color_bits) tuples. When output is
+    None the data is returned in the result rather than written to a file
+    :param color_bits: the color_bits of items that don't give their own, defaulting to 1 bit of each channel
+    :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param length_prefixed: True if the data was encoded with a length header rather than a termination sequence
+    :param processes: the number of processes to use, or None for one per CPU
+    :return: a list of BatchResult in the same order as items. A failed item does not stop the others.
+    """
+    tasks = []
+    for item in items:
+        image, output = item[:2]
+        tasks.append(((image, output, item[2] if len(item) > 2 else None), color_bits, forward, length_prefixed))
+    return map_tasks(_decode_item, tasks, processes)
+
+
+def format_color_bits(color_bits):
+    return ','.join(str(bits) for bits in color_bits)
+
+
+def parse_color_bits(text):
+    return [int(bits) for bits in text.split(',')]
+
+
+def read_manifest(manifest):
+    """
+    Read a CSV manifest of batch items, one item per row. An encode manifest has carrier, payload and
+    output columns, and a decode manifest has image and output columns, and optionally a color_bits
+    column such as "2,2,3".
+    :param manifest: the file name of the manifest
+    :return: a list of tuples of the row values
+    """
+    with open(manifest, 'rb') as manifest_file:
+        return [tuple(row) for row in csv.reader(manifest_file) if row]
+
+
+def list_files(directory):
+    """
+    List the files in a directory, by name
+    :return: a dict of file name without extension to path, for every file in the directory
+    """
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            files[os.path.splitext(name)[0]] = path
+    return files
+
+
+def summarize(results, seconds):
+    """
+    Describe the throughput of a batch
+    :param results: the list of BatchResult for the batch
+    :param seconds: the wall time the batch took
+    :return: a one line summary string
+    """
+    failed = sum(1 for result in results if result.error is not None)
+    data_size = sum(result.data_size for result in results)
+    seconds = max(seconds, 1e-9)
+    return "{} items, {} failed, {:.2f} MB in {:.2f} s ({:.2f} MB/s, {:.1f} items/s)".format(
+        len(results), failed, data_size / 1e6, seconds, data_size / 1e6 / seconds, len(results) / seconds)
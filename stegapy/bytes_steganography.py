@@ -0,0 +1,184 @@
+import sys
+from array import array
+
+from steganography import ForwardSteganography, BackwardSteganography, SteganograpyException, LRUCache, \
+    MAX_LOOKUP_TABLES, dec_2_bin, bin_2_dec, get_channel_depth
+from metrics import Metrics
+from banded import BandedSteganography, DECODE_BAND_PIXELS
+
+# The array typecode and byte order of a channel in the raw data of the image modes that don't
+# have a byte per channel
+CHANNEL_TYPECODES = {'I;16': ('H', 'little'), 'I;16L': ('H', 'little'), 'I;16B': ('H', 'big'),
+                     'I': ('i', sys.byteorder)}
+
+# Bit order tables for each recently used (class, bits_used), see BytesSteganography.get_bit_order
+bit_orders = LRUCache(MAX_LOOKUP_TABLES)
+
+
+def get_channel_values(image, num_channels):
+    """
+    Get the channel values of an image as a flat array, without numpy
+    :param image: a PIL Image object
+    :param num_channels: the number of channels the encoding policy expects per pixel
+    :return: an array of pixel_count * num_channels channel values in raster order
+    """
+    bands = len(image.getbands())
+    if bands != num_channels:
+        raise SteganograpyException("Image has {} channels but the encoding uses {}".format(bands, num_channels))
+    get_channel_depth(image.mode)
+    typecode, byteorder = CHANNEL_TYPECODES.get(image.mode, ('B', sys.byteorder))
+    values = array(typecode, image.tobytes())
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def values_to_bytes(values, mode):
+    """
+    Undo get_channel_values, giving the raw data of an image
+    """
+    _, byteorder = CHANNEL_TYPECODES.get(mode, ('B', sys.byteorder))
+    if byteorder != sys.byteorder:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tostring()
+
+
+def iter_channel_bands(image, num_channels, band_pixels=DECODE_BAND_PIXELS, stop=None, start=0):
+    """
+    Get the channel values of an image a band of whole rows at a time, see iter_pixel_bands
+    :return: a generator of flat arrays of channel values in raster order
+    """
+    width, height = image.size
+    if width == 0:
+        return
+    if stop is not None:
+        height = min(height, -(-stop // width))
+    rows = max(1, band_pixels // width)
+    for top in xrange(start // width, height, rows):
+        bottom = min(top + rows, height)
+        values = get_channel_values(image.crop((0, top, width, bottom)), num_channels)
+        if stop is not None and bottom * width > stop:
+            values = values[:(stop - top * width) * num_channels]
+        if top * width < start:
+            values = values[(start - top * width) * num_channels:]
+        yield values
+
+
+class BytesSteganography(BandedSteganography):
+    """
+    Steganography in pure Python, for when numpy isn't installed. The channel values are read and
+    written with tobytes and frombytes, and data bits are moved with integer shifts and masks rather
+    than strings of bits. The output is bit identical to the other backends.
+    """
+
+    def get_bit_order(self, bits_used):
+        """
+        Get the table that puts data bits in the order this class writes them into a channel
+        :param bits_used: the number of bits used in the channel
+        :return: a list mapping each bits_used bit value to the value in the channel's low bits.
+        The same list maps a channel's low bits back to the data bits.
+        """
+        def build():
+            return [bin_2_dec(''.join(self.get_encode_data_bits(dec_2_bin(value, bits_used), 0, bits_used)))
+                    for value in xrange(1 << bits_used)]
+        return bit_orders.get((self.__class__, bits_used), build)
+
+    def get_slots(self):
+        """
+        Get a tuple for each channel holding data bits, of (channel, bits_used, data_mask, bit_order)
+        """
+        return [(channel, bits_used, (1 << bits_used) - 1, self.get_bit_order(bits_used))
+                for channel, bits_used in enumerate(self.get_color_bits_used()) if bits_used]
+
+    def embed_data(self, data, image, metrics=None):
+        """
+        Encode a string of bytes, already framed and checked to fit, into an image file.
+        :param data: the string of bytes to encode
+        :param image: a PIL Image object to use as the original image to encode into
+        :param metrics: a Metrics object to record the work in
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        metrics = metrics or Metrics('encode')
+        num_channels = len(self.get_color_bits_used())
+        values = get_channel_values(image, num_channels)
+        metrics.allocated(values.itemsize * len(values))
+        metrics.lap('pixels')
+
+        data = bytearray(data)
+        slots = self.get_slots()
+        bit_count = len(data) * 8
+        # Data bits are read from the front of acc, which holds nbits bits
+        acc = nbits = byte_position = bit_position = 0
+        index = self.pixel_offset * num_channels
+        while bit_position < bit_count and slots:
+            for channel, bits_used, data_mask, bit_order in slots:
+                # A channel only partly holding data bits is padded with 0 bits, and the rest are untouched
+                if bit_position >= bit_count:
+                    break
+                while nbits < bits_used:
+                    acc = (acc << 8) | (data[byte_position] if byte_position < len(data) else 0)
+                    byte_position += 1
+                    nbits += 8
+                nbits -= bits_used
+                value = values[index + channel]
+                values[index + channel] = (value & ~data_mask) | bit_order[(acc >> nbits) & data_mask]
+                bit_position += bits_used
+            acc &= (1 << nbits) - 1
+            index += num_channels
+            metrics.pixels += 1
+        metrics.bits += bit_count
+        metrics.lap('embed')
+
+        out_image = image.copy()
+        out_image.frombytes(values_to_bytes(values, image.mode))
+        metrics.allocated(2 * values.itemsize * len(values))
+        metrics.lap('copy')
+        progress = self.new_progress(image)
+        if progress:
+            progress.update(progress.total)
+        return out_image
+
+    def iter_bytes(self, image, stop=None, metrics=None):
+        """
+        Read the bytes encoded in an image a band of rows at a time
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings of whole bytes, in order
+        """
+        metrics = metrics or Metrics('decode')
+        progress = self.new_progress(image)
+        num_channels = len(self.get_color_bits_used())
+        slots = self.get_slots()
+        # Bits left over from the previous band that did not make up a whole byte
+        acc = nbits = 0
+        pixels_done = 0
+        for values in iter_channel_bands(image, num_channels, self.band_pixels, stop, self.pixel_offset):
+            metrics.pixels += len(values) // num_channels
+            metrics.allocated(values.itemsize * len(values))
+            metrics.lap('read')
+            chunk = bytearray()
+            for index in xrange(0, len(values), num_channels):
+                for channel, bits_used, data_mask, bit_order in slots:
+                    acc = (acc << bits_used) | bit_order[values[index + channel] & data_mask]
+                    nbits += bits_used
+                while nbits >= 8:
+                    nbits -= 8
+                    chunk.append((acc >> nbits) & 0xff)
+                acc &= (1 << nbits) - 1
+            metrics.bits += len(chunk) * 8
+            metrics.allocated(len(chunk))
+            metrics.lap('extract')
+            pixels_done += len(values) // num_channels
+            if progress:
+                progress.update(pixels_done)
+            yield str(chunk)
+
+
+class BytesForwardSteganography(BytesSteganography, ForwardSteganography):
+    pass
+
+
+class BytesBackwardSteganography(BytesSteganography, BackwardSteganography):
+    pass
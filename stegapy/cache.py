@@ -0,0 +1,263 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from banded import DECODE_BAND_PIXELS
+
+try:
+    from mapped import MappedImage
+except ImportError:
+    MappedImage = None
+
+# The default most bytes of decoded data to hold
+DEFAULT_MAX_BYTES = 64 << 20
+
+# The number of bytes from each end of an in memory image file that identify it, with its size
+FINGERPRINT_BYTES = 1 << 12
+
+
+def get_content_digest(im_dec, hash_pixels=False):
+    """
+    Identify an image to decode, so the same image can be recognised without decoding it again,
+    without reading all of it
+    :param im_dec: an image file name, file object or image object. A file on disk is identified by
+    its path, inode, size and times. Other file objects are identified by their size and the bytes
+    at each end, from, and left at, their current position. A mapped image is identified by its file.
+    :param hash_pixels: if True identify other image objects by a hash of their mode, size and every
+    pixel, which can take longer than decoding them
+    :return: a string identifying the image, or None if it can't be identified
+    """
+    if isinstance(im_dec, basestring):
+        return get_file_fingerprint(os.path.realpath(im_dec), os.stat(im_dec))
+    if hasattr(im_dec, 'read'):
+        try:
+            return get_file_fingerprint(os.path.realpath(im_dec.name), os.fstat(im_dec.fileno()), im_dec.tell())
+        except (AttributeError, IOError, OSError, ValueError, TypeError):
+            return get_stream_fingerprint(im_dec)
+    if MappedImage is not None and isinstance(im_dec, MappedImage):
+        return get_file_fingerprint(os.path.realpath(im_dec.filename), os.stat(im_dec.filename))
+    if hash_pixels:
+        return get_pixel_digest(im_dec)
+    return None
+
+
+def get_file_fingerprint(path, stat, position=0):
+    """
+    Identify a file on disk by where it is and when it last changed
+    """
+    return repr(('file', path, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime, stat.st_ctime, position))
+
+
+def get_stream_fingerprint(fp):
+    """
+    Identify the rest of a file object by its size and the bytes at each end of it
+    """
+    position = fp.tell()
+    head = fp.read(FINGERPRINT_BYTES)
+    fp.seek(0, os.SEEK_END)
+    size = fp.tell() - position
+    fp.seek(max(position + len(head), position + size - FINGERPRINT_BYTES))
+    tail = fp.read(FINGERPRINT_BYTES)
+    fp.seek(position)
+    return 'stream {}\n'.format(size) + hashlib.sha1(head + tail).digest()
+
+
+def get_pixel_digest(image):
+    """
+    Hash the mode, size and pixels of an image object
+    """
+    digest = hashlib.sha1()
+    width, height = image.size
+    digest.update('{} {} {}\n'.format(image.mode, width, height))
+    # A band of rows at a time, so a large image isn't copied whole
+    rows = max(1, DECODE_BAND_PIXELS // max(1, width))
+    for top in xrange(0, height, rows):
+        digest.update(image.crop((0, top, width, min(top + rows, height))).tobytes())
+    return 'pixels ' + digest.digest()
+
+
+class MemoryCacheStorage(object):
+    """Decoded data held in memory, evicting the least recently used once there is more than max_bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        """
+        :param key: the cache key string
+        :return: the data stored for the key, or None if there is none
+        """
+        try:
+            data = self.items.pop(key)
+        except KeyError:
+            return None
+        self.items[key] = data
+        return data
+
+    def set(self, key, data):
+        if key in self.items:
+            self.size -= len(self.items.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self.items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            self.size -= len(self.items.popitem(last=False)[1])
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.items)
+
+
+class DiskCacheStorage(object):
+    """
+    Decoded data held in files in a directory, one per key, evicting the least recently used once
+    there is more than max_bytes. Each file's modification time is its last use, so several
+    processes can share the directory. Data decoded with a key is written to the disk unencrypted.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        :param key: the cache key string
+        :return: the data stored for the key, or None if there is none
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            # Missing, or evicted by another process since it was opened
+            return None
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        # Written to a temporary file and renamed, so a reader never sees part of the data
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.rename(temp_path, self.get_path(key))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used files until they hold at most max_bytes
+        """
+        entries = []
+        for name in self.iter_keys():
+            try:
+                stat = os.stat(self.get_path(name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            self.remove(name)
+            size -= entry_size
+
+    def iter_keys(self):
+        return (name for name in os.listdir(self.directory) if not name.startswith('.'))
+
+    def remove(self, key):
+        try:
+            os.remove(self.get_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in list(self.iter_keys()):
+            self.remove(name)
+
+    def __len__(self):
+        return sum(1 for _ in self.iter_keys())
+
+
+class DecodeCache(object):
+    """
+    Decoded data by the image it was decoded from and the settings it was decoded with, so decoding
+    the same image again skips reading its pixels. Images are recognised without reading them all,
+    see get_content_digest, and image objects that aren't mapped from a file are only cached if
+    hash_pixels is set. hits and misses count the lookups that found data and that had to decode.
+    """
+
+    def __init__(self, storage=None, hash_pixels=False):
+        """
+        :param storage: where to hold the data, a MemoryCacheStorage of DEFAULT_MAX_BYTES by default.
+        Anything with the get, set, clear and __len__ methods of MemoryCacheStorage can be used.
+        :param hash_pixels: if True cache image objects by a hash of their pixels. Hashing every
+        pixel can take longer than decoding, so this only pays for slow decodes.
+        """
+        self.storage = storage if storage is not None else MemoryCacheStorage()
+        self.hash_pixels = hash_pixels
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, im_dec, options):
+        """
+        Get the cache key of an image decoded with some settings
+        :param im_dec: the image to decode, see get_content_digest
+        :param options: a tuple of the settings that change the decoded data, which must have a
+        stable repr
+        :return: a hex string of the key, or None if the image can't be cached
+        """
+        digest = get_content_digest(im_dec, self.hash_pixels)
+        if digest is None:
+            return None
+        return hashlib.sha1(digest + repr(options)).hexdigest()
+
+    def get(self, key, decode):
+        """
+        Get the data for a key, decoding and storing it if it isn't held. Nothing is stored if
+        decode raises.
+        :param key: the key from get_key, or None to decode without storing the data
+        :param decode: a function of no arguments that decodes the data
+        :return: the decoded data
+        """
+        if key is None:
+            self.misses += 1
+            return decode()
+        data = self.storage.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = decode()
+        self.storage.set(key, data)
+        return data
+
+    def clear(self):
+        """
+        Remove all of the held data and reset the counters
+        """
+        self.storage.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'items': len(self.storage)}
+
+    def __len__(self):
+        return len(self.storage)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import time
+
+from batch import encode_batch, decode_batch, read_manifest, list_files, summarize, format_color_bits, \
+    parse_color_bits
+from output import DEFAULT_COMPRESS_LEVEL
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='stegapy', description='Hide data in images, or recover it.')
+    parser.add_argument('-c', '--color-bits', type=parse_color_bits,
+                        help='bits of each color to use, such as 1,1,1. Encoding picks them per image by default')
+    parser.add_argument('-b', '--backward', action='store_true', help='use BackwardSteganography bit order')
+    parser.add_argument('-l', '--length-prefixed', action='store_true',
+                        help='frame the data with a length header rather than a termination sequence')
+    parser.add_argument('-p', '--processes', type=int, help='number of processes to use, one per CPU by default')
+    commands = parser.add_subparsers(dest='command')
+
+    encode = commands.add_parser('encode', help='encode payload files into carrier images')
+    encode.add_argument('carriers', nargs='?', help='directory of carrier images')
+    encode.add_argument('payloads', nargs='?', help='directory of payloads, matched to carriers by file name')
+    encode.add_argument('-o', '--output', help='directory to write the encoded PNG images to')
+    encode.add_argument('-m', '--manifest',
+                        help='CSV file of carrier,payload,output rows to use instead of directories')
+    encode.add_argument('-z', '--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL, choices=range(10),
+                        help='zlib compression level of the output PNGs, 1 is fastest and 9 smallest')
+
+    decode = commands.add_parser('decode', help='decode the data from images')
+    decode.add_argument('images', nargs='?', help='directory of images')
+    decode.add_argument('-o', '--output', help='directory to write the decoded data to')
+    decode.add_argument('-m', '--manifest',
+                        help='CSV file of image,output[,color_bits] rows to use instead of a directory')
+    return parser
+
+
+def get_encode_items(args):
+    if args.manifest:
+        return read_manifest(args.manifest)
+    carriers = list_files(args.carriers)
+    payloads = list_files(args.payloads)
+    return [(carriers[name], payloads[name], os.path.join(args.output, name + '.png'))
+            for name in sorted(carriers) if name in payloads]
+
+
+def get_decode_items(args):
+    if args.manifest:
+        return [(row[0], row[1], parse_color_bits(row[2])) if len(row) > 2 else row
+                for row in read_manifest(args.manifest)]
+    images = list_files(args.images)
+    return [(images[name], os.path.join(args.output, name + '.bin')) for name in sorted(images)]
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if not args.manifest and (args.output is None or (args.command == 'encode' and args.payloads is None) or
+                              (args.command == 'decode' and args.images is None)):
+        parser.error('give either a manifest or input directories and an output directory')
+    if args.output and not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    start = time.time()
+    if args.command == 'encode':
+        results = encode_batch(get_encode_items(args), args.color_bits, not args.backward,
+                               args.length_prefixed, args.processes, args.compress_level)
+    else:
+        results = decode_batch(get_decode_items(args), args.color_bits, not args.backward,
+                               args.length_prefixed, args.processes)
+    seconds = time.time() - start
+
+    for result in results:
+        if result.error is None:
+            print "ok {} -> {} color_bits={}".format(result.item[0], result.item[-1],
+                                                      format_color_bits(result.color_bits))
+        else:
+            print "error {}: {}".format(result.item[0], result.error)
+    print >> sys.stderr, summarize(results, seconds)
+    return 1 if any(result.error is not None for result in results) else 0
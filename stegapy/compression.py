@@ -0,0 +1,115 @@
+import bz2
+import zlib
+from collections import namedtuple, OrderedDict
+
+from steganography import SteganograpyException
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# A compression codec. codec_id is the byte recorded before the compressed data, compress takes a
+# string and returns it compressed, and decompressor makes an object whose decompress method takes
+# the compressed data a chunk at a time
+Codec = namedtuple('Codec', ['name', 'codec_id', 'compress', 'decompressor'])
+
+# Try every codec and keep the smallest result, which may be no compression at all
+AUTO = 'auto'
+
+# Registered codecs by name, in the order AUTO tries them
+codecs = OrderedDict()
+# Registered codecs by codec_id
+codec_ids = {}
+
+
+class NullDecompressor(object):
+
+    def decompress(self, data):
+        return data
+
+
+def register_codec(name, codec_id, compress, decompressor):
+    """
+    Add a codec that data can be compressed with
+    :param name: the name to select the codec by
+    :param codec_id: a number from 0 to 255 to record before data compressed with the codec
+    :param compress: a function from a string to the compressed string
+    :param decompressor: a function that makes an object with a decompress method, which takes the
+    compressed data a chunk at a time and returns the decompressed data so far
+    """
+    if codec_id in codec_ids and codec_ids[codec_id].name != name:
+        raise SteganograpyException("Codec id {} is already used by {}".format(codec_id, codec_ids[codec_id].name))
+    codecs[name] = codec_ids[codec_id] = Codec(name, codec_id, compress, decompressor)
+
+
+register_codec('none', 0, lambda data: data, NullDecompressor)
+register_codec('zlib', 1, lambda data: zlib.compress(data, 9), zlib.decompressobj)
+register_codec('bz2', 2, lambda data: bz2.compress(data, 9), bz2.BZ2Decompressor)
+if lzma is not None:
+    register_codec('lzma', 3, lzma.compress, lzma.LZMADecompressor)
+
+
+def get_codec(name):
+    if name not in codecs:
+        raise SteganograpyException("Unknown compression codec {}, use one of {}".format(
+            name, ', '.join([AUTO] + codecs.keys())))
+    return codecs[name]
+
+
+def compress_payload(data, codec=AUTO, termination_sequence=None):
+    """
+    Compress data, recording the codec used in a byte before it
+    :param data: a string of the data
+    :param codec: the name of a registered codec, or AUTO for whichever gives the smallest result
+    :param termination_sequence: if given, the result must not contain it
+    :return: a string of the codec id followed by the compressed data
+    """
+    candidates = codecs.values() if codec == AUTO else [get_codec(codec)]
+    best = None
+    for candidate in candidates:
+        compressed = chr(candidate.codec_id) + candidate.compress(data)
+        if termination_sequence and termination_sequence in compressed:
+            continue
+        if best is None or len(compressed) < len(best):
+            best = compressed
+    if best is None:
+        raise SteganograpyException("Compressed data contains the termination sequence, use length prefixed data.")
+    return best
+
+
+def iter_decompress(chunks):
+    """
+    Decompress data made by compress_payload a chunk at a time
+    :param chunks: an iterable of strings that join to the codec id and compressed data
+    :return: a generator of strings that join to the decompressed data
+    """
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            if not chunk:
+                continue
+            codec_id = ord(chunk[0])
+            if codec_id not in codec_ids:
+                raise SteganograpyException("Data was compressed with unknown codec id {}".format(codec_id))
+            decompressor = codec_ids[codec_id].decompressor()
+            chunk = chunk[1:]
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if decompressor is None:
+        raise SteganograpyException("Data has no compression codec id.")
+    if hasattr(decompressor, 'flush'):
+        data = decompressor.flush()
+        if data:
+            yield data
+
+
+def decompress_payload(data):
+    """
+    Decompress data made by compress_payload
+    """
+    return ''.join(iter_decompress([data]))
@@ -0,0 +1,98 @@
+import struct
+from collections import namedtuple
+
+from steganography import SteganograpyException
+
+try:
+    from numpy_steganography import NumpyForwardSteganography as HeaderSteganography
+except ImportError:
+    from bytes_steganography import BytesForwardSteganography as HeaderSteganography
+
+CONFIG_MAGIC = 'SGPY'
+CONFIG_VERSION = 1
+
+# Config header: magic, format version, flags and the number of channels, followed by a byte per
+# channel of the bits it holds. It is written at 1 bit per channel, forward, in the first pixels.
+CONFIG_HEADER_FORMAT = '>4sBBB'
+CONFIG_HEADER_SIZE = struct.calcsize(CONFIG_HEADER_FORMAT)
+
+FORWARD_FLAG = 1
+LENGTH_PREFIXED_FLAG = 2
+COMPRESSED_FLAG = 4
+KEYED_FLAG = 8
+CHECKSUMMED_FLAG = 16
+
+# The encoding policy recorded in a config header. keyed records whether the data is scattered by a
+# key, but never the key itself.
+Config = namedtuple('Config', ['color_bits', 'forward', 'length_prefixed', 'compressed', 'keyed', 'checksummed'])
+Config.__new__.__defaults__ = (False, False)
+
+
+class NoConfigHeader(SteganograpyException):
+    """The image does not start with a config header"""
+    pass
+
+
+def get_config_header_pixels(num_channels):
+    """
+    Get the number of pixels a config header takes, which the data follows
+    :param num_channels: the number of channels in each pixel
+    """
+    return -(-(CONFIG_HEADER_SIZE + num_channels) * 8 // num_channels)
+
+
+def pack_config_header(config):
+    flags = (FORWARD_FLAG if config.forward else 0) | (LENGTH_PREFIXED_FLAG if config.length_prefixed else 0) | \
+        (COMPRESSED_FLAG if config.compressed else 0) | (KEYED_FLAG if config.keyed else 0) | \
+        (CHECKSUMMED_FLAG if config.checksummed else 0)
+    header = struct.pack(CONFIG_HEADER_FORMAT, CONFIG_MAGIC, CONFIG_VERSION, flags, len(config.color_bits))
+    return header + ''.join(chr(bits_used) for bits_used in config.color_bits)
+
+
+def unpack_config_header(header):
+    magic, version, flags, num_channels = struct.unpack(CONFIG_HEADER_FORMAT, header[:CONFIG_HEADER_SIZE])
+    if magic != CONFIG_MAGIC:
+        raise NoConfigHeader("Image has no config header.")
+    if version > CONFIG_VERSION:
+        raise SteganograpyException("Config header is version {} but only up to {} is supported".format(
+            version, CONFIG_VERSION))
+    if num_channels == 0:
+        # No image has zero channels, so these bytes only look like a header
+        raise NoConfigHeader("Config header is corrupt.")
+    color_bits = [ord(bits_used) for bits_used in header[CONFIG_HEADER_SIZE:CONFIG_HEADER_SIZE + num_channels]]
+    if len(color_bits) != num_channels or max(color_bits) > 16:
+        raise SteganograpyException("Config header is corrupt.")
+    return Config(color_bits, bool(flags & FORWARD_FLAG), bool(flags & LENGTH_PREFIXED_FLAG),
+                  bool(flags & COMPRESSED_FLAG), bool(flags & KEYED_FLAG), bool(flags & CHECKSUMMED_FLAG))
+
+
+def write_config_header(image, config):
+    """
+    Write a config header into the first pixels of an image, in place
+    :param image: a PIL Image object, which is modified
+    :param config: the Config to record
+    :return: the image
+    """
+    num_channels = len(image.getbands())
+    header_pixels = get_config_header_pixels(num_channels)
+    width = image.size[0]
+    if header_pixels > width * image.size[1]:
+        raise SteganograpyException("Image to small to hold a config header.")
+    band = image.crop((0, 0, width, -(-header_pixels // width)))
+    image.paste(HeaderSteganography([1] * num_channels).embed_data(pack_config_header(config), band), (0, 0))
+    return image
+
+
+def read_config_header(image):
+    """
+    Read the config header from the first pixels of an image
+    :param image: a PIL Image object, or any image object a decoder takes
+    :return: the Config recorded in the header
+    :raises NoConfigHeader: if the image does not start with a config header
+    """
+    num_channels = len(image.getbands())
+    header_pixels = get_config_header_pixels(num_channels)
+    if header_pixels > image.size[0] * image.size[1]:
+        raise NoConfigHeader("Image to small to hold a config header.")
+    header = HeaderSteganography([1] * num_channels).read_bytes(image, CONFIG_HEADER_SIZE + num_channels)
+    return unpack_config_header(header)
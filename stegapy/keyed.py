@@ -0,0 +1,145 @@
+import hashlib
+import numpy as np
+
+from steganography import ForwardSteganography, BackwardSteganography, SteganograpyException, LRUCache
+from numpy_steganography import NumpySteganography, get_pixel_array, iter_pixel_bands, bytes_to_bits, embed_bits
+from metrics import Metrics
+
+# The most pixel orders to keep
+MAX_PERMUTATIONS = 8
+
+# The most bytes of pixel orders to keep, each holding 4 bytes per pixel of its image. This is a
+# 64 megapixel image's order, and an order for a larger image is built each time it is used.
+MAX_PERMUTATION_BYTES = 256 << 20
+
+# The pixel order for each recently used (key, pixel_count), see get_permutation. Set its max_bytes
+# to change how much memory the orders may hold.
+permutations = LRUCache(MAX_PERMUTATIONS, MAX_PERMUTATION_BYTES, lambda order: order.nbytes)
+
+
+def get_seed(key):
+    """
+    Turn a key into a seed for numpy's random number generator
+    :param key: a string, or a unicode string which is encoded as UTF-8
+    :return: a uint32 array of the seed words
+    """
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return np.frombuffer(hashlib.sha256(key).digest(), dtype='<u4')
+
+
+def get_permutation(key, pixel_count):
+    """
+    Get the order a key scatters data over pixels in, building it on first use
+    :param key: the key string
+    :param pixel_count: the number of pixels the data can be written to
+    :return: a read only array of the pixel_count pixel positions in the order they hold data
+    """
+    return permutations.get((key, pixel_count), lambda: build_permutation(key, pixel_count))
+
+
+def build_permutation(key, pixel_count):
+    # Shuffled in place, the same as RandomState.permutation but without its int64 array
+    order = np.arange(pixel_count, dtype=np.uint32 if pixel_count <= 1 << 32 else np.int64)
+    np.random.RandomState(get_seed(key)).shuffle(order)
+    order.flags.writeable = False
+    return order
+
+
+class KeyedSteganography(NumpySteganography):
+    """
+    Steganography that scatters the data over the pixels in an order chosen by a key, rather than
+    filling them in raster order. The data can only be found again with the same key. The pixels
+    before pixel_offset are left in raster order for a config header.
+    """
+
+    def __init__(self, color_bits, key, **kwargs):
+        super(KeyedSteganography, self).__init__(color_bits, **kwargs)
+        self.key = key
+
+    def get_order(self, image):
+        """
+        Get the order the pixels of an image from pixel_offset on hold data in
+        """
+        return get_permutation(self.key, max(0, image.size[0] * image.size[1] - self.pixel_offset))
+
+    def embed_data(self, data, image, metrics=None):
+        """
+        Encode a string of bytes, already framed and checked to fit, into an image file.
+        :param data: the string of bytes to encode
+        :param image: a PIL Image object to use as the original image to encode into
+        :param metrics: a Metrics object to record the work in
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        metrics = metrics or Metrics('encode')
+        color_bits = self.get_color_bits_used()
+        pixels = get_pixel_array(image, len(color_bits))
+        metrics.allocated(pixels.nbytes)
+        metrics.lap('pixels')
+
+        bits = bytes_to_bits(data)
+        metrics.bits += len(bits)
+        metrics.allocated(bits.nbytes)
+        metrics.lap('bits')
+
+        order = self.get_order(image)[:-(-len(bits) // max(1, sum(color_bits)))]
+        metrics.lap('order')
+
+        # The data pixels are gathered in key order, written like a run of pixels and put back
+        data_pixels = pixels[self.pixel_offset:]
+        scattered = data_pixels[order]
+        metrics.pixels += embed_bits(scattered, bits, color_bits, self.forward)
+        data_pixels[order] = scattered
+        metrics.allocated(scattered.nbytes)
+        metrics.lap('embed')
+
+        out_image = image.copy()
+        out_image.frombytes(pixels.tobytes())
+        metrics.allocated(2 * pixels.nbytes)
+        metrics.lap('copy')
+        progress = self.new_progress(image)
+        if progress:
+            progress.update(progress.total)
+        return out_image
+
+    def iter_data_pixels(self, image, stop=None):
+        """
+        Get the pixels that hold data, in the order the data was written to them, a band at a time
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :return: a generator of (pixel_count, len(color_bits)) arrays
+        """
+        pixel_count = image.size[0] * image.size[1]
+        # The data may be anywhere so the whole image is read, in a single band
+        bands = list(iter_pixel_bands(image, len(self.get_color_bits_used()), pixel_count, start=self.pixel_offset))
+        if not bands:
+            return
+        pixels = np.concatenate(bands) if len(bands) > 1 else bands[0]
+        order = self.get_order(image)
+        if stop is not None:
+            order = order[:max(0, stop - self.pixel_offset)]
+        for start in xrange(0, len(order), self.band_pixels):
+            yield pixels[order[start:start + self.band_pixels]]
+
+    def get_data_positions(self, image, indexes):
+        """
+        Get the raster positions of data pixels
+        :param image: the image the data is encoded in
+        :param indexes: an array of the indexes of pixels in the order they hold data
+        :return: an array of the raster positions of those pixels
+        """
+        return self.get_order(image)[indexes].astype(np.int64) + self.pixel_offset
+
+    def encode_in_place(self, encode_data, image):
+        raise SteganograpyException("Keyed encoding can't be done in place, use encode.")
+
+    def encode_stream(self, stream, image, data_length=None):
+        raise SteganograpyException("Keyed encoding needs all of the image at once, read the stream and use encode.")
+
+
+class KeyedForwardSteganography(KeyedSteganography, ForwardSteganography):
+    pass
+
+
+class KeyedBackwardSteganography(KeyedSteganography, BackwardSteganography):
+    pass
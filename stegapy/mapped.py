@@ -0,0 +1,165 @@
+import struct
+import numpy as np
+from PIL import Image
+
+from steganography import SteganograpyException
+from scanline import UnsupportedImage
+
+NPY_MAGIC = '\x93NUMPY'
+
+# The PIL mode of an image with each number of channels
+CHANNEL_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+
+def read_ppm_header(fp):
+    """
+    Read the header of a binary PPM or PGM file
+    :param fp: a file object at the start of the file
+    :return: a tuple of (width, height, channels, pixel data offset)
+    """
+    magic = fp.read(2)
+    if magic not in ('P5', 'P6'):
+        raise UnsupportedImage("Not a binary PPM or PGM file")
+    fields = []
+    while len(fields) < 3:
+        char = fp.read(1)
+        if char == '#':
+            fp.readline()
+        elif char.isdigit():
+            field = char
+            while True:
+                char = fp.read(1)
+                if not char.isdigit():
+                    break
+                field += char
+            fields.append(int(field))
+        elif not char.isspace():
+            raise UnsupportedImage("Bad PPM header")
+    # A single whitespace character after the maximum value, which has just been read, ends the header
+    width, height, max_value = fields
+    if max_value != 255:
+        raise UnsupportedImage("Only 8 bit PPM files are supported")
+    return width, height, 3 if magic == 'P6' else 1, fp.tell()
+
+
+def read_bmp_header(fp):
+    """
+    Read the headers of an uncompressed 24 bit BMP file
+    :param fp: a file object at the start of the file
+    :return: a tuple of (width, height, top_down, pixel data offset)
+    """
+    header = fp.read(34)
+    if header[:2] != 'BM':
+        raise UnsupportedImage("Not a BMP file")
+    if len(header) < 34:
+        raise UnsupportedImage("Truncated BMP header")
+    offset, info_size, width, height, _, bits_per_pixel, compression = struct.unpack('<10xIIiiHHI', header)
+    if info_size < 40 or bits_per_pixel != 24 or compression != 0:
+        raise UnsupportedImage("Only uncompressed 24 bit BMP files are supported")
+    return width, abs(height), height < 0, offset
+
+
+class MappedImage(object):
+    """
+    A BMP, PPM, PGM or .npy image whose pixels are memory mapped from its file rather than loaded,
+    so data can be embedded into it in place and decoded without reading the whole file. The array
+    attribute is a (height, width, channels) view of the pixels in RGB order. It has the size, mode,
+    getbands and crop of a PIL Image, which is all the decoders use.
+    """
+
+    def __init__(self, filename, mode='r'):
+        """
+        :param filename: the name of the image file
+        :param mode: 'r' to read, 'r+' to write changes back to the file, or 'c' to keep changes in a
+        copy-on-write mapping that only copies the pages written to
+        :raises UnsupportedImage: if the file isn't a format that can be mapped
+        """
+        if mode not in ('r', 'r+', 'c'):
+            raise SteganograpyException("Unknown mapping mode {}".format(mode))
+        self.filename = filename
+        with open(filename, 'rb') as fp:
+            magic = fp.read(len(NPY_MAGIC))
+            fp.seek(0)
+            if magic == NPY_MAGIC:
+                array = self._map_npy(mode)
+            elif magic[:2] == 'BM':
+                width, height, top_down, offset = read_bmp_header(fp)
+                array = self._map_rows(mode, offset, width, height, 3)
+                # Rows are stored bottom up unless the height is negative, and pixels are BGR
+                array = array[:, :, ::-1] if top_down else array[::-1, :, ::-1]
+            else:
+                width, height, channels, offset = read_ppm_header(fp)
+                array = self._map_rows(mode, offset, width, height, channels, 1)
+        self.array = array
+        self.size = (array.shape[1], array.shape[0])
+        self.mode = CHANNEL_MODES[array.shape[2]]
+
+    def _map_npy(self, mode):
+        array = np.load(self.filename, mmap_mode=mode)
+        if array.dtype != np.uint8 or array.ndim not in (2, 3):
+            raise UnsupportedImage("Only 2 or 3 dimensional uint8 arrays are supported")
+        if array.ndim == 2:
+            array = array[:, :, np.newaxis]
+        if array.shape[2] not in CHANNEL_MODES:
+            raise UnsupportedImage("Arrays with {} channels are not supported".format(array.shape[2]))
+        self.map = array
+        return array
+
+    def _map_rows(self, mode, offset, width, height, channels, row_alignment=4):
+        row_size = width * channels
+        stride = -(-row_size // row_alignment) * row_alignment
+        self.map = np.memmap(self.filename, dtype=np.uint8, mode=mode, offset=offset, shape=(height, stride))
+        return self.map[:, :row_size].reshape(height, width, channels)
+
+    def getbands(self):
+        return tuple(self.mode)
+
+    def crop(self, box):
+        """
+        Get whole rows of the image
+        :param box: a (0, top, width, bottom) tuple, as for a PIL Image
+        :return: a PIL Image object of the rows
+        """
+        left, top, right, bottom = box
+        if (left, right) != (0, self.size[0]):
+            raise SteganograpyException("Only whole rows can be read from a mapped image")
+        rows = self.array[top:bottom]
+        return Image.frombytes(self.mode, (self.size[0], len(rows)), np.ascontiguousarray(rows).tobytes())
+
+    def to_image(self):
+        """
+        Copy the pixels into a PIL Image object
+        """
+        return self.crop((0, 0) + self.size)
+
+    def flush(self):
+        """
+        Write any changes made in 'r+' mode to the file
+        """
+        if isinstance(self.map, np.memmap):
+            self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map = self.array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_mapped_image(im_dec, mode='r'):
+    """
+    Open an image file as a MappedImage if its format can be mapped
+    :param im_dec: an image file name, or anything else, which is returned as is
+    :param mode: the mapping mode, see MappedImage
+    :return: a MappedImage, or im_dec if it can't be mapped
+    """
+    if not isinstance(im_dec, basestring):
+        return im_dec
+    try:
+        return MappedImage(im_dec, mode)
+    except UnsupportedImage:
+        return im_dec
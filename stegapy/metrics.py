@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+
+class Metrics(object):
+    """
+    Measurements of one encode or decode: the seconds spent in each phase, the pixels and data bits
+    processed, and the bytes allocated for the large buffers such as bit arrays and image copies
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.phases = OrderedDict()
+        self.pixels = 0
+        self.bits = 0
+        self.bytes_allocated = 0
+        self.seconds = None
+        self.start = self.last_lap = time.time()
+
+    def lap(self, phase):
+        """
+        Add the time since the last lap, or the start, to a phase
+        :param phase: the name of the phase that just finished
+        """
+        now = time.time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last_lap
+        self.last_lap = now
+
+    def allocated(self, size):
+        self.bytes_allocated += size
+
+    def finish(self):
+        self.seconds = time.time() - self.start
+        return self
+
+    def as_dict(self):
+        return {
+            'operation': self.operation,
+            'seconds': self.seconds,
+            'phases': dict(self.phases),
+            'pixels': self.pixels,
+            'bits': self.bits,
+            'bytes_allocated': self.bytes_allocated,
+        }
+
+    def __repr__(self):
+        phases = ', '.join('{}={:.4f}s'.format(phase, seconds) for phase, seconds in self.phases.items())
+        return '<Metrics {} {} pixels {} bits {} bytes allocated: {}>'.format(
+            self.operation, self.pixels, self.bits, self.bytes_allocated, phases)
+
+
+class Progress(object):
+    """Calls callback(pixels_done, pixels_total) each time at least interval more pixels are done, and at the end"""
+
+    def __init__(self, callback, total, interval):
+        self.callback = callback
+        self.total = total
+        self.interval = interval
+        self.reported = 0
+
+    def update(self, done):
+        if done - self.reported >= self.interval or (done >= self.total and done != self.reported):
+            self.reported = done
+            self.callback(done, self.total)
@@ -0,0 +1,462 @@
+import itertools
+import struct
+import numpy as np
+from PIL import Image
+
+from steganography import ForwardSteganography, BackwardSteganography, SteganograpyException, \
+    FileTooLargeException, LENGTH_HEADER_FORMAT, LENGTH_HEADER_SIZE, CHECKSUM_SIZE, get_channel_depth, \
+    iter_checksummed
+from metrics import Metrics
+from banded import BandedSteganography, DECODE_BAND_PIXELS
+
+# The number of pixels to encode at a time when encoding a stream of data
+ENCODE_BAND_PIXELS = 1 << 16
+
+# The layout of a channel in the raw data of the image modes that don't have a byte per channel
+CHANNEL_DTYPES = {'I;16': '<u2', 'I;16L': '<u2', 'I;16B': '>u2', 'I': '=i4'}
+
+
+def get_channel_dtype(mode):
+    """
+    Get the numpy dtype of a channel in the raw data of an image mode
+    :param mode: a PIL image mode
+    """
+    get_channel_depth(mode)
+    return np.dtype(CHANNEL_DTYPES.get(mode, np.uint8))
+
+
+def get_pixel_array(image, num_channels, writable=True):
+    """
+    Get the pixel data of an image as an array
+    :param image: a PIL Image object
+    :param num_channels: the number of channels the encoding policy expects per pixel
+    :param writable: if False the array may be read only, which saves a copy
+    :return: a (pixel_count, num_channels) numpy array in raster order, of the dtype of the image's channels
+    """
+    bands = len(image.getbands())
+    if bands != num_channels:
+        raise SteganograpyException("Image has {} channels but the encoding uses {}".format(bands, num_channels))
+    pixels = np.frombuffer(image.tobytes(), dtype=get_channel_dtype(image.mode)).reshape(-1, num_channels)
+    return pixels.copy() if writable else pixels
+
+
+def iter_pixel_bands(image, num_channels, band_pixels=DECODE_BAND_PIXELS, stop=None, start=0):
+    """
+    Get the pixel data of an image a band of whole rows at a time
+    :param image: a PIL Image object
+    :param num_channels: the number of channels the encoding policy expects per pixel
+    :param band_pixels: the approximate number of pixels in each band
+    :param stop: if given, the raster position of the pixel to stop before
+    :param start: the raster position of the first pixel, which the first band is cut to start at
+    :return: a generator of read only (pixel_count, num_channels) arrays in raster order
+    """
+    width, height = image.size
+    if width == 0:
+        return
+    if stop is not None:
+        height = min(height, -(-stop // width))
+    rows = max(1, band_pixels // width)
+    for top in xrange(start // width, height, rows):
+        bottom = min(top + rows, height)
+        pixels = get_pixel_array(image.crop((0, top, width, bottom)), num_channels, writable=False)
+        if stop is not None and bottom * width > stop:
+            pixels = pixels[:stop - top * width]
+        if top * width < start:
+            pixels = pixels[start - top * width:]
+        yield pixels
+
+
+def iter_stream_chunks(stream, chunk_size):
+    """
+    Get the data from a stream in chunks
+    :param stream: a file-like object with a read method, or an iterable of strings
+    :param chunk_size: the number of bytes to read at a time from a file-like object
+    :return: an iterator of strings
+    """
+    if hasattr(stream, 'read'):
+        return iter(lambda: stream.read(chunk_size), '')
+    return iter(stream)
+
+
+def bytes_to_bits(data):
+    """
+    Expand a string of bytes into an array of bits, most significant bit of each byte first
+    :param data: a string of bytes
+    :return: a uint8 numpy array holding a 0 or 1 per bit
+    """
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def pack_channel_bits(bits, color_bits, forward, dtype=np.uint8):
+    """
+    Pack rows of data bits into the values to be written into the low bits of each channel
+    :param bits: a (pixel_count, sum(color_bits)) array of data bits, one row per pixel
+    :param color_bits: the number of bits used in each channel
+    :param forward: True if the first data bit goes into the highest used bit of a channel,
+    False if it goes into bit 0
+    :param dtype: the dtype of the channels
+    :return: a (pixel_count, len(color_bits)) array of channel values
+    """
+    dtype = np.dtype(dtype).newbyteorder('=')
+    values = np.zeros((bits.shape[0], len(color_bits)), dtype=dtype)
+    offset = 0
+    for channel, bits_used in enumerate(color_bits):
+        for bit in xrange(bits_used):
+            shift = bits_used - 1 - bit if forward else bit
+            values[:, channel] |= np.left_shift(bits[:, offset + bit], shift, dtype=dtype)
+        offset += bits_used
+    return values
+
+
+def extract_bits(pixels, color_bits, forward):
+    """
+    Read the data bits out of the low bits of a pixel array
+    :param pixels: a (pixel_count, len(color_bits)) array
+    :param color_bits: the number of bits used in each channel
+    :param forward: the bit order within a channel, see pack_channel_bits
+    :return: a uint8 array of pixel_count * sum(color_bits) data bits
+    """
+    bits = np.empty((pixels.shape[0], sum(color_bits)), dtype=np.uint8)
+    offset = 0
+    for channel, bits_used in enumerate(color_bits):
+        for bit in xrange(bits_used):
+            shift = bits_used - 1 - bit if forward else bit
+            bits[:, offset + bit] = (pixels[:, channel] >> shift) & 1
+        offset += bits_used
+    return bits.ravel()
+
+
+def get_clear_masks(color_bits, dtype=np.uint8):
+    """
+    Get the masks that clear the data bits from each channel
+    :param color_bits: the number of bits used in each channel
+    :param dtype: the dtype of the channels
+    :return: an array with one mask per channel
+    """
+    return np.invert(np.array([(1 << bits_used) - 1 for bits_used in color_bits], dtype=dtype))
+
+
+def embed_bits(pixels, bits, color_bits, forward):
+    """
+    Write data bits into the low bits of a pixel array in place, starting at its first pixel.
+    Channels after the last data bit are left untouched, and a channel that only partly
+    holds data bits is padded with 0 bits.
+    :param pixels: a writable (pixel_count, len(color_bits)) array
+    :param bits: a uint8 array of data bits
+    :param color_bits: the number of bits used in each channel
+    :param forward: the bit order within a channel, see pack_channel_bits
+    :return: the number of pixels that were modified
+    """
+    bits_per_pix = sum(color_bits)
+    if len(bits) == 0 or bits_per_pix == 0:
+        return 0
+    pixels_used = -(-len(bits) // bits_per_pix)
+    padded = np.zeros(pixels_used * bits_per_pix, dtype=np.uint8)
+    padded[:len(bits)] = bits
+    values = pack_channel_bits(padded.reshape(pixels_used, bits_per_pix), color_bits, forward, pixels.dtype)
+
+    used = pixels[:pixels_used]
+    last_pixel = used[-1].copy()
+    used &= get_clear_masks(color_bits, pixels.dtype)
+    used |= values
+
+    # Only channels whose first bit position falls inside the data are written in the last pixel
+    last_start = (pixels_used - 1) * bits_per_pix
+    offset = 0
+    for channel, bits_used in enumerate(color_bits):
+        if last_start + offset >= len(bits):
+            used[-1, channel] = last_pixel[channel]
+        offset += bits_used
+    return pixels_used
+
+
+def write_pixels(image, positions, values):
+    """
+    Overwrite some pixels of an image in place
+    :param image: a PIL Image object, or a MappedImage object opened in 'r+' or 'c' mode
+    :param positions: an array of the raster positions of the pixels to write
+    :param values: a (len(positions), num_channels) array of the new pixel values
+    """
+    width = image.size[0]
+    if hasattr(image, 'array'):
+        image.array[positions // width, positions % width] = values
+        return
+    access = image.load()
+    single_band = values.shape[1] == 1
+    for position, value in itertools.izip(positions.tolist(), values.tolist()):
+        access[position % width, position // width] = value[0] if single_band else tuple(value)
+
+
+class NumpySteganography(BandedSteganography):
+    """
+    Steganography on whole pixel arrays at once rather than pixel by pixel. The output is bit
+    identical to SimpleSteganography for the same color_bits and bit order.
+    """
+
+    def embed_data(self, data, image, metrics=None):
+        """
+        Encode a string of bytes, already framed and checked to fit, into an image file.
+        :param data: the string of bytes to encode
+        :param image: a PIL Image object to use as the original image to encode into
+        :param metrics: a Metrics object to record the work in
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        metrics = metrics or Metrics('encode')
+        color_bits = self.get_color_bits_used()
+        pixels = get_pixel_array(image, len(color_bits))
+        metrics.allocated(pixels.nbytes)
+        metrics.lap('pixels')
+
+        bits = bytes_to_bits(data)
+        metrics.bits += len(bits)
+        metrics.allocated(bits.nbytes)
+        metrics.lap('bits')
+
+        metrics.pixels += embed_bits(pixels[self.pixel_offset:], bits, color_bits, self.forward)
+        metrics.lap('embed')
+
+        out_image = image.copy()
+        out_image.frombytes(pixels.tobytes())
+        metrics.allocated(2 * pixels.nbytes)
+        metrics.lap('copy')
+        progress = self.new_progress(image)
+        if progress:
+            progress.update(progress.total)
+        return out_image
+
+    def encode_in_place(self, encode_data, image):
+        """
+        Encode text data straight into the pixels of a memory mapped image, a band of rows at a time,
+        without copying the image. Only the rows holding data are touched.
+        :param encode_data: a string of the data to be encoded in the image
+        :param image: a MappedImage object opened in 'r+' or 'c' mode
+        :return: the MappedImage object
+        """
+        metrics = Metrics('encode')
+        color_bits = self.get_color_bits_used()
+        bits_per_pix = sum(color_bits)
+        self.check_image(image)
+        encode_data = self.frame_data(self.add_checksum(self.compress_data(encode_data)))
+        if not self.data_fits(len(encode_data) * 8, image):
+            raise FileTooLargeException("Image to small for current settings.")
+        metrics.lap('frame')
+
+        bits = bytes_to_bits(encode_data)
+        metrics.bits += len(bits)
+        metrics.allocated(bits.nbytes)
+        metrics.lap('bits')
+
+        width = image.size[0]
+        band_bits = max(1, ENCODE_BAND_PIXELS // width) * width * bits_per_pix
+        for band_start in xrange(0, len(bits), band_bits):
+            first_pixel = self.pixel_offset + band_start // bits_per_pix
+            top = first_pixel // width
+            rows = image.array[top:-(-(first_pixel + band_bits // bits_per_pix) // width)]
+            # A view when the mapped rows are contiguous, otherwise a copy of just this band
+            pixels = rows.reshape(-1, len(color_bits))
+            metrics.pixels += embed_bits(pixels[first_pixel - top * width:], bits[band_start:band_start + band_bits],
+                                         color_bits, self.forward)
+            if not np.may_share_memory(pixels, rows):
+                rows[...] = pixels.reshape(rows.shape)
+                metrics.allocated(pixels.nbytes)
+        metrics.lap('embed')
+        image.flush()
+        metrics.lap('flush')
+        self.report_metrics(metrics)
+        return image
+
+    def update(self, encode_data, image):
+        """
+        Replace the data encoded in an image with new data, in place. The pixels the new data covers
+        are read and only those whose bits change are written, so an update that changes little of
+        the data touches few pixels. Any old data past the end of the new data is left, as the new
+        length header or termination sequence marks where the data ends.
+        :param encode_data: a string of the new data
+        :param image: a PIL Image object, or a MappedImage object opened in 'r+' or 'c' mode, already
+        encoded with this encoding policy
+        :return: the number of pixels that were written
+        """
+        metrics = Metrics('update')
+        self.check_image(image)
+        color_bits = self.get_color_bits_used()
+        encode_data = self.frame_data(self.add_checksum(self.compress_data(encode_data)))
+        if not self.data_fits(len(encode_data) * 8, image):
+            raise FileTooLargeException("Image to small for current settings.")
+        metrics.lap('frame')
+
+        bits = bytes_to_bits(encode_data)
+        metrics.bits += len(bits)
+        metrics.allocated(bits.nbytes)
+        metrics.lap('bits')
+
+        pixels_used = -(-len(bits) // sum(color_bits)) if len(bits) else 0
+        bands = list(self.iter_data_pixels(image, self.pixel_offset + pixels_used))
+        current = np.concatenate(bands) if bands else np.zeros((0, len(color_bits)), dtype=np.uint8)
+        metrics.allocated(current.nbytes)
+        metrics.lap('read')
+
+        target = current.copy()
+        embed_bits(target, bits, color_bits, self.forward)
+        changed = np.flatnonzero((target != current).any(axis=1))
+        metrics.allocated(target.nbytes)
+        metrics.lap('diff')
+
+        write_pixels(image, self.get_data_positions(image, changed), target[changed])
+        if hasattr(image, 'flush'):
+            image.flush()
+        metrics.pixels += len(changed)
+        metrics.lap('write')
+        self.report_metrics(metrics)
+        return len(changed)
+
+    def get_data_positions(self, image, indexes):
+        """
+        Get the raster positions of data pixels
+        :param image: the image the data is encoded in
+        :param indexes: an array of the indexes of pixels in the order they hold data
+        :return: an array of the raster positions of those pixels
+        """
+        return indexes + self.pixel_offset
+
+    def encode_stream(self, stream, image, data_length=None):
+        """
+        Encode data from a stream into an image file a band of rows at a time, so only about a band's
+        worth of the data is held in memory at once.
+        :param stream: a file-like object with a read method, or an iterable of strings
+        :param image: a PIL Image object to use as the original image to encode into
+        :param data_length: the number of bytes in the stream, required when length prefixed
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        if self.checksum and not self.length_prefixed:
+            raise SteganograpyException("Checksummed streams must be length prefixed.")
+        if self.compression is not None:
+            raise SteganograpyException("Streams can't be compressed, compress the stream before encoding it.")
+        metrics = Metrics('encode')
+        self.check_image(image)
+        progress = self.new_progress(image)
+        color_bits = self.get_color_bits_used()
+        bits_per_pix = sum(color_bits)
+        width, height = image.size
+        band_rows = max(1, ENCODE_BAND_PIXELS // max(1, width))
+        band_bits = band_rows * width * bits_per_pix
+
+        chunks = iter_stream_chunks(stream, -(-band_bits // 8) or 1)
+        if self.length_prefixed:
+            if data_length is None:
+                raise SteganograpyException("The data length is required to length prefix a stream.")
+            chunks = self._check_stream_length(chunks, data_length)
+            if self.checksum:
+                chunks = iter_checksummed(chunks)
+                data_length += CHECKSUM_SIZE
+            if not self.data_fits((LENGTH_HEADER_SIZE + data_length) * 8, image):
+                raise FileTooLargeException("Image to small for current settings.")
+            chunks = itertools.chain([struct.pack(LENGTH_HEADER_FORMAT, data_length)], chunks)
+        else:
+            if data_length is not None and not self.data_fits(
+                    (data_length + len(self.termination_sequence)) * 8, image):
+                raise FileTooLargeException("Image to small for current settings.")
+            chunks = itertools.chain(chunks, [self.termination_sequence])
+        metrics.lap('frame')
+
+        out_image = image.copy()
+        metrics.allocated(len(out_image.getbands()) * width * height)
+        metrics.lap('copy')
+        # Bits read from the stream that have not been encoded yet
+        pending_bits = np.zeros(0, dtype=np.uint8)
+        for top in xrange(0, height, band_rows):
+            band_data = []
+            pending_count = len(pending_bits)
+            for chunk in chunks:
+                band_data.append(chunk)
+                pending_count += len(chunk) * 8
+                if pending_count >= band_bits:
+                    break
+            pending_bits = np.concatenate((pending_bits, bytes_to_bits(''.join(band_data))))
+            metrics.allocated(pending_bits.nbytes)
+            metrics.lap('read')
+            if len(pending_bits) == 0:
+                break
+
+            bottom = min(top + band_rows, height)
+            band = image.crop((0, top, width, bottom))
+            pixels = get_pixel_array(band, len(color_bits))
+            metrics.allocated(pixels.nbytes)
+            metrics.lap('pixels')
+            # The last band may have fewer rows than the others, and the first may start after pixel_offset
+            skip = min(len(pixels), max(0, self.pixel_offset - top * width))
+            band_capacity = (len(pixels) - skip) * bits_per_pix
+            embedded_bits = pending_bits[:band_capacity]
+            metrics.pixels += embed_bits(pixels[skip:], embedded_bits, color_bits, self.forward)
+            metrics.bits += len(embedded_bits)
+            pending_bits = pending_bits[band_capacity:]
+            metrics.lap('embed')
+            out_image.paste(Image.frombytes(band.mode, band.size, pixels.tobytes()), (0, top))
+            metrics.lap('paste')
+            if progress:
+                progress.update(bottom * width)
+
+        if len(pending_bits) or any(chunks):
+            raise FileTooLargeException("Image to small for current settings.")
+        self.report_metrics(metrics)
+        return out_image
+
+    @staticmethod
+    def _check_stream_length(chunks, data_length):
+        """
+        Pass chunks of a stream through, checking they add up to the expected length
+        """
+        total = 0
+        for chunk in chunks:
+            total += len(chunk)
+            if total > data_length:
+                raise SteganograpyException("Stream is longer than the given data length.")
+            yield chunk
+        if total != data_length:
+            raise SteganograpyException("Stream is shorter than the given data length.")
+
+    def iter_bytes(self, image, stop=None, metrics=None):
+        """
+        Read the bytes encoded in an image a band of rows at a time
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings of whole bytes, in order
+        """
+        metrics = metrics or Metrics('decode')
+        progress = self.new_progress(image)
+        color_bits = self.get_color_bits_used()
+        # Bits left over from the previous band that did not make up a whole byte
+        partial_bits = np.zeros(0, dtype=np.uint8)
+        pixels_done = 0
+        for pixels in self.iter_data_pixels(image, stop):
+            pixels_done += len(pixels)
+            metrics.pixels += len(pixels)
+            metrics.allocated(pixels.nbytes)
+            metrics.lap('read')
+            bits = np.concatenate((partial_bits, extract_bits(pixels, color_bits, self.forward)))
+            whole_bits = len(bits) - len(bits) % 8
+            partial_bits = bits[whole_bits:]
+            chunk = np.packbits(bits[:whole_bits]).tobytes()
+            metrics.bits += whole_bits
+            metrics.allocated(bits.nbytes + len(chunk))
+            metrics.lap('extract')
+            if progress:
+                progress.update(pixels_done)
+            yield chunk
+
+    def iter_data_pixels(self, image, stop=None):
+        """
+        Get the pixels that hold data, in the order the data was written to them, a band at a time
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :return: a generator of read only (pixel_count, len(color_bits)) arrays
+        """
+        return iter_pixel_bands(image, len(self.get_color_bits_used()), self.band_pixels, stop, self.pixel_offset)
+
+
+class NumpyForwardSteganography(NumpySteganography, ForwardSteganography):
+    pass
+
+
+class NumpyBackwardSteganography(NumpySteganography, BackwardSteganography):
+    pass
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from cStringIO import StringIO
+
+from steganography import SteganograpyException
+
+# Formats that store every pixel exactly, so the encoded data survives saving, and the image modes each
+# can store without dropping or converting a channel. A 16 bit image is saved to PNG and opened in mode I.
+LOSSLESS_FORMATS = OrderedDict([
+    ('PNG', ('L', 'LA', 'RGB', 'RGBA', 'I', 'I;16')),
+    ('BMP', ('L', 'RGB')),
+    ('PPM', ('L', 'RGB', 'I')),
+    ('TIFF', ('L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'LAB', 'I', 'I;16')),
+    ('TGA', ('L', 'LA', 'RGB', 'RGBA')),
+])
+
+# zlib compression levels for PNG output: FAST for latency sensitive callers, BEST for archiving
+FAST_COMPRESS_LEVEL = 1
+DEFAULT_COMPRESS_LEVEL = 6
+BEST_COMPRESS_LEVEL = 9
+
+# zlib strategies for PNG output, as in the zlib module
+DEFAULT_STRATEGY = 0
+FILTERED_STRATEGY = 1
+HUFFMAN_ONLY_STRATEGY = 2
+RLE_STRATEGY = 3
+FIXED_STRATEGY = 4
+
+
+def save_image(image, fp, format='PNG', compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False,
+               strategy=DEFAULT_STRATEGY):
+    """
+    Save an encoded image in a lossless format
+    :param image: a PIL Image object
+    :param fp: a file name or a file object opened for writing in binary mode
+    :param format: the image format, one of LOSSLESS_FORMATS that can store the image's mode
+    :param compress_level: the PNG zlib compression level from 0 (none) to 9 (smallest)
+    :param optimize: if True PIL searches for the smallest PNG, which is much slower
+    :param strategy: the PNG zlib compression strategy, such as RLE_STRATEGY
+    :raises SteganograpyException: if format is lossy or can't store the image's mode, as it would destroy
+    the encoded data
+    """
+    format = format.upper()
+    if format not in LOSSLESS_FORMATS:
+        raise SteganograpyException("{} is not a lossless format, use one of {}".format(
+            format, ', '.join(LOSSLESS_FORMATS)))
+    if image.mode not in LOSSLESS_FORMATS[format]:
+        raise SteganograpyException("{} can't store images in mode {}, use one of {}".format(
+            format, image.mode, ', '.join(name for name, modes in LOSSLESS_FORMATS.items() if image.mode in modes)))
+    if format == 'PNG':
+        image.save(fp, format, compress_level=compress_level, optimize=optimize, compress_type=strategy)
+    else:
+        image.save(fp, format)
+
+
+def image_to_bytes(image, format='PNG', compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False,
+                   strategy=DEFAULT_STRATEGY):
+    """
+    Save an encoded image in a lossless format to a string, see save_image
+    :return: a string of the image file
+    """
+    fp = StringIO()
+    save_image(image, fp, format, compress_level, optimize, strategy)
+    return fp.getvalue()
@@ -0,0 +1,209 @@
+import itertools
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
+from PIL import Image
+
+from steganography import ForwardSteganography, BackwardSteganography
+from numpy_steganography import NumpySteganography, iter_pixel_bands, embed_bits, extract_bits, get_channel_dtype
+from metrics import Metrics
+
+# Fewer pixels than this per worker are processed serially, as starting the workers would cost more
+MIN_WORKER_PIXELS = 1 << 18
+
+# The pixel data and encode data shared with the workers of the current pool
+_shared = {}
+
+
+def _init_worker(pixels, num_channels, dtype, data):
+    _shared['pixels'] = np.frombuffer(pixels, dtype=dtype).reshape(-1, num_channels)
+    _shared['data'] = None if data is None else np.frombuffer(data, dtype=np.uint8)
+
+
+def _embed_band(args):
+    """
+    Encode the data bits for the pixels [start, stop) of the data, which starts at the shared pixel offset
+    """
+    start, stop, color_bits, forward, bit_count, offset = args
+    bits_per_pix = sum(color_bits)
+    first_bit = start * bits_per_pix
+    last_bit = min(stop * bits_per_pix, bit_count)
+    byte_start = first_bit // 8
+    bits = np.unpackbits(_shared['data'][byte_start:-(-last_bit // 8)])
+    bits = bits[first_bit - byte_start * 8:last_bit - byte_start * 8]
+    embed_bits(_shared['pixels'][offset + start:offset + stop], bits, color_bits, forward)
+
+
+def _extract_band(args):
+    """
+    Decode the whole bytes held in the shared pixels [start, stop)
+    """
+    start, stop, color_bits, forward = args
+    bits = extract_bits(_shared['pixels'][start:stop], color_bits, forward)
+    return np.packbits(bits[:len(bits) - len(bits) % 8]).tobytes()
+
+
+def split_bands(pixel_count, band_pixels):
+    """
+    Split a run of pixels into bands
+    :param pixel_count: the number of pixels to split
+    :param band_pixels: the number of pixels in each band, rounded up to a multiple of 8 so that
+    every band starts on a byte boundary of the data whatever the number of bits per pixel
+    :return: a list of (start, stop) pixel positions
+    """
+    band_pixels = max(8, -(-band_pixels // 8) * 8)
+    return [(start, min(start + band_pixels, pixel_count)) for start in xrange(0, pixel_count, band_pixels)]
+
+
+def allocate_shared_pixels(mode, num_channels, pixel_count):
+    """
+    Allocate memory for pixels that can be shared with worker processes
+    :param mode: the mode of the image the pixels are from
+    :param num_channels: the number of channels the encoding policy expects per pixel
+    :param pixel_count: the number of pixels to hold
+    :return: a tuple of the shared array and a (pixel_count, num_channels) numpy view of it
+    """
+    dtype = get_channel_dtype(mode)
+    shared = RawArray('B', pixel_count * num_channels * dtype.itemsize)
+    return shared, np.frombuffer(shared, dtype=dtype).reshape(-1, num_channels)
+
+
+def copy_pixels(pixels, image, band_pixels, start, stop):
+    """
+    Copy the pixels [start, stop) of an image to the front of a pixel array
+    :param pixels: a (pixel_count, num_channels) array of at least stop - start pixels
+    :param image: a PIL Image object
+    :param band_pixels: the number of pixels to copy at a time
+    """
+    position = 0
+    for band in iter_pixel_bands(image, pixels.shape[1], band_pixels, stop, start):
+        pixels[position:position + len(band)] = band
+        position += len(band)
+
+
+def share_pixels(image, num_channels, pixel_count, band_pixels):
+    """
+    Copy the first pixels of an image into memory that can be shared with worker processes
+    :param image: a PIL Image object
+    :param num_channels: the number of channels the encoding policy expects per pixel
+    :param pixel_count: the number of pixels to copy
+    :param band_pixels: the number of pixels to copy at a time
+    :return: a tuple of the shared array and a (pixel_count, num_channels) numpy view of it
+    """
+    shared, pixels = allocate_shared_pixels(image.mode, num_channels, pixel_count)
+    copy_pixels(pixels, image, band_pixels, 0, pixel_count)
+    return shared, pixels
+
+
+class ParallelSteganography(NumpySteganography):
+    """
+    Steganography that splits the image into bands of rows and processes them in a pool of worker
+    processes. The pixel data is shared with the workers rather than sent to them, and the output
+    is bit identical to NumpySteganography.
+    """
+
+    def __init__(self, color_bits, workers=None, **kwargs):
+        super(ParallelSteganography, self).__init__(color_bits, **kwargs)
+        self.workers = workers or multiprocessing.cpu_count()
+
+    def embed_data(self, data, image, metrics=None):
+        """
+        Encode a string of bytes, already framed and checked to fit, into an image file.
+        :param data: the string of bytes to encode
+        :param image: a PIL Image object to use as the original image to encode into
+        :param metrics: a Metrics object to record the work in
+        :return: A PIL Image object that has the data encoded into the image.
+        """
+        color_bits = self.get_color_bits_used()
+        bit_count = len(data) * 8
+        pixels_used = -(-bit_count // sum(color_bits)) if bit_count else 0
+        if pixels_used < self.workers * MIN_WORKER_PIXELS:
+            return super(ParallelSteganography, self).embed_data(data, image, metrics)
+        metrics = metrics or Metrics('encode')
+
+        # Only the rows holding data are shared and written back
+        width = image.size[0]
+        rows_used = -(-(self.pixel_offset + pixels_used) // width)
+        shared_pixels, pixels = share_pixels(image, len(color_bits), rows_used * width, self.band_pixels)
+        shared_data = RawArray('B', len(data))
+        np.frombuffer(shared_data, dtype=np.uint8)[:] = np.frombuffer(data, dtype=np.uint8)
+        metrics.allocated(pixels.nbytes + len(data))
+        metrics.lap('share')
+
+        tasks = [(start, stop, color_bits, self.forward, bit_count, self.pixel_offset)
+                 for start, stop in split_bands(pixels_used, -(-pixels_used // self.workers))]
+        pool = multiprocessing.Pool(self.workers, _init_worker,
+                                    (shared_pixels, len(color_bits), pixels.dtype, shared_data))
+        try:
+            pool.map(_embed_band, tasks)
+        finally:
+            pool.terminate()
+        metrics.pixels += pixels_used
+        metrics.bits += bit_count
+        metrics.lap('embed')
+
+        out_image = image.copy()
+        out_image.paste(Image.frombytes(image.mode, (width, rows_used), pixels.tobytes()), (0, 0))
+        metrics.allocated(pixels.itemsize * len(image.getbands()) * image.size[0] * image.size[1] + 2 * pixels.nbytes)
+        metrics.lap('copy')
+        progress = self.new_progress(image)
+        if progress:
+            progress.update(progress.total)
+        return out_image
+
+    def iter_bytes(self, image, stop=None, metrics=None):
+        """
+        Read the bytes encoded in an image a band of rows at a time. The first pixels are read
+        serially, and only if the data goes on past them are the workers started and the rest of
+        the image shared with them a window at a time, so reading stops soon after the data ends.
+        :param image: a PIL Image object containing encoded data
+        :param stop: if given, the raster position of the pixel to stop reading before
+        :param metrics: a Metrics object to record the work in
+        :return: a generator of strings of whole bytes, in order
+        """
+        metrics = metrics or Metrics('decode')
+        pixel_count = image.size[0] * image.size[1]
+        if stop is not None:
+            pixel_count = min(pixel_count, stop)
+        # A multiple of 8 pixels, so the serial bytes end on a byte boundary of the data
+        serial_stop = min(pixel_count, self.pixel_offset + -(-self.workers * MIN_WORKER_PIXELS // 8) * 8)
+        for chunk in super(ParallelSteganography, self).iter_bytes(image, serial_stop, metrics):
+            yield chunk
+        if serial_stop >= pixel_count:
+            return
+
+        progress = self.new_progress(image)
+        color_bits = self.get_color_bits_used()
+        # Each window holds a band for each worker, rounded as split_bands rounds them
+        band_pixels = max(8, -(-self.band_pixels // 8) * 8)
+        window_pixels = self.workers * band_pixels
+        shared_pixels, pixels = allocate_shared_pixels(image.mode, len(color_bits),
+                                                       min(window_pixels, pixel_count - serial_stop))
+        metrics.allocated(pixels.nbytes)
+        pool = multiprocessing.Pool(self.workers, _init_worker, (shared_pixels, len(color_bits), pixels.dtype, None))
+        try:
+            # Windows are read in order and the rest are abandoned once the data has been found
+            for window_start in xrange(serial_stop, pixel_count, window_pixels):
+                window_stop = min(window_start + window_pixels, pixel_count)
+                copy_pixels(pixels, image, window_pixels, window_start, window_stop)
+                metrics.lap('share')
+                tasks = [(start, band_stop, color_bits, self.forward)
+                         for start, band_stop in split_bands(window_stop - window_start, band_pixels)]
+                for (start, band_stop, _, _), chunk in itertools.izip(tasks, pool.imap(_extract_band, tasks)):
+                    metrics.pixels += band_stop - start
+                    metrics.bits += len(chunk) * 8
+                    metrics.allocated(len(chunk))
+                    metrics.lap('extract')
+                    if progress:
+                        progress.update(window_start + band_stop - self.pixel_offset)
+                    yield chunk
+        finally:
+            pool.terminate()
+
+
+class ParallelForwardSteganography(ParallelSteganography, ForwardSteganography):
+    pass
+
+
+class ParallelBackwardSteganography(ParallelSteganography, BackwardSteganography):
+    pass
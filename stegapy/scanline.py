@@ -0,0 +1,213 @@
+import struct
+import zlib
+import numpy as np
+from PIL import Image
+
+from steganography import SteganograpyException
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+
+# The PIL mode for each supported (color type, bit depth) of a PNG
+PNG_MODES = {(0, 8): 'L', (2, 8): 'RGB', (4, 8): 'LA', (6, 8): 'RGBA'}
+
+# Rows past this many bytes of pixel data are read by PIL instead, as once much of the image is
+# needed PIL's C decoder is quicker than unfiltering scanlines in Python
+SCANLINE_MAX_BYTES = 1 << 18
+
+# The size of the reads made from the file while inflating the image data
+READ_SIZE = 1 << 16
+
+
+class UnsupportedImage(SteganograpyException):
+    """The image file is not in a format that can be read without PIL"""
+    pass
+
+
+def unfilter_scanline(filter_type, scanline, prior, bytes_per_pixel):
+    """
+    Undo the PNG filter of a scanline
+    :param filter_type: the PNG filter type byte of the scanline
+    :param scanline: a bytearray of the filtered scanline, without its filter type byte
+    :param prior: a bytearray of the previous unfiltered scanline, all 0 for the first scanline
+    :param bytes_per_pixel: the number of bytes in each pixel
+    :return: a bytearray of the unfiltered scanline
+    """
+    if filter_type == 0:
+        return scanline
+    if filter_type == 1:
+        # Each byte adds the unfiltered byte to its left, which is a running sum of each channel
+        raw = np.frombuffer(scanline, dtype=np.uint8).reshape(-1, bytes_per_pixel)
+        return bytearray(np.cumsum(raw, axis=0, dtype=np.uint8).tobytes())
+    if filter_type == 2:
+        return bytearray((np.frombuffer(scanline, dtype=np.uint8) + np.frombuffer(prior, dtype=np.uint8)).tobytes())
+
+    out = scanline
+    if filter_type == 3:
+        for i in xrange(bytes_per_pixel):
+            out[i] = (out[i] + (prior[i] >> 1)) & 0xff
+        for i in xrange(bytes_per_pixel, len(out)):
+            out[i] = (out[i] + ((out[i - bytes_per_pixel] + prior[i]) >> 1)) & 0xff
+    elif filter_type == 4:
+        for i in xrange(bytes_per_pixel):
+            out[i] = (out[i] + prior[i]) & 0xff
+        for i in xrange(bytes_per_pixel, len(out)):
+            a = out[i - bytes_per_pixel]
+            b = prior[i]
+            c = prior[i - bytes_per_pixel]
+            pa = abs(b - c)
+            pb = abs(a - c)
+            pc = abs(a + b - 2 * c)
+            if pa <= pb and pa <= pc:
+                out[i] = (out[i] + a) & 0xff
+            elif pb <= pc:
+                out[i] = (out[i] + b) & 0xff
+            else:
+                out[i] = (out[i] + c) & 0xff
+    else:
+        raise SteganograpyException("Unknown PNG filter type {}".format(filter_type))
+    return out
+
+
+class PngScanlineImage(object):
+    """
+    A non-interlaced 8 bit PNG that is decompressed and unfiltered only as far as the rows asked for,
+    so decoding data from the top of a large image doesn't decompress all of it. It has the size,
+    mode, getbands and crop of a PIL Image, which is all the decoders use.
+    """
+
+    def __init__(self, fp):
+        """
+        :param fp: a file name or a seekable file object opened in binary mode
+        :raises UnsupportedImage: if the file isn't a PNG this can read
+        """
+        self.filename = fp if isinstance(fp, basestring) else None
+        self.fp = open(fp, 'rb') if self.filename else fp
+        self.start = self.fp.tell()
+        self.image = None
+        try:
+            self._read_header()
+        except UnsupportedImage:
+            if self.filename:
+                self.fp.close()
+            else:
+                self.fp.seek(self.start)
+            raise
+
+    def _read_header(self):
+        if self.fp.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            raise UnsupportedImage("Not a PNG file")
+        length, chunk_type = struct.unpack('>I4s', self.fp.read(8))
+        if chunk_type != 'IHDR':
+            raise UnsupportedImage("PNG file does not start with a header")
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', self.fp.read(length))
+        self.fp.read(4)
+        if (color_type, bit_depth) not in PNG_MODES or interlace:
+            raise UnsupportedImage("Only non-interlaced 8 bit L, LA, RGB and RGBA PNG files are supported")
+        self.size = (width, height)
+        self.mode = PNG_MODES[(color_type, bit_depth)]
+        self.bytes_per_pixel = len(self.mode)
+        self.stride = width * self.bytes_per_pixel
+
+        # Skip to the first image data chunk
+        while True:
+            position = self.fp.tell()
+            header = self.fp.read(8)
+            if len(header) < 8:
+                raise UnsupportedImage("PNG file has no image data")
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type == 'IDAT':
+                self.data_start = position
+                break
+            self.fp.seek(length + 4, 1)
+        self._restart()
+
+    def _restart(self):
+        self.fp.seek(self.data_start)
+        self.chunk_left = 0
+        self.data_ended = False
+        self.decompressor = zlib.decompressobj()
+        self.inflated = bytearray()
+        self.prior = bytearray(self.stride)
+        self.next_row = 0
+
+    def _read_data(self):
+        """
+        Read the next piece of compressed image data, or '' once it has all been read
+        """
+        while not self.chunk_left:
+            if self.data_ended:
+                return ''
+            length, chunk_type = struct.unpack('>I4s', self.fp.read(8))
+            if chunk_type != 'IDAT':
+                self.data_ended = True
+                return ''
+            if not length:
+                self.fp.seek(4, 1)
+            self.chunk_left = length
+        data = self.fp.read(min(READ_SIZE, self.chunk_left))
+        self.chunk_left -= len(data)
+        if not self.chunk_left:
+            # Skip the chunk's CRC
+            self.fp.seek(4, 1)
+        return data
+
+    def _read_scanline(self):
+        while len(self.inflated) < self.stride + 1:
+            data = self._read_data()
+            if not data:
+                raise SteganograpyException("PNG image data ends early")
+            self.inflated.extend(self.decompressor.decompress(data))
+        filter_type = self.inflated[0]
+        scanline = self.inflated[1:self.stride + 1]
+        del self.inflated[:self.stride + 1]
+        self.prior = unfilter_scanline(filter_type, scanline, self.prior, self.bytes_per_pixel)
+        self.next_row += 1
+        return self.prior
+
+    def _get_image(self):
+        if self.image is None:
+            if self.filename:
+                self.image = Image.open(self.filename)
+            else:
+                self.fp.seek(self.start)
+                self.image = Image.open(self.fp)
+            self.image.load()
+        return self.image
+
+    def getbands(self):
+        return tuple(self.mode)
+
+    def crop(self, box):
+        """
+        Get whole rows of the image
+        :param box: a (0, top, width, bottom) tuple, as for a PIL Image
+        :return: a PIL Image object of the rows
+        """
+        left, top, right, bottom = box
+        if (left, right) != (0, self.size[0]):
+            raise SteganograpyException("Only whole rows can be read from a PNG scanline image")
+        if self.image is not None or bottom * self.stride > SCANLINE_MAX_BYTES:
+            return self._get_image().crop(box)
+
+        if top < self.next_row:
+            self._restart()
+        while self.next_row < top:
+            self._read_scanline()
+        rows = bytearray()
+        while self.next_row < bottom:
+            rows.extend(self._read_scanline())
+        return Image.frombytes(self.mode, (self.size[0], bottom - top), str(rows))
+
+
+def open_scanline_image(im_dec):
+    """
+    Open an image file to be decoded, as a PngScanlineImage if it can be read a scanline at a time
+    :param im_dec: an image file name or file object, or an image object which is returned as is
+    :return: a PngScanlineImage or PIL Image object
+    """
+    if hasattr(im_dec, 'getbands'):
+        return im_dec
+    try:
+        return PngScanlineImage(im_dec)
+    except UnsupportedImage:
+        return Image.open(im_dec)
@@ -0,0 +1,117 @@
+import struct
+import zlib
+
+import stegapy
+from steganography import SteganograpyException, FileTooLargeException, LENGTH_HEADER_SIZE
+from batch import map_tasks
+
+# Header at the start of each shard: the shard's index, the number of shards and a CRC32 of the whole payload
+SHARD_HEADER_FORMAT = '>HHI'
+SHARD_HEADER_SIZE = struct.calcsize(SHARD_HEADER_FORMAT)
+MAX_SHARDS = 0xffff
+
+
+def _encode_shard(args):
+    image, shard, color_bits, forward = args
+    return stegapy.get_encoder(color_bits, forward, length_prefixed=True).encode(shard, stegapy.open_image(image))
+
+
+def _decode_shard(args):
+    image, color_bits, forward = args
+    image = stegapy.open_decode_image(image)
+    return stegapy.get_decoder(color_bits, forward, length_prefixed=True, image=image).decode(image)
+
+
+def get_shard_capacity(image, color_bits):
+    """
+    Get the number of payload bytes a shard in an image can hold
+    :param image: a PIL Image object
+    :param color_bits: the number of bits used in each channel
+    :return: the number of bytes, after the length and shard headers
+    """
+    capacity = image.size[0] * image.size[1] * sum(color_bits) // 8
+    return max(0, capacity - LENGTH_HEADER_SIZE - SHARD_HEADER_SIZE)
+
+
+def split_payload(data, capacities):
+    """
+    Split a payload between images in proportion to how much each can hold, so each is as full as the others
+    :param data: a string of the payload
+    :param capacities: the number of bytes each image can hold
+    :return: a list of strings, one per image
+    """
+    total = sum(capacities)
+    if len(data) > total:
+        raise FileTooLargeException("The given data will not fit into the given image files")
+    bounds = [0]
+    held = 0
+    for capacity in capacities:
+        held += capacity
+        bounds.append(len(data) * held // total if total else 0)
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def encode_sharded(images, encode_data, color_bits=None, forward=True, processes=None):
+    """
+    Encode one payload split between many images, so it can be larger than any one image holds without
+    using more bits of each color. Every shard is length prefixed and records its index and the shard count.
+    :param images: a list of PIL Image objects or image files to encode into
+    :param encode_data: a string of the data to encode
+    :param color_bits: the number of bits of each channel to use in every image, defaulting to 1 bit
+    of each of an image's channels
+    :param forward: determines whether for multiple bits for a color it goes from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param processes: the number of processes to encode shards in, or None for one per CPU
+    :return: a list of PIL Image objects with the shards encoded, in the order of images
+    """
+    if len(images) > MAX_SHARDS:
+        raise SteganograpyException("A payload can be split between at most {} images".format(MAX_SHARDS))
+
+    image_bits = []
+    capacities = []
+    for image in images:
+        image = stegapy.open_image(image)
+        image_bits.append(color_bits if color_bits is not None else [1] * len(image.getbands()))
+        capacities.append(get_shard_capacity(image, image_bits[-1]))
+    checksum = zlib.crc32(encode_data) & 0xffffffff
+    tasks = []
+    for index, shard in enumerate(split_payload(encode_data, capacities)):
+        header = struct.pack(SHARD_HEADER_FORMAT, index, len(images), checksum)
+        tasks.append((images[index], header + shard, image_bits[index], forward))
+    return map_tasks(_encode_shard, tasks, processes)
+
+
+def decode_sharded(images, color_bits=None, forward=True, processes=None):
+    """
+    Decode a payload that was split between many images by encode_sharded
+    :param images: a list of PIL Image objects or image files holding the shards, in any order
+    :param color_bits: the number of bits of each channel used in every image, defaulting to 1 bit
+    of each of an image's channels
+    :param forward: determines whether for multiple bits for a color the data was encoded from -3, to -2, to -1 (True)
+    or goes from position -1, to -2, to -3 (False)
+    :param processes: the number of processes to decode shards in, or None for one per CPU
+    :return: A string of the whole payload
+    """
+    if not images:
+        raise SteganograpyException("No images given.")
+    shards = map_tasks(_decode_shard, [(image, color_bits, forward) for image in images], processes)
+
+    by_index = {}
+    headers = set()
+    for shard in shards:
+        if len(shard) < SHARD_HEADER_SIZE:
+            raise SteganograpyException("Image does not hold a shard header.")
+        index, count, checksum = struct.unpack(SHARD_HEADER_FORMAT, shard[:SHARD_HEADER_SIZE])
+        headers.add((count, checksum))
+        by_index[index] = shard[SHARD_HEADER_SIZE:]
+
+    if len(headers) != 1:
+        raise SteganograpyException("Images hold shards of different payloads.")
+    count, checksum = headers.pop()
+    if sorted(by_index) != range(count):
+        raise SteganograpyException("Expected shards 0 to {} but got {}".format(count - 1, sorted(by_index)))
+
+    data = ''.join(by_index[index] for index in xrange(count))
+    if zlib.crc32(data) & 0xffffffff != checksum:
+        raise SteganograpyException("Reassembled payload does not match its checksum.")
+    return data
@@ -1,6 +1,11 @@
+import itertools
 import random
 import math
+import struct
 import time
+import zlib
+from collections import OrderedDict
+from metrics import Metrics, Progress
 
 
 class SteganograpyException(Exception):
@@ -14,8 +19,45 @@ class FileTooLargeException(SteganograpyException):
     '''
     pass
 
+
+class ChecksumMismatch(SteganograpyException):
+    """The data decoded from an image does not match the checksum encoded with it"""
+    pass
+
+
+class BadLengthHeader(SteganograpyException):
+    """The length header decoded from an image describes more data than the image can hold"""
+    pass
+
 TERMINATION_SEQUENCE = '\xAA\xAA\xAA\xAA'
 
+# Header put before the data in place of the termination sequence when data is length prefixed
+LENGTH_HEADER_FORMAT = '>I'
+LENGTH_HEADER_SIZE = struct.calcsize(LENGTH_HEADER_FORMAT)
+
+# CRC-32 of the data put after it, inside the length header or termination sequence, when data is checksummed
+CHECKSUM_FORMAT = '>I'
+CHECKSUM_SIZE = struct.calcsize(CHECKSUM_FORMAT)
+
+# The most encoding configurations to keep lookup tables for
+MAX_LOOKUP_TABLES = 32
+
+# The bits in each channel of the image modes that don't have 8. A 16 bit PNG opens in mode I.
+CHANNEL_DEPTHS = {'I;16': 16, 'I;16L': 16, 'I;16B': 16, 'I': 16}
+# Image modes whose channels can't hold data bits
+UNSUPPORTED_MODES = ('1', 'F', 'P')
+
+
+def get_channel_depth(mode):
+    """
+    Get the number of bits in each channel of an image mode
+    :param mode: a PIL image mode, such as 'L', 'RGB', 'RGBA' or 'I;16'
+    :return: the number of bits a channel can use for data
+    """
+    if mode in UNSUPPORTED_MODES:
+        raise SteganograpyException("Images in mode {} can't hold data, convert them to RGB first".format(mode))
+    return CHANNEL_DEPTHS.get(mode, 8)
+
 
 def will_data_fit(bit_num, image, bits_per_pix):
     """
@@ -29,12 +71,63 @@ def will_data_fit(bit_num, image, bits_per_pix):
     return bit_num <= max_bits
 
 
-def dec_2_bin(n):
+def pack_length_header(data):
+    '''
+    Function to build the length header for a string of data
+    '''
+    return struct.pack(LENGTH_HEADER_FORMAT, len(data))
+
+
+def unpack_length_header(header):
+    '''
+    Function to pull the data length back out of a length header
+    '''
+    return struct.unpack(LENGTH_HEADER_FORMAT, header)[0]
+
+
+def pack_checksum(crc):
+    '''
+    Function to build the checksum trailer from a running zlib.crc32 value
+    '''
+    return struct.pack(CHECKSUM_FORMAT, crc & 0xffffffff)
+
+
+def iter_checksummed(chunks):
+    '''
+    Function to append the checksum trailer to data given a chunk at a time
+    '''
+    crc = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        yield chunk
+    yield pack_checksum(crc)
+
+
+def iter_verified(chunks):
+    '''
+    Function to strip the checksum trailer from data given a chunk at a time,
+    raising ChecksumMismatch at the end if the data doesn't match it
+    '''
+    crc = 0
+    # The end of the data so far, held back in case it is the checksum
+    held = ''
+    for chunk in chunks:
+        data = held + chunk
+        split = max(0, len(data) - CHECKSUM_SIZE)
+        if split:
+            crc = zlib.crc32(data[:split], crc)
+            yield data[:split]
+        held = data[split:]
+    if len(held) < CHECKSUM_SIZE or pack_checksum(crc) != held:
+        raise ChecksumMismatch("Decoded data does not match its checksum.")
+
+
+def dec_2_bin(n, width=8):
     '''
     Function to convert an integer to a list of 1s and 0s that is the
-    binary equivalent.
+    binary equivalent, padded to width bits.
     '''
-    return list(bin(n)[2:].zfill(8))
+    return list(bin(n)[2:].zfill(width))
 
 
 def bin_2_dec(n):
@@ -45,6 +138,65 @@ def bin_2_dec(n):
     return int(n, 2)
 
 
+# The string of 1s and 0s for each byte value
+BYTE_BITS = [''.join(dec_2_bin(n)) for n in xrange(256)]
+
+
+class LRUCache(object):
+    """
+    A mapping that holds at most max_size items, evicting the least recently used. If max_bytes is
+    given the items also hold at most that many bytes between them, as measured by get_size.
+    """
+
+    def __init__(self, max_size, max_bytes=None, get_size=len):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.get_size = get_size
+        self.items = OrderedDict()
+        self.size = 0
+
+    def get(self, key, build):
+        """
+        Get the item for a key, building and storing it if it isn't held. An item larger than
+        max_bytes is built every time rather than stored.
+        :param key: the key of the item
+        :param build: a function of no arguments that builds the item
+        :return: the item
+        """
+        try:
+            item = self.items.pop(key)
+        except KeyError:
+            item = build()
+            if self.max_bytes is not None:
+                item_size = self.get_size(item)
+                if item_size > self.max_bytes:
+                    return item
+                self.size += item_size
+        self.items[key] = item
+        while len(self.items) > self.max_size or (self.max_bytes is not None and self.size > self.max_bytes):
+            self.evict()
+        return item
+
+    def evict(self):
+        """
+        Remove the least recently used item
+        """
+        _, item = self.items.popitem(last=False)
+        if self.max_bytes is not None:
+            self.size -= self.get_size(item)
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.items)
+
+
+# Lookup tables for each recently used encoding configuration, see SimpleSteganography.get_lookup_tables
+lookup_tables = LRUCache(MAX_LOOKUP_TABLES)
+
+
 class SteganographyEncoder(object):
     """A generic abstract class for encoding and decoding Steganographically"""
 
@@ -68,8 +220,150 @@ class SteganographyEncoder(object):
 
 class SimpleSteganography(SteganographyEncoder):
 
-    def __init__(self, termination_sequence=TERMINATION_SEQUENCE):
+    # When set, called with a Metrics object after each encode or decode
+    metrics_callback = None
+    # When set, called with (pixels_done, pixels_total) every progress_interval pixels during an encode or decode
+    progress_callback = None
+    progress_interval = 1 << 16
+    # The raster position of the first pixel to hold data, leaving the pixels before it for a config header
+    pixel_offset = 0
+
+    def __init__(self, termination_sequence=TERMINATION_SEQUENCE, length_prefixed=False, compression=None,
+                 checksum=False):
         self.termination_sequence = termination_sequence
+        self.length_prefixed = length_prefixed
+        self.compression = compression
+        self.checksum = checksum
+
+    def new_progress(self, image):
+        """
+        Get a Progress for an encode or decode of an image, or None if there is no progress_callback
+        """
+        if self.progress_callback is None:
+            return None
+        return Progress(self.progress_callback, image.size[0] * image.size[1], self.progress_interval)
+
+    def report_metrics(self, metrics):
+        """
+        Finish a Metrics and pass it to the metrics_callback, if there is one
+        """
+        metrics.finish()
+        if self.metrics_callback is not None:
+            self.metrics_callback(metrics)
+
+    def data_fits(self, bit_count, image):
+        """
+        Check that a number of data bits fit in the pixels of an image from pixel_offset on
+        """
+        bits_per_pix = sum(self.get_color_bits_used())
+        return will_data_fit(bit_count + self.pixel_offset * bits_per_pix, image, bits_per_pix)
+
+    def check_image(self, image):
+        """
+        Check that the encoding policy has a bit count for each channel of an image, and no more
+        bits than a channel has
+        """
+        color_bits = self.get_color_bits_used()
+        bands = len(image.getbands())
+        if bands != len(color_bits):
+            raise SteganograpyException("Image has {} channels but the encoding uses {}".format(bands, len(color_bits)))
+        depth = get_channel_depth(image.mode)
+        if max(color_bits) > depth:
+            raise SteganograpyException("Image has {} bits per channel but the encoding uses {}".format(
+                depth, max(color_bits)))
+
+    def frame_data(self, encode_data):
+        """
+        Mark where the data ends, either with a length header before it or the termination sequence after it
+        :param encode_data: a string of the data to be encoded in the image
+        :return: the string of bytes that will actually be encoded in the image
+        """
+        if self.length_prefixed:
+            return pack_length_header(encode_data) + encode_data
+        return encode_data + self.termination_sequence
+
+    def compress_data(self, encode_data):
+        """
+        Compress the data before it is framed, if there is a compression codec
+        :param encode_data: a string of the data to be encoded in the image
+        :return: the data, or the codec id and compressed data made by compress_payload
+        """
+        if self.compression is None:
+            return encode_data
+        # Imported here as the compression module needs this one
+        from compression import compress_payload
+        return compress_payload(encode_data, self.compression,
+                                None if self.length_prefixed else self.termination_sequence)
+
+    def decompress_data(self, decoded):
+        """
+        Undo compress_data on the decoded data
+        """
+        if self.compression is None:
+            return decoded
+        from compression import decompress_payload
+        return decompress_payload(decoded)
+
+    def add_checksum(self, encode_data):
+        """
+        Put a CRC-32 of the data after it, before it is framed, if the data is checksummed
+        :param encode_data: a string of the data, after any compression
+        :return: the data followed by its checksum
+        """
+        if not self.checksum:
+            return encode_data
+        checksummed = ''.join(iter_checksummed([encode_data]))
+        if not self.length_prefixed and \
+                (checksummed + self.termination_sequence).find(self.termination_sequence) < len(checksummed):
+            raise SteganograpyException("Checksummed data contains the termination sequence, use length prefixed data.")
+        return checksummed
+
+    def verify_checksum(self, decoded):
+        """
+        Undo add_checksum on the decoded data, raising ChecksumMismatch if it doesn't match
+        """
+        if not self.checksum:
+            return decoded
+        return ''.join(iter_verified([decoded]))
+
+    def check_length_header(self, header, image):
+        """
+        Pull the data length out of a length header, checking that much data could be in the image
+        :param header: the string of bytes of the length header
+        :param image: the PIL Image object the header was decoded from
+        :return: the number of data bytes following the header
+        """
+        data_length = unpack_length_header(header)
+        if not self.data_fits((LENGTH_HEADER_SIZE + data_length) * 8, image):
+            raise BadLengthHeader("Length header describes more data than the image can hold.")
+        return data_length
+
+    def get_lookup_tables(self, depth=8):
+        """
+        Get the lookup tables for this encoding configuration, building them on first use
+        :param depth: the number of bits in each channel of the image
+        :return: a list with a tuple for each color of (clear_mask, encode_table, decode_table), where
+        clear_mask clears the color's data bits, encode_table maps a string of data bits to the value
+        to put in the cleared bits and decode_table maps a color value to the list of its data bits
+        """
+        color_bits = tuple(self.get_color_bits_used())
+        return lookup_tables.get((self.__class__, color_bits, depth),
+                                 lambda: self.build_lookup_tables(color_bits, depth))
+
+    def build_lookup_tables(self, color_bits, depth=8):
+        tables = []
+        for bits_used in color_bits:
+            encode_table = {}
+            for value in xrange(1 << bits_used):
+                data_bits = ''.join(dec_2_bin(value, depth)[depth - bits_used:])
+                tmp_color = ['0'] * depth
+                if bits_used != 0:
+                    tmp_color[-bits_used:] = self.get_encode_data_bits(data_bits, 0, bits_used)
+                encode_table[data_bits] = bin_2_dec(''.join(tmp_color))
+            decode_table = [self.get_decode_data_bits(dec_2_bin(color, depth), bits_used)
+                            for color in xrange(1 << depth)]
+            tables.append((((1 << depth) - 1) ^ ((1 << bits_used) - 1), encode_table, decode_table))
+        return tables
 
     def encode(self, encode_data, image):
         """
@@ -79,18 +373,28 @@ class SimpleSteganography(SteganographyEncoder):
         :return: A PIL Image object that has the data encoded into the image.
         """
 
-        encode_data += self.termination_sequence
-        data = ''
-        for char in encode_data:
-            data += "".join(dec_2_bin(ord(char)))
-
-        if not will_data_fit(len(data), image, sum(self.get_color_bits_used())):
+        metrics = Metrics('encode')
+        self.check_image(image)
+        encode_data = self.frame_data(self.add_checksum(self.compress_data(encode_data)))
+        if not self.data_fits(len(encode_data) * 8, image):
             raise FileTooLargeException("Image to small for current settings.")
+        metrics.lap('frame')
+
+        data = ''.join(BYTE_BITS[ord(char)] for char in encode_data)
+        tables = self.get_lookup_tables(get_channel_depth(image.mode))
+        metrics.bits = len(data)
+        metrics.allocated(len(data))
+        metrics.lap('bits')
 
-        data_encode_pos = 0
         out_image = image.copy()
+        metrics.allocated(len(out_image.getbands()) * out_image.size[0] * out_image.size[1])
+        metrics.lap('copy')
+
+        progress = self.new_progress(image)
+        data_encode_pos = 0
         curr_pixel_x = -1
         curr_pixel_y = -1
+        single_band = len(image.getbands()) == 1
         for pixel in image.getdata():
             # This will hold the new array of R,G,B colors with the
             # embedded data
@@ -99,7 +403,11 @@ class SimpleSteganography(SteganographyEncoder):
             curr_pixel_x = (curr_pixel_x + 1) % out_image.size[0]
             if curr_pixel_x == 0:
                 curr_pixel_y += 1
+            if curr_pixel_y * out_image.size[0] + curr_pixel_x < self.pixel_offset:
+                continue
 
+            if single_band:
+                pixel = (pixel,)
             for curr_color_pos, color in enumerate(pixel):
                 # if we still have data to encode
                 if data_encode_pos < len(data):
@@ -107,11 +415,6 @@ class SimpleSteganography(SteganographyEncoder):
                     # Number of bits to encode for this color
                     bits_to_encode = self.get_color_bits_used()[curr_color_pos]
 
-                    # Encode the number of bits requested
-                    tmp_color = dec_2_bin(color)
-
-                    # get the next bits (number) bits from data, reverse (may change) them and
-                    # assign them to the last bits (number) bits of the current color.
                     if data_encode_pos + bits_to_encode > len(data):
                         diff = data_encode_pos + bits_to_encode - len(data)
                         # TODO: Use some intelligence to fill in with previous pixel data instead of garbage
@@ -119,23 +422,27 @@ class SimpleSteganography(SteganographyEncoder):
                         # will be ignored in decoding, so we can fill with garbage.
                         data += ('0' * diff)
 
-                    # If the bits to encode for a channel is zero, don't change anything.
-                    if bits_to_encode != 0:
-                        tmp_color[-bits_to_encode:] = self.get_encode_data_bits(data, data_encode_pos, bits_to_encode)
+                    # Clear the last bits (number) bits of the current color and put the next bits (number)
+                    # bits from data there, reversed or not by get_encode_data_bits
+                    clear_mask, encode_table, _ = tables[curr_color_pos]
+                    new_col = (color & clear_mask) | \
+                        encode_table[data[data_encode_pos:data_encode_pos + bits_to_encode]]
 
                     data_encode_pos += bits_to_encode
-
-                    # Pull out a new int value for the encoded color
-                    new_col = bin_2_dec("".join(tmp_color))
                 else:
                     new_col = color
 
                 # Append the new color to our new pixel array
                 new_col_arr.append(new_col)
 
-            # Append the new 3 color array to our new image data
-            out_image.putpixel((curr_pixel_x, curr_pixel_y), tuple(new_col_arr))
+            # Append the new color array to our new image data
+            out_image.putpixel((curr_pixel_x, curr_pixel_y), new_col_arr[0] if single_band else tuple(new_col_arr))
+            metrics.pixels += 1
+            if progress:
+                progress.update(metrics.pixels)
 
+        metrics.lap('embed')
+        self.report_metrics(metrics)
         return out_image
 
     def decode(self, image):
@@ -145,37 +452,64 @@ class SimpleSteganography(SteganographyEncoder):
         :return: A string of the data that was encoded in the file
         """
 
+        metrics = Metrics('decode')
+        progress = self.new_progress(image)
+
         # The data pulled out
         data = []
 
         # A list to build the individual bits in
         curr_byte_list = []
         decode_complete = False
-        for pixel in image.getdata():
+        # The length of the data once its length header has been decoded
+        data_length = None
+        tables = self.get_lookup_tables(get_channel_depth(image.mode))
+        pixels = itertools.islice(image.getdata(), self.pixel_offset, None)
+        if len(image.getbands()) == 1:
+            pixels = ((pixel,) for pixel in pixels)
+        for pixel in pixels:
             for curr_color_pos, color in enumerate(pixel):
-                tmp_color = list(dec_2_bin(color))
-
-                bits = self.get_color_bits_used()[curr_color_pos]
-
                 # Pull out the specified number of bits based on the color
-
-                curr_byte_list.extend(self.get_decode_data_bits(tmp_color, bits))
+                curr_byte_list.extend(tables[curr_color_pos][2][color])
 
                 # If we have a full byte or more add the bit to the data
                 if len(curr_byte_list) >= 8:
                     data.append(chr(bin_2_dec(''.join(curr_byte_list[:8]))))
                     curr_byte_list = curr_byte_list[8:]
 
+                if self.length_prefixed:
+                    # Stop once we've read as much data as the length header says
+                    if data_length is None and len(data) == LENGTH_HEADER_SIZE:
+                        data_length = self.check_length_header(''.join(data), image)
+                    decode_complete = data_length is not None and len(data) == LENGTH_HEADER_SIZE + data_length
+                    if decode_complete:
+                        break
                 # Stop if we've reached our termination characters
-                if len(data) >= len(self.termination_sequence):
+                elif len(data) >= len(self.termination_sequence):
                     decode_complete = ''.join(data[-len(self.termination_sequence):]) == self.termination_sequence
                     if decode_complete:
                         break
+            metrics.pixels += 1
+            if progress:
+                progress.update(metrics.pixels)
             if decode_complete:
                 break
-
-        # Strip off the termination bytes
-        return ''.join(data[:-len(self.termination_sequence)])
+        metrics.bits = len(data) * 8
+        metrics.allocated(len(data))
+        metrics.lap('extract')
+
+        if self.length_prefixed:
+            if not decode_complete:
+                raise SteganograpyException("Image to small to hold a length header.")
+            # Strip off the length header
+            decoded = ''.join(data[LENGTH_HEADER_SIZE:])
+        else:
+            # Strip off the termination bytes
+            decoded = ''.join(data[:-len(self.termination_sequence)])
+        decoded = self.decompress_data(self.verify_checksum(decoded))
+        metrics.lap('join')
+        self.report_metrics(metrics)
+        return decoded
 
     def get_decode_data_bits(self, color_byte, bits_to_decode):
         raise NotImplementedError("Not Implemented")
@@ -189,8 +523,15 @@ class SimpleSteganography(SteganographyEncoder):
 
 class ForwardSteganography(SimpleSteganography):
 
-    def __init__(self, color_bits, termination_sequence=TERMINATION_SEQUENCE):
+    # Data bits are written into a channel from its highest used bit down to bit 0
+    forward = True
+
+    def __init__(self, color_bits, termination_sequence=TERMINATION_SEQUENCE, length_prefixed=False,
+                 compression=None, checksum=False):
         self.termination_sequence = termination_sequence
+        self.length_prefixed = length_prefixed
+        self.compression = compression
+        self.checksum = checksum
         self.color_bits = color_bits
 
     def get_encode_data_bits(self, data, start_pos, bits_to_encode):
@@ -207,8 +548,15 @@ class ForwardSteganography(SimpleSteganography):
 
 class BackwardSteganography(SimpleSteganography):
 
-    def __init__(self, color_bits, termination_sequence=TERMINATION_SEQUENCE):
+    # Data bits are written into a channel from bit 0 up to its highest used bit
+    forward = False
+
+    def __init__(self, color_bits, termination_sequence=TERMINATION_SEQUENCE, length_prefixed=False,
+                 compression=None, checksum=False):
         self.termination_sequence = termination_sequence
+        self.length_prefixed = length_prefixed
+        self.compression = compression
+        self.checksum = checksum
         self.color_bits = color_bits
 
     def get_encode_data_bits(self, data, start_pos, bits_to_encode):
@@ -223,22 +571,29 @@ class BackwardSteganography(SimpleSteganography):
         return self.color_bits
 
 
-def get_recommended_encoding(encode_data, image, termination_sequence):
+def get_recommended_encoding(encode_data, image, termination_sequence, reserved_pixels=0):
     '''
     This will return a list that is the recommended encoding policy for the
     given file to encode (en_filename) and image (image_filename)
     '''
-    data_bits = len(encode_data) * 8 + len(termination_sequence) * 8
+    return get_recommended_encoding_for_size(len(encode_data) + len(termination_sequence), image, reserved_pixels)
+
+
+def get_recommended_encoding_for_size(data_size, image, reserved_pixels=0):
+    '''
+    This will return a list that is the recommended encoding policy for
+    encoding data_size bytes, including any framing, into image after its
+    first reserved_pixels pixels, with a bit count for each of its channels
+    '''
+    data_bits = data_size * 8
 
-    num_pix = image.size[0] * image.size[1]
+    num_pix = max(1, image.size[0] * image.size[1] - reserved_pixels)
     bits_per_pix = math.ceil(float(data_bits) / num_pix)
     bits_config = []
-    for i in xrange(3, 0, -1):
+    for i in xrange(len(image.getbands()), 0, -1):
         bits_config.append(int(math.floor(bits_per_pix / float(i))))
         bits_per_pix = bits_per_pix - bits_config[-1]
-    if max(bits_config) > 8:
+    if max(bits_config) > get_channel_depth(image.mode):
         raise FileTooLargeException("The given data file will not fit into the given image file")
     random.shuffle(bits_config)
     return bits_config
-
-
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Encode and decode throughput benchmarks over a grid of synthetic images, color_bits and payload sizes.
+
+    python -m stegapy.test.benchmarks --save-baseline baseline.json
+    python -m stegapy.test.benchmarks --baseline baseline.json --threshold 0.1
+
+Each case runs in a fresh process so its peak memory can be measured, and the best of several
+repeats is reported. With a baseline, any case whose throughput falls or whose peak memory rises by
+more than the threshold is reported as a regression and the exit status is 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+
+from stegapy import ForwardSteganography, BackwardSteganography, TERMINATION_SEQUENCE
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+
+ENGINES = {
+    'pixel': (ForwardSteganography, BackwardSteganography),
+    'numpy': (NumpyForwardSteganography, NumpyBackwardSteganography),
+}
+
+Case = namedtuple('Case', ['engine', 'forward', 'size', 'color_bits', 'payload_size'])
+
+
+def case_key(case):
+    return '{}-{}-{}x{}-{}-{}'.format(case.engine, 'forward' if case.forward else 'backward', case.size[0],
+                                      case.size[1], ','.join(str(bits) for bits in case.color_bits),
+                                      case.payload_size)
+
+
+def make_carrier(size, seed=0):
+    """
+    Make a carrier image of random noise, so the results don't depend on image files
+    """
+    pixels = np.random.RandomState(seed).randint(0, 256, (size[1], size[0], 3)).astype(np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def make_payload(size, seed=0):
+    """
+    Make a random payload that can't contain the termination sequence
+    """
+    data = np.random.RandomState(seed).randint(0, 256, size).astype(np.uint8)
+    data[data == ord(TERMINATION_SEQUENCE[0])] = 0
+    return data.tobytes()
+
+
+def get_cases(engines, sizes, color_bits_list, payload_sizes):
+    """
+    Get every combination of the grid whose payload fits in its image
+    """
+    cases = []
+    for engine in engines:
+        for forward in (True, False):
+            for size in sizes:
+                for color_bits in color_bits_list:
+                    capacity = size[0] * size[1] * sum(color_bits) // 8 - len(TERMINATION_SEQUENCE)
+                    for payload_size in payload_sizes:
+                        if payload_size <= capacity:
+                            cases.append(Case(engine, forward, size, color_bits, payload_size))
+    return cases
+
+
+def run_case(args):
+    """
+    Time the encode and decode of one case, in a process of its own
+    :return: a dict of the case's measurements
+    """
+    case, repeats = args
+    image = make_carrier(case.size)
+    data = make_payload(case.payload_size)
+    steg = ENGINES[case.engine][0 if case.forward else 1](case.color_bits)
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    encode_seconds = decode_seconds = float('inf')
+    for _ in xrange(repeats):
+        start = time.time()
+        encoded = steg.encode(data, image)
+        encode_seconds = min(encode_seconds, time.time() - start)
+        start = time.time()
+        decoded = steg.decode(encoded)
+        decode_seconds = min(decode_seconds, time.time() - start)
+    if decoded != data:
+        raise AssertionError("{} did not decode to its payload".format(case_key(case)))
+
+    pixels = -(-(len(data) + len(TERMINATION_SEQUENCE)) * 8 // sum(case.color_bits))
+    return {
+        'encode_mb_s': len(data) / 1e6 / encode_seconds,
+        'decode_mb_s': len(data) / 1e6 / decode_seconds,
+        'encode_pixels_s': pixels / encode_seconds,
+        'decode_pixels_s': pixels / decode_seconds,
+        # ru_maxrss is in KB on Linux
+        'peak_memory_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_memory) / 1024.0,
+    }
+
+
+def run_cases(cases, repeats):
+    results = {}
+    for case in cases:
+        pool = multiprocessing.Pool(1)
+        try:
+            results[case_key(case)] = pool.apply(run_case, ((case, repeats),))
+        finally:
+            pool.terminate()
+        yield case_key(case), results[case_key(case)]
+
+
+def compare(results, baseline, threshold):
+    """
+    Find the regressions from a baseline
+    :param results: a dict of case key to measurements
+    :param baseline: a dict of case key to measurements from an earlier run
+    :param threshold: the fraction a measurement may get worse by before it is a regression
+    :return: a list of regression messages
+    """
+    regressions = []
+    for key, measurements in sorted(results.items()):
+        if key not in baseline:
+            continue
+        for name, value in sorted(measurements.items()):
+            expected = baseline[key].get(name)
+            if not expected:
+                continue
+            # Memory should stay low and everything else should stay high
+            change = (value - expected) / expected if name == 'peak_memory_mb' else (expected - value) / expected
+            if change > threshold:
+                regressions.append("{} {}: {:.2f} vs baseline {:.2f} ({:.0%} worse)".format(
+                    key, name, value, expected, change))
+    return regressions
+
+
+def parse_size(text):
+    return tuple(int(side) for side in text.split('x'))
+
+
+def parse_list(parse, text):
+    return [parse(item) for item in text.split(';')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--engines', default='numpy', help="; separated engines from: " + ', '.join(ENGINES))
+    parser.add_argument('--sizes', default='256x256;1024x1024;2048x2048', help='; separated image sizes')
+    parser.add_argument('--color-bits', default='1,1,1;2,2,3', help='; separated color_bits')
+    parser.add_argument('--payloads', default='1024;65536;1048576', help='; separated payload sizes in bytes')
+    parser.add_argument('--repeats', type=int, default=3, help='times to run each case, keeping the best')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='fraction worse that counts as a regression')
+    parser.add_argument('--save-baseline', help='file to save these results to as JSON')
+    args = parser.parse_args(argv)
+
+    cases = get_cases(args.engines.split(';'), parse_list(parse_size, args.sizes),
+                      parse_list(lambda bits: [int(bit) for bit in bits.split(',')], args.color_bits),
+                      parse_list(int, args.payloads))
+
+    results = {}
+    print "{:<44} {:>10} {:>10} {:>12} {:>12} {:>9}".format('case', 'enc MB/s', 'dec MB/s', 'enc px/s',
+                                                            'dec px/s', 'peak MB')
+    for key, measurements in run_cases(cases, args.repeats):
+        results[key] = measurements
+        print "{:<44} {encode_mb_s:>10.2f} {decode_mb_s:>10.2f} {encode_pixels_s:>12.0f} " \
+              "{decode_pixels_s:>12.0f} {peak_memory_mb:>9.1f}".format(key, **measurements)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print >> sys.stderr, "No baseline at {}".format(args.baseline)
+            return 1
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print >> sys.stderr, "REGRESSION " + regression
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+from unittest import TestCase
+import os
+import random
+import subprocess
+import sys
+from StringIO import StringIO
+import stegapy
+from stegapy import ForwardSteganography, BackwardSteganography, SteganograpyException, FileTooLargeException
+from stegapy import parallel
+from stegapy.bytes_steganography import BytesForwardSteganography, BytesBackwardSteganography
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.parallel import ParallelForwardSteganography, ParallelBackwardSteganography
+from stegapy.test.test_numpy_steganography import random_data
+from stegapy.test.test_modes import random_mode_image
+from PIL import Image
+
+# The encoder classes of every backend, which must all give the same image and data
+FORWARD_CLASSES = (ForwardSteganography, NumpyForwardSteganography, BytesForwardSteganography,
+                   ParallelForwardSteganography)
+BACKWARD_CLASSES = (BackwardSteganography, NumpyBackwardSteganography, BytesBackwardSteganography,
+                    ParallelBackwardSteganography)
+
+CASES = (('RGB', [1, 1, 1]), ('RGB', [2, 0, 3]), ('RGB', [8, 3, 1]), ('L', [3]), ('RGBA', [1, 2, 0, 3]),
+         ('I;16', [11]))
+
+
+def get_encoder(encoder_class, color_bits, **options):
+    if issubclass(encoder_class, parallel.ParallelSteganography):
+        return encoder_class(color_bits, 2, **options)
+    return encoder_class(color_bits, **options)
+
+
+class TestConformance(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(3821)
+        self.min_worker_pixels = parallel.MIN_WORKER_PIXELS
+        # So the parallel backend really splits these small images between workers
+        parallel.MIN_WORKER_PIXELS = 1
+
+    def tearDown(self):
+        parallel.MIN_WORKER_PIXELS = self.min_worker_pixels
+
+    def assertConforms(self, encoder_classes, image, data, color_bits, **options):
+        expected = None
+        for encoder_class in encoder_classes:
+            steg = get_encoder(encoder_class, color_bits, **options)
+            encoded = steg.encode(data, image)
+            if expected is None:
+                expected = encoded.tobytes()
+            self.assertEqual(expected, encoded.tobytes(), encoder_class.__name__)
+            self.assertEqual(data, steg.decode(encoded), encoder_class.__name__)
+
+    def test_forward(self):
+        for mode, color_bits in CASES:
+            image = random_mode_image(self.rand, mode, (11, 9))
+            for length in (0, 1, 5, 20):
+                self.assertConforms(FORWARD_CLASSES, image, random_data(self.rand, length), color_bits)
+
+    def test_backward(self):
+        for mode, color_bits in CASES:
+            image = random_mode_image(self.rand, mode, (11, 9))
+            for length in (0, 1, 5, 20):
+                self.assertConforms(BACKWARD_CLASSES, image, random_data(self.rand, length), color_bits)
+
+    def test_options(self):
+        image = random_mode_image(self.rand, 'RGB', (24, 20))
+        data = random_data(self.rand, 60)
+        for options in ({'length_prefixed': True}, {'compression': 'zlib'}, {'checksum': True},
+                        {'length_prefixed': True, 'checksum': True, 'compression': 'bz2'}):
+            self.assertConforms(FORWARD_CLASSES[1:], image, data, [2, 1, 2], **options)
+            self.assertConforms(BACKWARD_CLASSES[1:], image, data, [1, 3, 1], **options)
+
+    def test_pixel_offset(self):
+        image = random_mode_image(self.rand, 'RGB', (10, 10))
+        data = random_data(self.rand, 30)
+        encoded = []
+        for encoder_class in FORWARD_CLASSES[1:]:
+            steg = get_encoder(encoder_class, [1, 2, 1], length_prefixed=True)
+            steg.pixel_offset = 13
+            steg.band_pixels = 7
+            encoded.append(steg.encode(data, image))
+            self.assertEqual(data, steg.decode(encoded[-1]))
+            self.assertEqual(data, ''.join(steg.decode_iter(encoded[-1])))
+        self.assertEqual(1, len(set(image.tobytes() for image in encoded)))
+        self.assertEqual(image.tobytes()[:13 * 3], encoded[0].tobytes()[:13 * 3])
+
+    def test_too_large(self):
+        image = random_mode_image(self.rand, 'RGB', (4, 4))
+        for encoder_class in FORWARD_CLASSES:
+            self.assertRaises(FileTooLargeException, get_encoder(encoder_class, [1, 1, 1]).encode, 'a' * 10, image)
+
+
+class TestBackendSelection(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(2718)
+        self.image = random_mode_image(self.rand, 'RGB', (20, 20))
+        self.data = random_data(self.rand, 100)
+
+    def test_default(self):
+        self.assertEqual(stegapy.NUMPY_BACKEND, stegapy.get_backend())
+        self.assertIsInstance(stegapy.get_encoder([1, 1, 1]), NumpyForwardSteganography)
+        self.assertIsInstance(stegapy.get_encoder([1, 1, 1], False, backend=stegapy.PYTHON_BACKEND),
+                              BytesBackwardSteganography)
+        self.assertRaises(SteganograpyException, stegapy.get_backend, 'fortran')
+        self.assertRaises(SteganograpyException, stegapy.get_encoder, [1, 1, 1], key='k',
+                          backend=stegapy.PYTHON_BACKEND)
+
+    def test_public_api(self):
+        encoded = {}
+        for backend in (stegapy.NUMPY_BACKEND, stegapy.PYTHON_BACKEND):
+            encoded[backend] = stegapy.encode(self.image, self.data, compression='zlib', config_header=True,
+                                              checksum=True, backend=backend)[0]
+        self.assertEqual(encoded[stegapy.NUMPY_BACKEND].tobytes(), encoded[stegapy.PYTHON_BACKEND].tobytes())
+        for backend in (stegapy.NUMPY_BACKEND, stegapy.PYTHON_BACKEND):
+            self.assertEqual(self.data, stegapy.decode(encoded[backend], config_header=True, backend=backend))
+            fileobj = StringIO()
+            stegapy.decode_to_file(encoded[backend], fileobj, config_header=True, backend=backend)
+            self.assertEqual(self.data, fileobj.getvalue())
+
+    def test_without_numpy(self):
+        # numpy is hidden from a fresh interpreter, which must still import and use stegapy
+        script = '\n'.join([
+            "import sys",
+            "sys.modules['numpy'] = None",
+            "import stegapy",
+            "from PIL import Image",
+            "assert stegapy.get_backend() == stegapy.PYTHON_BACKEND",
+            "image = Image.frombytes('RGB', (8, 8), ''.join(chr(i % 256) for i in xrange(192)))",
+            "encoded = stegapy.encode(image, 'no numpy', [1, 2, 1], config_header=True, checksum=True)[0]",
+            "assert stegapy.decode(encoded, config_header=True) == 'no numpy'",
+            "assert stegapy.verify(encoded, config_header=True)",
+            "try:",
+            "    stegapy.encode(image, 'x', key='k')",
+            "except stegapy.SteganograpyException:",
+            "    pass",
+            "else:",
+            "    raise AssertionError('keyed encoding without numpy')",
+            "sys.stdout.write(encoded.tobytes())",
+        ])
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(stegapy.__file__))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + sys.path))
+        output = subprocess.check_output([sys.executable, '-c', script], env=env)
+        image = Image.frombytes('RGB', (8, 8), ''.join(chr(i % 256) for i in xrange(192)))
+        expected = stegapy.encode(image, 'no numpy', [1, 2, 1], config_header=True, checksum=True)[0]
+        self.assertEqual(expected.tobytes(), output)
@@ -0,0 +1,83 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from stegapy import encode_batch, decode_batch
+from stegapy.batch import read_manifest
+from stegapy.cli import main
+from PIL import Image
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name in ('carriers', 'payloads', 'encoded', 'decoded'):
+            os.mkdir(os.path.join(self.dir, name))
+        self.payloads = {}
+        for index in xrange(3):
+            name = 'item{}'.format(index)
+            Image.new('RGB', (12, 12), color="white").save(self.path('carriers', name + '.png'))
+            self.payloads[name] = 'payload {}'.format(index) * (index + 1)
+            with open(self.path('payloads', name + '.txt'), 'wb') as payload_file:
+                payload_file.write(self.payloads[name])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, *names):
+        return os.path.join(self.dir, *names)
+
+    def test_round_trip(self):
+        items = [(self.path('carriers', name + '.png'), self.path('payloads', name + '.txt'),
+                  self.path('encoded', name + '.png')) for name in sorted(self.payloads)]
+        for processes in (1, 2):
+            results = encode_batch(items, [1, 1, 1], processes=processes)
+            self.assertListEqual(items, [result.item for result in results])
+            self.assertListEqual([None] * 3, [result.error for result in results])
+
+            results = decode_batch([(item[2], None) for item in items], processes=processes)
+            self.assertListEqual([self.payloads[name] for name in sorted(self.payloads)],
+                                 [result.data for result in results])
+
+    def test_item_errors(self):
+        items = [(self.path('carriers', 'item0.png'), self.path('payloads', 'missing.txt'),
+                  self.path('encoded', 'item0.png')),
+                 (self.path('carriers', 'item1.png'), self.path('payloads', 'item1.txt'),
+                  self.path('encoded', 'item1.png'))]
+        results = encode_batch(items, [1, 1, 1], processes=1)
+        self.assertIsNotNone(results[0].error)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(len(self.payloads['item1']), results[1].data_size)
+
+    def test_cli_manifests(self):
+        with open(self.path('encode.csv'), 'wb') as manifest:
+            for name in sorted(self.payloads):
+                manifest.write('{},{},{}\n'.format(self.path('carriers', name + '.png'),
+                                                   self.path('payloads', name + '.txt'),
+                                                   self.path('encoded', name + '.png')))
+        self.assertEqual(0, main(['-p', '1', '-c', '1,1,1', 'encode', '-m', self.path('encode.csv')]))
+
+        with open(self.path('decode.csv'), 'wb') as manifest:
+            for name in sorted(self.payloads):
+                manifest.write('{},{},"1,1,1"\n'.format(self.path('encoded', name + '.png'),
+                                                         self.path('decoded', name + '.bin')))
+        self.assertEqual(3, len(read_manifest(self.path('decode.csv'))))
+        # The manifest's color_bits are used rather than the command line's
+        self.assertEqual(0, main(['-p', '1', '-c', '3,3,3', 'decode', '-m', self.path('decode.csv')]))
+        self.assertDecoded()
+
+    def test_cli_color_bits(self):
+        main(['-p', '1', '-c', '2,1,1', 'encode', self.path('carriers'), self.path('payloads'),
+              '-o', self.path('encoded')])
+        self.assertEqual(0, main(['-p', '1', '-c', '2,1,1', 'decode', self.path('encoded'),
+                                  '-o', self.path('decoded')]))
+        self.assertDecoded()
+
+    def test_cli_usage(self):
+        self.assertRaises(SystemExit, main, ['encode', self.path('carriers')])
+
+    def assertDecoded(self):
+        for name, payload in self.payloads.items():
+            with open(self.path('decoded', name + '.bin'), 'rb') as decoded:
+                self.assertEqual(payload, decoded.read())
@@ -0,0 +1,20 @@
+from unittest import TestCase
+from stegapy.test.benchmarks import Case, case_key, compare, get_cases, run_case
+
+
+class TestBenchmarks(TestCase):
+
+    def test_get_cases_skips_too_large(self):
+        cases = get_cases(['numpy'], [(8, 8)], [[1, 1, 1]], [10, 100])
+        self.assertListEqual([10, 10], [case.payload_size for case in cases])
+
+    def test_compare(self):
+        baseline = {'a': {'encode_mb_s': 10.0, 'peak_memory_mb': 100.0}}
+        self.assertListEqual([], compare({'a': {'encode_mb_s': 9.5, 'peak_memory_mb': 105.0}}, baseline, 0.1))
+        self.assertEqual(2, len(compare({'a': {'encode_mb_s': 8.0, 'peak_memory_mb': 120.0}}, baseline, 0.1)))
+        self.assertListEqual([], compare({'b': {'encode_mb_s': 1.0}}, baseline, 0.1))
+
+    def test_run_case(self):
+        case = Case('numpy', False, (16, 16), [1, 2, 1], 50)
+        self.assertEqual('numpy-backward-16x16-1,2,1-50', case_key(case))
+        self.assertGreater(run_case((case, 1))['decode_mb_s'], 0)
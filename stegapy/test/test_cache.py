@@ -0,0 +1,163 @@
+from unittest import TestCase
+import os
+import random
+import shutil
+import tempfile
+from StringIO import StringIO
+import stegapy
+from stegapy import ChecksumMismatch
+from stegapy import cache
+from stegapy.cache import DecodeCache, MemoryCacheStorage, DiskCacheStorage, get_content_digest
+from stegapy.mapped import MappedImage
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from stegapy.test.test_verify import flip_bit
+
+
+class CountingStringIO(StringIO):
+    """A file object that counts the bytes read from it"""
+
+    def __init__(self, *args):
+        StringIO.__init__(self, *args)
+        self.bytes_read = 0
+
+    def read(self, *args):
+        data = StringIO.read(self, *args)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestStorage(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_memory_eviction(self):
+        storage = MemoryCacheStorage(10)
+        storage.set('a', 'aaaa')
+        storage.set('b', 'bbbb')
+        self.assertEqual('aaaa', storage.get('a'))
+        storage.set('c', 'cccc')
+        # b was the least recently used
+        self.assertIsNone(storage.get('b'))
+        self.assertEqual(['a', 'c'], list(storage.items))
+        storage.set('d', 'd' * 11)
+        self.assertIsNone(storage.get('d'))
+        storage.set('a', '')
+        self.assertEqual(('', 4), (storage.get('a'), storage.size))
+
+    def test_disk_eviction(self):
+        storage = DiskCacheStorage(os.path.join(self.directory, 'cache'), 10)
+        storage.set('a', 'aaaa')
+        storage.set('b', 'bbbb')
+        os.utime(storage.get_path('a'), (1000, 1000))
+        os.utime(storage.get_path('b'), (2000, 2000))
+        storage.set('c', 'cccc')
+        self.assertIsNone(storage.get('a'))
+        self.assertEqual('bbbb', storage.get('b'))
+        self.assertEqual(2, len(storage))
+        # Another storage on the same directory sees the same data
+        self.assertEqual('cccc', DiskCacheStorage(storage.directory).get('c'))
+        storage.clear()
+        self.assertEqual(0, len(storage))
+
+
+class TestDecodeCache(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(8128)
+        self.image = random_image(self.rand, (30, 20))
+        self.data = random_data(self.rand, 150)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_digest(self):
+        encoded = stegapy.encode(self.image, self.data, [1, 1, 1])[0]
+        image_bytes = stegapy.image_to_bytes(encoded)
+        path = os.path.join(self.directory, 'a.png')
+        with open(path, 'wb') as fp:
+            fp.write(image_bytes)
+        digest = get_content_digest(path)
+        self.assertEqual(digest, get_content_digest(os.path.join(self.directory, '.', 'a.png')))
+        with open(path, 'rb') as fp:
+            self.assertEqual(digest, get_content_digest(fp))
+        os.utime(path, (1000, 1000))
+        self.assertNotEqual(digest, get_content_digest(path))
+
+        fileobj = StringIO('junk' + image_bytes)
+        fileobj.seek(4)
+        self.assertEqual(get_content_digest(StringIO(image_bytes)), get_content_digest(fileobj))
+        self.assertEqual(4, fileobj.tell())
+        self.assertNotEqual(get_content_digest(fileobj), get_content_digest(StringIO(image_bytes[:-1] + 'x')))
+
+        self.assertIsNone(get_content_digest(encoded))
+        self.assertEqual(get_content_digest(encoded, True), get_content_digest(encoded.copy(), True))
+        self.assertNotEqual(get_content_digest(encoded, True), get_content_digest(flip_bit(encoded, 0), True))
+
+    def test_hit_reads_little(self):
+        decode_cache = DecodeCache()
+        image = random_image(self.rand, (200, 150))
+        image_bytes = stegapy.image_to_bytes(stegapy.encode(image, self.data, [1, 1, 1])[0], 'BMP')
+        self.assertGreater(len(image_bytes), 4 * cache.FINGERPRINT_BYTES)
+        fileobj = CountingStringIO(image_bytes)
+        self.assertEqual(self.data, stegapy.decode(fileobj, [1, 1, 1], cache=decode_cache))
+        fileobj.seek(0)
+        fileobj.bytes_read = 0
+        self.assertEqual(self.data, stegapy.decode(fileobj, [1, 1, 1], cache=decode_cache))
+        self.assertEqual(1, decode_cache.hits)
+        self.assertLessEqual(fileobj.bytes_read, 2 * cache.FINGERPRINT_BYTES)
+
+        path = os.path.join(self.directory, 'a.bmp')
+        with open(path, 'wb') as fp:
+            fp.write(image_bytes)
+        with MappedImage(path) as mapped:
+            self.assertEqual(self.data, stegapy.decode(mapped, [1, 1, 1], cache=decode_cache))
+            crops = []
+            mapped.crop = lambda box: crops.append(box)
+            self.assertEqual(self.data, stegapy.decode(mapped, [1, 1, 1], cache=decode_cache))
+            self.assertEqual([], crops)
+        self.assertEqual(2, decode_cache.hits)
+
+    def test_image_objects(self):
+        encoded = stegapy.encode(self.image, self.data, [1, 2, 1])[0]
+        decode_cache = DecodeCache()
+        for _ in xrange(2):
+            self.assertEqual(self.data, stegapy.decode(encoded, [1, 2, 1], cache=decode_cache))
+        self.assertEqual((0, 2, 0), (decode_cache.hits, decode_cache.misses, len(decode_cache)))
+
+    def test_decode(self):
+        cache = DecodeCache(hash_pixels=True)
+        encoded = stegapy.encode(self.image, self.data, [1, 2, 1])[0]
+        for _ in xrange(3):
+            self.assertEqual(self.data, stegapy.decode(encoded, [1, 2, 1], cache=cache))
+        self.assertEqual({'hits': 2, 'misses': 1, 'items': 1}, cache.as_dict())
+        # The settings are part of the key
+        stegapy.decode(encoded, [1, 2, 1], forward=False, cache=cache)
+        stegapy.decode(encoded, [1, 1, 1], cache=cache)
+        self.assertEqual((2, 3), (cache.hits, cache.misses))
+        cache.clear()
+        self.assertEqual((0, 0, 0), (cache.hits, cache.misses, len(cache)))
+
+    def test_files(self):
+        cache = DecodeCache(DiskCacheStorage(os.path.join(self.directory, 'cache')))
+        path = os.path.join(self.directory, 'a.png')
+        stegapy.encode_to(self.image, self.data, path, [2, 1, 1], config_header=True, compression='zlib')
+        self.assertEqual(self.data, stegapy.decode(path, config_header=True, cache=cache))
+        with open(path, 'rb') as fp:
+            self.assertEqual(self.data, stegapy.decode(fp, config_header=True, cache=cache))
+        self.assertEqual(1, cache.hits)
+        # The data outlives the cache object, as for another process sharing the directory
+        other = DecodeCache(DiskCacheStorage(cache.storage.directory))
+        self.assertEqual(self.data, stegapy.decode(path, config_header=True, cache=other))
+        self.assertEqual((1, 0), (other.hits, other.misses))
+
+    def test_errors_not_cached(self):
+        cache = DecodeCache(hash_pixels=True)
+        encoded = flip_bit(stegapy.encode(self.image, self.data, [1, 1, 1], checksum=True)[0], 40)
+        for _ in xrange(2):
+            self.assertRaises(ChecksumMismatch, stegapy.decode, encoded, [1, 1, 1], checksum=True, cache=cache)
+        self.assertEqual((0, 2, 0), (cache.hits, cache.misses, len(cache)))
@@ -0,0 +1,86 @@
+from unittest import TestCase
+import os
+import random
+from StringIO import StringIO
+import stegapy
+from stegapy import SteganograpyException, ForwardSteganography, BackwardSteganography, TERMINATION_SEQUENCE
+from stegapy.compression import compress_payload, decompress_payload, iter_decompress, codecs, AUTO
+from stegapy.numpy_steganography import NumpyForwardSteganography
+from stegapy.parallel import ParallelBackwardSteganography
+from stegapy.test.test_numpy_steganography import random_image, random_data
+
+MACBETH_FILE = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'resources', 'Macbeth.txt')
+
+
+class TestCompressPayload(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(2718)
+        with open(MACBETH_FILE, 'rb') as macbeth:
+            self.text = macbeth.read()
+
+    def test_codecs(self):
+        for name in codecs:
+            compressed = compress_payload(self.text, name)
+            self.assertEqual(chr(codecs[name].codec_id), compressed[0])
+            self.assertEqual(self.text, decompress_payload(compressed))
+
+    def test_auto(self):
+        compressed = compress_payload(self.text, AUTO)
+        self.assertLess(len(compressed), len(self.text) // 2)
+        self.assertEqual(min(len(compress_payload(self.text, name)) for name in codecs), len(compressed))
+        # Random data doesn't compress so is left as it is
+        data = random_data(self.rand, 500)
+        self.assertEqual('\x00' + data, compress_payload(data, AUTO))
+
+    def test_iter_decompress(self):
+        compressed = compress_payload(self.text, 'zlib')
+        chunks = ['', compressed[:1], compressed[1:50], compressed[50:]]
+        self.assertEqual(self.text, ''.join(iter_decompress(chunks)))
+
+    def test_termination_sequence(self):
+        data = 'abc' + TERMINATION_SEQUENCE
+        self.assertRaises(SteganograpyException, compress_payload, data, 'none', TERMINATION_SEQUENCE)
+        self.assertNotIn(TERMINATION_SEQUENCE, compress_payload(data, AUTO, TERMINATION_SEQUENCE))
+
+    def test_errors(self):
+        self.assertRaises(SteganograpyException, compress_payload, 'abc', 'rar')
+        self.assertRaises(SteganograpyException, decompress_payload, '\xfeabc')
+        self.assertRaises(SteganograpyException, decompress_payload, '')
+
+
+class TestCompressedEncoding(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(3141)
+        with open(MACBETH_FILE, 'rb') as macbeth:
+            self.text = macbeth.read(8000)
+
+    def test_encoders(self):
+        image = random_image(self.rand, (60, 60))
+        text = self.text[:3000]
+        for encoder_class in (ForwardSteganography, BackwardSteganography, NumpyForwardSteganography):
+            for length_prefixed in (False, True):
+                steg = encoder_class([1, 2, 1], length_prefixed=length_prefixed, compression=AUTO)
+                encoded = steg.encode(text, image)
+                self.assertEqual(text, steg.decode(encoded))
+        steg = ParallelBackwardSteganography([2, 2, 2], workers=2, compression='zlib')
+        self.assertEqual(text, steg.decode(steg.encode(text, image)))
+
+    def test_same_as_precompressed(self):
+        image = random_image(self.rand, (100, 100))
+        expected = NumpyForwardSteganography([1, 1, 1]).encode(compress_payload(self.text, 'bz2'), image)
+        actual = NumpyForwardSteganography([1, 1, 1], compression='bz2').encode(self.text, image)
+        self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_lower_recommended_encoding(self):
+        image = random_image(self.rand, (100, 100))
+        plain_bits = stegapy.encode(image, self.text)[1]
+        encoded, color_bits = stegapy.encode(image, self.text, compression=AUTO)
+        self.assertLess(sum(color_bits), sum(plain_bits))
+        self.assertEqual(self.text, stegapy.decode(encoded, color_bits, compression=AUTO))
+        self.assertEqual(self.text, ''.join(stegapy.decode_iter(encoded, color_bits, compression=AUTO)))
+
+    def test_stream(self):
+        steg = NumpyForwardSteganography([1, 1, 1], compression='zlib')
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO('abc'), random_image(self.rand, (9, 9)))
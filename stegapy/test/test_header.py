@@ -0,0 +1,130 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+import stegapy
+from stegapy import parallel, numpy_steganography, ForwardSteganography, BackwardSteganography
+from stegapy.header import Config, NoConfigHeader, pack_config_header, unpack_config_header, \
+    read_config_header, write_config_header, get_config_header_pixels
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.parallel import ParallelBackwardSteganography
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from PIL import Image
+
+
+class TestConfigHeader(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1618)
+
+    def test_pack(self):
+        for config in (Config([1, 1, 1], True, False, False), Config([8, 0, 3], False, True, True)):
+            self.assertEqual(config, unpack_config_header(pack_config_header(config)))
+
+    def test_write_read(self):
+        image = random_image(self.rand, (5, 7))
+        config = Config([2, 0, 5], False, True, False)
+        write_config_header(image, config)
+        self.assertEqual(config, read_config_header(image))
+        self.assertEqual(27, get_config_header_pixels(3))
+
+    def test_no_header(self):
+        self.assertRaises(NoConfigHeader, read_config_header, random_image(self.rand, (10, 10)))
+        self.assertRaises(NoConfigHeader, read_config_header, random_image(self.rand, (3, 3)))
+
+    def test_newer_version(self):
+        header = pack_config_header(Config([1, 1, 1], True, False, False))
+        self.assertRaises(stegapy.SteganograpyException, unpack_config_header, header[:4] + '\x09' + header[5:])
+
+    def test_corrupt(self):
+        header = pack_config_header(Config([1, 1, 1], True, False, False))
+        self.assertRaises(NoConfigHeader, unpack_config_header, header[:-4] + '\x00')
+        self.assertRaises(stegapy.SteganograpyException, unpack_config_header, header[:-1] + '\x11')
+        self.assertRaises(stegapy.SteganograpyException, unpack_config_header, header[:-1])
+
+
+class TestPixelOffset(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1414)
+        self.image = random_image(self.rand, (13, 11))
+
+    def test_classes_agree(self):
+        for reference_class, numpy_class in ((ForwardSteganography, NumpyForwardSteganography),
+                                             (BackwardSteganography, NumpyBackwardSteganography)):
+            for length_prefixed in (False, True):
+                data = random_data(self.rand, 30)
+                reference = reference_class([2, 1, 2], length_prefixed=length_prefixed)
+                reference.pixel_offset = 17
+                steg = numpy_class([2, 1, 2], length_prefixed=length_prefixed)
+                steg.pixel_offset = 17
+                steg.band_pixels = 20
+                encoded = steg.encode(data, self.image)
+                self.assertEqual(reference.encode(data, self.image).tobytes(), encoded.tobytes())
+                self.assertEqual(self.image.tobytes()[:17 * 3], encoded.tobytes()[:17 * 3])
+                self.assertEqual(data, steg.decode(encoded))
+                self.assertEqual(data, reference.decode(encoded))
+
+    def test_stream(self):
+        steg = NumpyBackwardSteganography([1, 2, 1], length_prefixed=True)
+        steg.pixel_offset = 30
+        data = random_data(self.rand, 40)
+        band_pixels = numpy_steganography.ENCODE_BAND_PIXELS
+        numpy_steganography.ENCODE_BAND_PIXELS = 20
+        try:
+            streamed = steg.encode_stream(StringIO(data), self.image, len(data))
+        finally:
+            numpy_steganography.ENCODE_BAND_PIXELS = band_pixels
+        self.assertEqual(steg.encode(data, self.image).tobytes(), streamed.tobytes())
+
+    def test_parallel(self):
+        min_worker_pixels = parallel.MIN_WORKER_PIXELS
+        parallel.MIN_WORKER_PIXELS = 1
+        try:
+            serial = NumpyBackwardSteganography([3, 1, 2])
+            steg = ParallelBackwardSteganography([3, 1, 2], workers=3)
+            serial.pixel_offset = steg.pixel_offset = 21
+            steg.band_pixels = 20
+            data = random_data(self.rand, 50)
+            encoded = steg.encode(data, self.image)
+            self.assertEqual(serial.encode(data, self.image).tobytes(), encoded.tobytes())
+            self.assertEqual(data, steg.decode(encoded))
+        finally:
+            parallel.MIN_WORKER_PIXELS = min_worker_pixels
+
+
+class TestEncodeWithHeader(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1732)
+        self.image = random_image(self.rand, (30, 30))
+
+    def test_round_trip(self):
+        for forward in (True, False):
+            for length_prefixed in (False, True):
+                for compression in (None, 'zlib'):
+                    data = 'header ' * 40
+                    encoded, color_bits = stegapy.encode(self.image, data, forward=forward,
+                                                         length_prefixed=length_prefixed, compression=compression,
+                                                         config_header=True)
+                    config = read_config_header(encoded)
+                    self.assertEqual(Config(color_bits, forward, length_prefixed, compression is not None), config)
+                    self.assertEqual(data, stegapy.decode(encoded, config_header=True))
+                    self.assertEqual(data, ''.join(stegapy.decode_iter(encoded, config_header=True)))
+
+    def test_from_file(self):
+        data = random_data(self.rand, 200)
+        image_bytes, color_bits = stegapy.encode_to_bytes(self.image, data, [2, 3, 1], config_header=True)
+        self.assertEqual(data, stegapy.decode(StringIO(image_bytes), config_header=True))
+        fileobj = StringIO()
+        stegapy.decode_to_file(StringIO(image_bytes), fileobj, config_header=True)
+        self.assertEqual(data, fileobj.getvalue())
+
+    def test_too_large(self):
+        capacity = (30 * 30 - get_config_header_pixels(3)) * 3 // 8 - len(stegapy.TERMINATION_SEQUENCE)
+        stegapy.encode(self.image, 'a' * capacity, [1, 1, 1], config_header=True)
+        self.assertRaises(stegapy.FileTooLargeException, stegapy.encode, self.image, 'a' * (capacity + 1),
+                          [1, 1, 1], config_header=True)
+
+    def test_no_header(self):
+        encoded = stegapy.encode(Image.new('RGB', (30, 30), color='white'), 'abc', [1, 1, 1])[0]
+        self.assertRaises(NoConfigHeader, stegapy.decode, encoded, config_header=True)
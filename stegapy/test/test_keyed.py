@@ -0,0 +1,99 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+import numpy as np
+import stegapy
+from stegapy import SteganograpyException
+from stegapy import keyed
+from stegapy.keyed import KeyedForwardSteganography, KeyedBackwardSteganography, get_permutation, permutations
+from stegapy.header import read_config_header
+from stegapy.numpy_steganography import NumpyForwardSteganography
+from stegapy.test.test_numpy_steganography import random_image, random_data
+
+
+class TestPermutation(TestCase):
+
+    def setUp(self):
+        permutations.clear()
+
+    def test_permutation(self):
+        order = get_permutation('key', 1000)
+        self.assertListEqual(range(1000), sorted(order))
+        self.assertTrue((order == get_permutation('key', 1000)).all())
+        self.assertFalse((order == get_permutation('other key', 1000)).all())
+        self.assertFalse(order.flags.writeable)
+
+    def test_cached(self):
+        order = get_permutation('key', 500)
+        self.assertIs(order, get_permutation('key', 500))
+        self.assertIsNot(order, get_permutation('key', 501))
+        for pixel_count in xrange(keyed.MAX_PERMUTATIONS + 1):
+            get_permutation('key', pixel_count)
+        self.assertEqual(keyed.MAX_PERMUTATIONS, len(permutations))
+        self.assertIsNot(order, get_permutation('key', 500))
+
+    def test_byte_bound(self):
+        max_bytes = permutations.max_bytes
+        permutations.max_bytes = 4 * 1000
+        try:
+            get_permutation('key', 600)
+            get_permutation('key', 300)
+            self.assertEqual(2, len(permutations))
+            # The two largest orders don't fit together
+            get_permutation('key', 500)
+            self.assertEqual(2, len(permutations))
+            self.assertLessEqual(permutations.size, 4 * 1000)
+            order = get_permutation('key', 2000)
+            self.assertIsNot(order, get_permutation('key', 2000))
+        finally:
+            permutations.max_bytes = max_bytes
+
+    def test_same_order_as_permutation(self):
+        # Images encoded before orders were shuffled in place must still decode
+        for pixel_count in (0, 1, 1000):
+            expected = np.random.RandomState(keyed.get_seed('key')).permutation(pixel_count)
+            self.assertListEqual(list(expected), list(get_permutation('key', pixel_count)))
+
+
+class TestKeyedSteganography(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(2236)
+        self.image = random_image(self.rand, (17, 13))
+
+    def test_round_trip(self):
+        for keyed_class in (KeyedForwardSteganography, KeyedBackwardSteganography):
+            for length_prefixed in (False, True):
+                data = random_data(self.rand, 40)
+                steg = keyed_class([2, 1, 2], 'secret', length_prefixed=length_prefixed)
+                steg.band_pixels = 16
+                encoded = steg.encode(data, self.image)
+                self.assertEqual(data, steg.decode(encoded))
+                self.assertEqual(data, ''.join(steg.decode_iter(encoded)))
+                if not length_prefixed:
+                    self.assertNotEqual(data, keyed_class([2, 1, 2], 'guess').decode(encoded)[:len(data)])
+
+    def test_scattered(self):
+        data = random_data(self.rand, 20)
+        encoded = KeyedForwardSteganography([1, 1, 1], 'secret').encode(data, self.image)
+        changed = (np.frombuffer(encoded.tobytes(), np.uint8) != np.frombuffer(self.image.tobytes(), np.uint8))
+        changed_pixels = np.flatnonzero(changed.reshape(-1, 3).any(axis=1))
+        # The raster encoding fills only the first 64 pixels
+        self.assertGreater(changed_pixels.max(), 2 * 64)
+        self.assertEqual(NumpyForwardSteganography([1, 1, 1]).encode(data, self.image).tobytes()[64 * 3:],
+                         self.image.tobytes()[64 * 3:])
+
+    def test_public_api(self):
+        data = random_data(self.rand, 60)
+        encoded, color_bits = stegapy.encode(self.image, data, key='secret', config_header=True)
+        self.assertTrue(read_config_header(encoded).keyed)
+        self.assertEqual(data, stegapy.decode(encoded, config_header=True, key='secret'))
+        self.assertRaises(SteganograpyException, stegapy.decode, encoded, config_header=True)
+        image_bytes = stegapy.encode_to_bytes(self.image, data, [1, 2, 1], forward=False, key=u'cl\xe9')[0]
+        fileobj = StringIO()
+        stegapy.decode_to_file(StringIO(image_bytes), fileobj, [1, 2, 1], forward=False, key=u'cl\xe9')
+        self.assertEqual(data, fileobj.getvalue())
+
+    def test_unsupported(self):
+        steg = KeyedForwardSteganography([1, 1, 1], 'secret')
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO('abc'), self.image)
@@ -0,0 +1,102 @@
+from unittest import TestCase
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+import stegapy
+from stegapy import numpy_steganography
+from stegapy.mapped import MappedImage, open_mapped_image
+from stegapy.scanline import UnsupportedImage
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from PIL import Image
+
+
+class TestMappedImage(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(5150)
+        self.directory = tempfile.mkdtemp()
+        # An odd width so BMP rows are padded
+        self.image = random_image(self.rand, (13, 11))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self, name, image=None):
+        path = os.path.join(self.directory, name)
+        image = image or self.image
+        if name.endswith('.npy'):
+            np.save(path, np.asarray(image))
+        else:
+            image.save(path)
+        return path
+
+    def test_formats(self):
+        for name in ('a.bmp', 'a.ppm', 'a.npy'):
+            with MappedImage(self.save(name)) as mapped:
+                self.assertEqual(self.image.size, mapped.size)
+                self.assertEqual(self.image.tobytes(), mapped.to_image().tobytes())
+                self.assertEqual(self.image.crop((0, 3, 13, 7)).tobytes(), mapped.crop((0, 3, 13, 7)).tobytes())
+
+    def test_grayscale(self):
+        image = self.image.convert('L')
+        for name in ('a.pgm', 'a.npy'):
+            with MappedImage(self.save(name, image)) as mapped:
+                self.assertEqual('L', mapped.mode)
+                self.assertEqual(image.tobytes(), mapped.to_image().tobytes())
+
+    def test_unsupported(self):
+        path = self.save('a.png')
+        self.assertEqual(path, open_mapped_image(path))
+
+    def test_truncated_header(self):
+        path = self.save('a.bmp')
+        with open(path, 'rb') as fp:
+            header = fp.read(34)
+        for length in (2, 18, 30, 33):
+            with open(path, 'wb') as fp:
+                fp.write(header[:length])
+            self.assertRaises(UnsupportedImage, MappedImage, path)
+            self.assertEqual(path, open_mapped_image(path))
+
+    def test_encode_in_place(self):
+        data = random_data(self.rand, 40)
+        expected = stegapy.encode(self.image, data, [2, 1, 2])[0]
+        for name in ('a.bmp', 'a.ppm', 'a.npy'):
+            path = self.save(name)
+            mapped, color_bits = stegapy.encode_in_place(path, data, [2, 1, 2])
+            mapped.close()
+            with MappedImage(path) as encoded:
+                self.assertEqual(expected.tobytes(), encoded.to_image().tobytes())
+            if not name.endswith('.npy'):
+                self.assertEqual(expected.tobytes(), Image.open(path).tobytes())
+            self.assertEqual(data, stegapy.decode(path, [2, 1, 2]))
+
+    def test_copy_on_write(self):
+        data = random_data(self.rand, 20)
+        path = self.save('a.bmp')
+        with open(path, 'rb') as original:
+            original_bytes = original.read()
+        mapped, color_bits = stegapy.encode_in_place(path, data, copy_on_write=True)
+        self.assertEqual(data, stegapy.decode(mapped, color_bits))
+        mapped.close()
+        with open(path, 'rb') as unchanged:
+            self.assertEqual(original_bytes, unchanged.read())
+
+    def test_bands(self):
+        data = random_data(self.rand, 100)
+        expected = stegapy.encode(self.image, data, [3, 3, 3], forward=False, length_prefixed=True)[0]
+        path = self.save('a.bmp')
+        original = numpy_steganography.ENCODE_BAND_PIXELS
+        numpy_steganography.ENCODE_BAND_PIXELS = 30
+        try:
+            stegapy.encode_in_place(path, data, [3, 3, 3], forward=False, length_prefixed=True)[0].close()
+        finally:
+            numpy_steganography.ENCODE_BAND_PIXELS = original
+        self.assertEqual(expected.tobytes(), Image.open(path).tobytes())
+        self.assertEqual(data, stegapy.decode(path, [3, 3, 3], forward=False, length_prefixed=True))
+
+    def test_too_large(self):
+        path = self.save('a.ppm')
+        self.assertRaises(stegapy.FileTooLargeException, stegapy.encode_in_place, path, 'x' * 100, [1, 1, 1])
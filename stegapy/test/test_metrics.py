@@ -0,0 +1,72 @@
+from unittest import TestCase
+from stegapy import ForwardSteganography
+from stegapy.metrics import Metrics, Progress
+from stegapy.numpy_steganography import NumpyBackwardSteganography
+from PIL import Image
+
+
+class TestProgress(TestCase):
+
+    def test_interval(self):
+        calls = []
+        progress = Progress(lambda done, total: calls.append((done, total)), 10, 4)
+        for done in xrange(1, 11):
+            progress.update(done)
+        self.assertListEqual([(4, 10), (8, 10), (10, 10)], calls)
+
+    def test_metrics_laps(self):
+        metrics = Metrics('encode')
+        metrics.lap('a')
+        metrics.lap('b')
+        metrics.lap('a')
+        self.assertListEqual(['a', 'b'], list(metrics.phases))
+        self.assertGreaterEqual(metrics.finish().seconds, sum(metrics.phases.values()))
+
+
+class TestInstrumentation(TestCase):
+
+    def setUp(self):
+        self.metrics = []
+        self.progress = []
+
+    def instrument(self, steg, interval):
+        steg.metrics_callback = self.metrics.append
+        steg.progress_callback = lambda done, total: self.progress.append((done, total))
+        steg.progress_interval = interval
+        return steg
+
+    def test_simple(self):
+        steg = self.instrument(ForwardSteganography([1, 1, 1], termination_sequence='\xff\xff'), 6)
+        encoded = steg.encode("\xaa" * 2, Image.new('RGB', (4, 4), color="black"))
+        encode_metrics = self.metrics[-1]
+        self.assertEqual('encode', encode_metrics.operation)
+        self.assertListEqual(['frame', 'bits', 'copy', 'embed'], list(encode_metrics.phases))
+        self.assertEqual(32, encode_metrics.bits)
+        self.assertEqual(16, encode_metrics.pixels)
+        self.assertEqual(32 + 48, encode_metrics.bytes_allocated)
+        self.assertListEqual([(6, 16), (12, 16), (16, 16)], self.progress)
+
+        del self.progress[:]
+        self.assertEqual("\xaa" * 2, steg.decode(encoded))
+        decode_metrics = self.metrics[-1]
+        self.assertEqual('decode', decode_metrics.operation)
+        self.assertEqual(32, decode_metrics.bits)
+        # The termination sequence ends in the 11th pixel
+        self.assertEqual(11, decode_metrics.pixels)
+        self.assertListEqual([(6, 16)], self.progress)
+
+    def test_numpy(self):
+        steg = self.instrument(NumpyBackwardSteganography([1, 1, 1], length_prefixed=True), 8)
+        steg.band_pixels = 4
+        encoded = steg.encode("\xaa" * 2, Image.new('RGB', (4, 8), color="black"))
+        self.assertListEqual(['frame', 'pixels', 'bits', 'embed', 'copy'], list(self.metrics[-1].phases))
+        self.assertEqual(48, self.metrics[-1].bits)
+        self.assertEqual(16, self.metrics[-1].pixels)
+
+        del self.progress[:]
+        self.assertEqual("\xaa" * 2, steg.decode(encoded))
+        decode_metrics = self.metrics[-1]
+        self.assertIn('extract', decode_metrics.phases)
+        # The 11 pixels holding the header, then the 16 pixels holding the header and data
+        self.assertEqual(27, decode_metrics.pixels)
+        self.assertEqual((16, 32), self.progress[-1])
@@ -0,0 +1,94 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+import numpy as np
+import stegapy
+from stegapy import ForwardSteganography, BackwardSteganography, SteganograpyException, FileTooLargeException
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.parallel import ParallelForwardSteganography
+from stegapy import parallel
+from stegapy.test.test_numpy_steganography import random_data
+from PIL import Image
+
+
+def random_mode_image(rand, mode, size):
+    if mode in ('I;16', 'I'):
+        values = np.array([rand.randint(0, 0xffff) for _ in xrange(size[0] * size[1])], dtype='<u2')
+        image = Image.frombytes('I;16', size, values.tobytes())
+        # A 16 bit PNG opens in mode I
+        return image.convert('I') if mode == 'I' else image
+    channels = len(Image.new(mode, (1, 1)).getbands())
+    return Image.frombytes(mode, size, ''.join(chr(rand.randint(0, 255)) for _ in xrange(size[0] * size[1] * channels)))
+
+
+class TestModes(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1661)
+
+    def test_classes_agree(self):
+        for mode, color_bits in (('L', [3]), ('LA', [2, 1]), ('RGBA', [1, 2, 0, 3]), ('I;16', [11]), ('I', [9])):
+            image = random_mode_image(self.rand, mode, (12, 9))
+            for reference_class, numpy_class in ((ForwardSteganography, NumpyForwardSteganography),
+                                                 (BackwardSteganography, NumpyBackwardSteganography)):
+                for length_prefixed in (False, True):
+                    data = random_data(self.rand, 12)
+                    reference = reference_class(color_bits, length_prefixed=length_prefixed)
+                    steg = numpy_class(color_bits, length_prefixed=length_prefixed)
+                    encoded = steg.encode(data, image)
+                    self.assertEqual(mode, encoded.mode)
+                    self.assertEqual(reference.encode(data, image).tobytes(), encoded.tobytes())
+                    self.assertEqual(data, steg.decode(encoded))
+                    self.assertEqual(data, reference.decode(encoded))
+
+    def test_high_bits_kept(self):
+        image = random_mode_image(self.rand, 'I;16', (10, 10))
+        encoded = NumpyForwardSteganography([12]).encode(random_data(self.rand, 100), image)
+        original = np.frombuffer(image.tobytes(), dtype='<u2')
+        self.assertTrue((np.frombuffer(encoded.tobytes(), dtype='<u2') >> 12 == original >> 12).all())
+
+    def test_parallel(self):
+        min_worker_pixels = parallel.MIN_WORKER_PIXELS
+        parallel.MIN_WORKER_PIXELS = 1
+        try:
+            image = random_mode_image(self.rand, 'I;16', (20, 20))
+            data = random_data(self.rand, 300)
+            steg = ParallelForwardSteganography([7], workers=2)
+            steg.band_pixels = 16
+            encoded = steg.encode(data, image)
+            self.assertEqual(NumpyForwardSteganography([7]).encode(data, image).tobytes(), encoded.tobytes())
+            self.assertEqual(data, steg.decode(encoded))
+        finally:
+            parallel.MIN_WORKER_PIXELS = min_worker_pixels
+
+    def test_recommended_encoding(self):
+        data = random_data(self.rand, 500)
+        for mode, channels, depth in (('L', 1, 8), ('RGBA', 4, 8), ('I', 1, 16)):
+            image = random_mode_image(self.rand, mode, (30, 30))
+            encoded, color_bits = stegapy.encode(image, data)
+            self.assertEqual(channels, len(color_bits))
+            self.assertLessEqual(max(color_bits), depth)
+            self.assertEqual(data, stegapy.decode(encoded, color_bits))
+        self.assertRaises(FileTooLargeException, stegapy.encode, random_mode_image(self.rand, 'L', (30, 30)),
+                          random_data(self.rand, 1000))
+        self.assertEqual(stegapy.encode(random_mode_image(self.rand, 'I', (30, 30)), random_data(self.rand, 1000))[1],
+                         [9])
+
+    def test_16_bit_png(self):
+        image = random_mode_image(self.rand, 'I', (40, 30))
+        data = random_data(self.rand, 1500)
+        image_bytes, color_bits = stegapy.encode_to_bytes(image, data, config_header=True)
+        self.assertGreater(max(color_bits), 8)
+        self.assertEqual(data, stegapy.decode(StringIO(image_bytes), config_header=True))
+
+    def test_default_decode_bits(self):
+        image = random_mode_image(self.rand, 'LA', (10, 10))
+        encoded = stegapy.encode(image, 'grey', [1, 1])[0]
+        self.assertEqual('grey', stegapy.decode(encoded))
+
+    def test_errors(self):
+        image = random_mode_image(self.rand, 'L', (10, 10))
+        for encoder_class in (ForwardSteganography, NumpyForwardSteganography):
+            self.assertRaises(SteganograpyException, encoder_class([1, 1, 1]).encode, 'abc', image)
+            self.assertRaises(SteganograpyException, encoder_class([9]).encode, 'abc', image)
+            self.assertRaises(SteganograpyException, encoder_class([1]).encode, 'abc', Image.new('F', (10, 10)))
@@ -0,0 +1,220 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+from stegapy import ForwardSteganography, BackwardSteganography, FileTooLargeException, SteganograpyException
+from stegapy import numpy_steganography
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from PIL import Image
+
+
+def random_image(rand, size):
+    return Image.frombytes('RGB', size, ''.join(chr(rand.randint(0, 255)) for _ in xrange(size[0] * size[1] * 3)))
+
+
+def random_data(rand, length):
+    return ''.join(chr(rand.randint(0, 255)) for _ in xrange(length))
+
+
+class TestNumpyEncode(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1234)
+
+    def assertSameEncoding(self, reference_class, numpy_class, color_bits, data, image):
+        expected = reference_class(color_bits).encode(data, image)
+        actual = numpy_class(color_bits).encode(data, image)
+        self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_matches_forward(self):
+        image = random_image(self.rand, (9, 7))
+        for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0], [0, 0, 5], [8, 3, 1]):
+            for length in (0, 1, 3, 10):
+                data = random_data(self.rand, length)
+                self.assertSameEncoding(ForwardSteganography, NumpyForwardSteganography, color_bits, data, image)
+
+    def test_matches_backward(self):
+        image = random_image(self.rand, (9, 7))
+        for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0], [0, 0, 5], [8, 3, 1]):
+            for length in (0, 1, 3, 10):
+                data = random_data(self.rand, length)
+                self.assertSameEncoding(BackwardSteganography, NumpyBackwardSteganography, color_bits, data, image)
+
+    def test_round_trip(self):
+        image = random_image(self.rand, (16, 16))
+        data = random_data(self.rand, 200)
+        steg = NumpyBackwardSteganography([3, 2, 2])
+        self.assertEqual(data, steg.decode(steg.encode(data, image)))
+
+    def test_original_unchanged(self):
+        image = Image.new('RGB', (4, 4), color="black")
+        NumpyForwardSteganography([1, 1, 1]).encode("\xff", image)
+        self.assertEqual("\x00" * 48, image.tobytes())
+
+    def test_encode_too_large(self):
+        self.assertRaises(FileTooLargeException, NumpyForwardSteganography([1, 1, 1]).encode,
+                          "\xaa" * 3, Image.new('RGB', (4, 4), color="black"))
+
+
+class TestNumpyDecode(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(4321)
+
+    def assertSameDecoding(self, reference_class, numpy_class, color_bits, image, band_pixels):
+        numpy_steg = numpy_class(color_bits)
+        numpy_steg.band_pixels = band_pixels
+        self.assertEqual(reference_class(color_bits).decode(image), numpy_steg.decode(image))
+
+    def test_matches_encoded(self):
+        image = random_image(self.rand, (9, 7))
+        for reference_class, numpy_class in ((ForwardSteganography, NumpyForwardSteganography),
+                                             (BackwardSteganography, NumpyBackwardSteganography)):
+            for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0], [0, 0, 5]):
+                encoded = reference_class(color_bits).encode(random_data(self.rand, 7), image)
+                # Band sizes smaller than, across and larger than the data
+                for band_pixels in (1, 9, 20, 1000):
+                    self.assertSameDecoding(reference_class, numpy_class, color_bits, encoded, band_pixels)
+
+    def test_matches_without_termination(self):
+        image = random_image(self.rand, (9, 7))
+        for reference_class, numpy_class in ((ForwardSteganography, NumpyForwardSteganography),
+                                             (BackwardSteganography, NumpyBackwardSteganography)):
+            for color_bits in ([1, 1, 1], [3, 0, 2]):
+                for band_pixels in (1, 9, 1000):
+                    self.assertSameDecoding(reference_class, numpy_class, color_bits, image, band_pixels)
+
+    def test_termination_across_bands(self):
+        data = "\x55" * 5
+        steg = NumpyForwardSteganography([1, 1, 1], termination_sequence='\xff\xff')
+        encoded = steg.encode(data, Image.new('RGB', (4, 6), color="black"))
+        # One row per band so the termination sequence is split between bands
+        steg.band_pixels = 4
+        self.assertEqual(data, steg.decode(encoded))
+
+
+class TestNumpyLengthPrefixed(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(2468)
+
+    def test_matches_reference(self):
+        image = random_image(self.rand, (9, 7))
+        for reference_class, numpy_class in ((ForwardSteganography, NumpyForwardSteganography),
+                                             (BackwardSteganography, NumpyBackwardSteganography)):
+            for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0]):
+                reference = reference_class(color_bits, length_prefixed=True)
+                steg = numpy_class(color_bits, length_prefixed=True)
+                for length in (0, 1, 15):
+                    data = random_data(self.rand, length)
+                    encoded = steg.encode(data, image)
+                    self.assertEqual(reference.encode(data, image).tobytes(), encoded.tobytes())
+                    for band_pixels in (1, 9, 1000):
+                        steg.band_pixels = band_pixels
+                        self.assertEqual(data, steg.decode(encoded))
+
+    def test_data_containing_termination_sequence(self):
+        data = "\xaa" * 8
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True)
+        self.assertEqual(data, steg.decode(steg.encode(data, Image.new('RGB', (8, 8), color="black"))))
+
+    def test_decode_length_too_large(self):
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True)
+        self.assertRaises(SteganograpyException, steg.decode, Image.new('RGB', (4, 4), color="white"))
+        self.assertRaises(SteganograpyException, steg.decode, Image.new('RGB', (2, 2), color="black"))
+
+
+class TestNumpyEncodeStream(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1357)
+        self.image = random_image(self.rand, (9, 7))
+        # Two rows per band so the data crosses band boundaries mid byte
+        self.band_pixels = numpy_steganography.ENCODE_BAND_PIXELS
+        numpy_steganography.ENCODE_BAND_PIXELS = 18
+
+    def tearDown(self):
+        numpy_steganography.ENCODE_BAND_PIXELS = self.band_pixels
+
+    def test_matches_encode(self):
+        for numpy_class in (NumpyForwardSteganography, NumpyBackwardSteganography):
+            for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0]):
+                for length_prefixed in (False, True):
+                    steg = numpy_class(color_bits, length_prefixed=length_prefixed)
+                    for length in (0, 5, 17):
+                        data = random_data(self.rand, length)
+                        expected = steg.encode(data, self.image).tobytes()
+                        from_file = steg.encode_stream(StringIO(data), self.image, len(data))
+                        self.assertEqual(expected, from_file.tobytes())
+                        from_iter = steg.encode_stream(iter(data), self.image, len(data))
+                        self.assertEqual(expected, from_iter.tobytes())
+
+    def test_unknown_length(self):
+        data = random_data(self.rand, 20)
+        steg = NumpyForwardSteganography([2, 1, 2])
+        self.assertEqual(data, steg.decode(steg.encode_stream(StringIO(data), self.image)))
+
+    def test_too_large(self):
+        steg = NumpyForwardSteganography([1, 1, 1])
+        # 63 pixels hold 23 bytes, 4 of which are the termination sequence
+        steg.encode_stream(StringIO("\xaa" * 19), self.image)
+        self.assertRaises(FileTooLargeException, steg.encode_stream, StringIO("\xaa" * 20), self.image)
+        self.assertRaises(FileTooLargeException, steg.encode_stream, StringIO("\xaa" * 20), self.image, 20)
+
+    def test_length_mismatch(self):
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True)
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO("\xaa" * 5), self.image)
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO("\xaa" * 5), self.image, 4)
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO("\xaa" * 5), self.image, 6)
+
+
+class TestNumpyDecodeIter(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(9753)
+        self.image = random_image(self.rand, (9, 7))
+
+    def test_chunks_join_to_data(self):
+        for numpy_class in (NumpyForwardSteganography, NumpyBackwardSteganography):
+            for length_prefixed in (False, True):
+                steg = numpy_class([2, 1, 2], length_prefixed=length_prefixed)
+                data = random_data(self.rand, 30)
+                encoded = steg.encode(data, self.image)
+                for band_pixels in (1, 4, 9, 1000):
+                    steg.band_pixels = band_pixels
+                    chunks = list(steg.decode_iter(encoded))
+                    self.assertEqual(data, ''.join(chunks))
+                    self.assertNotIn('', chunks)
+
+    def test_chunks_before_end(self):
+        steg = NumpyForwardSteganography([1, 1, 1])
+        steg.band_pixels = 9
+        data = random_data(self.rand, 16)
+        chunks = steg.decode_iter(steg.encode(data, self.image))
+        # Data is yielded as soon as it can't be part of the termination sequence
+        first = next(chunks)
+        self.assertTrue(0 < len(first) < len(data))
+        self.assertEqual(data[:len(first)], first)
+
+    def test_termination_split_across_chunks(self):
+        steg = NumpyForwardSteganography([1, 1, 1], termination_sequence='\xff\xff')
+        steg.band_pixels = 4
+        # Each 4 pixel row holds 1.5 bytes so the termination sequence is split between rows
+        encoded = steg.encode("\x00\xfe\xff\x7f", Image.new('RGB', (4, 6), color="black"))
+        self.assertEqual("\x00\xfe\xff\x7f", ''.join(steg.decode_iter(encoded)))
+
+    def test_without_termination(self):
+        steg = NumpyForwardSteganography([1, 1, 1])
+        for band_pixels in (1, 9, 1000):
+            steg.band_pixels = band_pixels
+            self.assertEqual(ForwardSteganography([1, 1, 1]).decode(self.image), ''.join(steg.decode_iter(self.image)))
+
+    def test_decode_to_file(self):
+        steg = NumpyBackwardSteganography([3, 3, 2], length_prefixed=True)
+        data = random_data(self.rand, 50)
+        out = StringIO()
+        self.assertEqual(len(data), steg.decode_to_file(steg.encode(data, self.image), out))
+        self.assertEqual(data, out.getvalue())
+
+    def test_bad_header_raises_on_call(self):
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True)
+        self.assertRaises(SteganograpyException, steg.decode_iter, Image.new('RGB', (4, 4), color="white"))
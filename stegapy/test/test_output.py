@@ -0,0 +1,60 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+import stegapy
+from stegapy import SteganograpyException
+from stegapy.output import save_image, image_to_bytes, LOSSLESS_FORMATS, FAST_COMPRESS_LEVEL, \
+    BEST_COMPRESS_LEVEL, RLE_STRATEGY
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from stegapy.test.test_modes import random_mode_image
+from PIL import Image
+
+
+class TestOutput(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(8080)
+        self.image = random_image(self.rand, (20, 20))
+        self.data = random_data(self.rand, 50)
+
+    def test_encode_to(self):
+        for image_format in LOSSLESS_FORMATS:
+            fp = StringIO()
+            color_bits = stegapy.encode_to(self.image, self.data, fp, format=image_format)
+            fp.seek(0)
+            self.assertEqual(self.data, stegapy.decode(fp, color_bits))
+
+    def test_encode_to_bytes(self):
+        expected = stegapy.encode(self.image, self.data, [1, 2, 1])[0]
+        for compress_level in (0, FAST_COMPRESS_LEVEL, BEST_COMPRESS_LEVEL):
+            image_bytes, color_bits = stegapy.encode_to_bytes(self.image, self.data, [1, 2, 1],
+                                                              compress_level=compress_level, strategy=RLE_STRATEGY)
+            self.assertEqual(expected.tobytes(), Image.open(StringIO(image_bytes)).tobytes())
+
+    def test_compress_level(self):
+        image = Image.new('RGB', (64, 64), color='white')
+        stored = image_to_bytes(image, compress_level=0)
+        compressed = image_to_bytes(image, compress_level=BEST_COMPRESS_LEVEL, optimize=True)
+        self.assertLess(len(compressed), len(stored))
+
+    def test_lossy_formats(self):
+        for image_format in ('JPEG', 'jpeg', 'GIF', 'WEBP'):
+            self.assertRaises(SteganograpyException, save_image, self.image, StringIO(), image_format)
+        self.assertRaises(SteganograpyException, stegapy.encode_to_bytes, self.image, self.data, format='JPEG')
+
+    def test_modes(self):
+        for image_format, modes in LOSSLESS_FORMATS.items():
+            for mode in modes:
+                image = random_mode_image(self.rand, mode, (9, 7))
+                saved = Image.open(StringIO(image_to_bytes(image, image_format)))
+                self.assertEqual(list(image.getdata()), list(saved.getdata()), (image_format, mode))
+
+    def test_mode_not_stored(self):
+        # BMP and PPM would silently drop the alpha channel and the data in it
+        image = random_mode_image(self.rand, 'RGBA', (20, 20))
+        for image_format in ('BMP', 'PPM', 'ppm'):
+            self.assertRaises(SteganograpyException, save_image, image, StringIO(), image_format)
+            self.assertRaises(SteganograpyException, stegapy.encode_to_bytes, image, self.data, [1, 1, 1, 1],
+                              format=image_format)
+        self.assertRaises(SteganograpyException, save_image, random_mode_image(self.rand, 'I;16', (4, 4)), StringIO(),
+                          'BMP')
@@ -0,0 +1,92 @@
+from unittest import TestCase
+import random
+import numpy as np
+from stegapy import parallel
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.parallel import ParallelForwardSteganography, ParallelBackwardSteganography, split_bands
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from PIL import Image
+
+
+class CountingImage(object):
+    """An image that counts the pixels read from it"""
+
+    def __init__(self, image):
+        self.image = image
+        self.size = image.size
+        self.mode = image.mode
+        self.pixels_read = 0
+
+    def getbands(self):
+        return self.image.getbands()
+
+    def crop(self, box):
+        self.pixels_read += (box[2] - box[0]) * (box[3] - box[1])
+        return self.image.crop(box)
+
+
+class TestSplitBands(TestCase):
+
+    def test_byte_aligned(self):
+        self.assertListEqual([(0, 16), (16, 32), (32, 37)], split_bands(37, 13))
+
+    def test_small(self):
+        self.assertListEqual([(0, 5)], split_bands(5, 1))
+        self.assertListEqual([], split_bands(0, 8))
+
+
+class TestParallelSteganography(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(8642)
+        self.image = random_image(self.rand, (13, 11))
+        # Use the workers even for tiny images
+        self.min_worker_pixels = parallel.MIN_WORKER_PIXELS
+        parallel.MIN_WORKER_PIXELS = 1
+
+    def tearDown(self):
+        parallel.MIN_WORKER_PIXELS = self.min_worker_pixels
+
+    def test_matches_serial(self):
+        for numpy_class, parallel_class in ((NumpyForwardSteganography, ParallelForwardSteganography),
+                                            (NumpyBackwardSteganography, ParallelBackwardSteganography)):
+            for color_bits in ([1, 1, 1], [2, 2, 3], [1, 2, 0]):
+                for length_prefixed in (False, True):
+                    serial = numpy_class(color_bits, length_prefixed=length_prefixed)
+                    steg = parallel_class(color_bits, workers=3, length_prefixed=length_prefixed)
+                    steg.band_pixels = 20
+                    data = random_data(self.rand, 40)
+                    encoded = steg.encode(data, self.image)
+                    self.assertEqual(serial.encode(data, self.image).tobytes(), encoded.tobytes())
+                    self.assertEqual(data, steg.decode(encoded))
+
+    def test_decode_without_termination(self):
+        steg = ParallelForwardSteganography([1, 2, 1], workers=2)
+        steg.band_pixels = 16
+        self.assertEqual(NumpyForwardSteganography([1, 2, 1]).decode(self.image), steg.decode(self.image))
+
+    def test_decode_stops_early(self):
+        image = random_image(self.rand, (120, 100))
+        data = random_data(self.rand, 50)
+        for parallel_class in (ParallelForwardSteganography, ParallelBackwardSteganography):
+            steg = parallel_class([1, 1, 1], workers=2)
+            steg.band_pixels = 64
+            encoded = CountingImage(steg.encode(data, image))
+            self.assertEqual(data, steg.decode(encoded))
+            # The data and termination sequence end in the third window of 128 pixels after the first
+            # 8, and each window is read as the rows it covers
+            self.assertLessEqual(encoded.pixels_read, 8 * 120 + 3 * 3 * 120)
+
+
+class TestParallelThreshold(TestCase):
+
+    def test_small_data_in_large_image(self):
+        size = (1024, 600)
+        pixel_count = size[0] * size[1]
+        self.assertGreater(pixel_count, 2 * parallel.MIN_WORKER_PIXELS)
+        image = Image.frombytes('RGB', size, np.random.RandomState(7).bytes(pixel_count * 3))
+        steg = ParallelForwardSteganography([1, 1, 1], workers=2)
+        encoded = CountingImage(steg.encode('a small payload', image))
+        self.assertEqual('a small payload', steg.decode(encoded))
+        # Only the first band is read, serially
+        self.assertLessEqual(encoded.pixels_read, steg.band_pixels)
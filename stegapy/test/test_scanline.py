@@ -0,0 +1,139 @@
+from unittest import TestCase
+import random
+import struct
+import zlib
+from StringIO import StringIO
+import stegapy
+from stegapy import scanline
+from stegapy.scanline import PngScanlineImage, open_scanline_image
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from PIL import Image
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + \
+        struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def filter_scanline(filter_type, row, prior, bpp):
+    out = bytearray()
+    for i in xrange(len(row)):
+        a = row[i - bpp] if i >= bpp else 0
+        b = prior[i]
+        c = prior[i - bpp] if i >= bpp else 0
+        predictor = [0, a, b, (a + b) >> 1, paeth(a, b, c)][filter_type]
+        out.append((row[i] - predictor) & 0xff)
+    return out
+
+
+def make_png(image, filter_types, idat_size=7):
+    """
+    Write a PNG of an image by hand, filtering its rows with the given filter types in turn and
+    splitting the image data into small IDAT chunks
+    """
+    color_type = {'L': 0, 'LA': 4, 'RGB': 2, 'RGBA': 6}[image.mode]
+    bpp = len(image.mode)
+    width, height = image.size
+    stride = width * bpp
+    pixels = bytearray(image.tobytes())
+    raw = bytearray()
+    prior = bytearray(stride)
+    for y in xrange(height):
+        row = pixels[y * stride:(y + 1) * stride]
+        filter_type = filter_types[y % len(filter_types)]
+        raw.append(filter_type)
+        raw.extend(filter_scanline(filter_type, row, prior, bpp))
+        prior = row
+    data = zlib.compress(str(raw))
+    chunks = [png_chunk('IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+              png_chunk('tEXt', 'Comment\x00made by hand')]
+    chunks += [png_chunk('IDAT', data[i:i + idat_size]) for i in xrange(0, len(data), idat_size)]
+    chunks.append(png_chunk('IEND', ''))
+    return scanline.PNG_SIGNATURE + ''.join(chunks)
+
+
+class TestPngScanlineImage(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(4321)
+
+    def test_filters(self):
+        image = random_image(self.rand, (11, 10))
+        for filter_types in ([0], [1], [2], [3], [4], [4, 3, 2, 1, 0]):
+            png = make_png(image, filter_types)
+            self.assertEqual(image.tobytes(), Image.open(StringIO(png)).tobytes())
+            reader = PngScanlineImage(StringIO(png))
+            self.assertEqual(image.tobytes(), reader.crop((0, 0, 11, 10)).tobytes())
+
+    def test_modes(self):
+        for mode in ('L', 'LA', 'RGB', 'RGBA'):
+            image = random_image(self.rand, (6, 5)).convert(mode)
+            reader = PngScanlineImage(StringIO(make_png(image, [4, 1])))
+            self.assertEqual(mode, reader.mode)
+            self.assertEqual(image.getbands(), reader.getbands())
+            self.assertEqual(image.tobytes(), reader.crop((0, 0, 6, 5)).tobytes())
+
+    def test_bands(self):
+        image = random_image(self.rand, (8, 9))
+        reader = PngScanlineImage(StringIO(make_png(image, [3, 4])))
+        for top, bottom in ((0, 2), (2, 5), (7, 9), (1, 4), (0, 9)):
+            self.assertEqual(image.crop((0, top, 8, bottom)).tobytes(), reader.crop((0, top, 8, bottom)).tobytes())
+
+    def test_reads_only_needed_rows(self):
+        image = random_image(self.rand, (16, 40))
+        data = random_data(self.rand, 10)
+        encoded = stegapy.encode(image, data, [1, 1, 1])[0]
+        fp = StringIO()
+        encoded.save(fp, 'PNG')
+        fp.seek(0)
+        reader = open_scanline_image(fp)
+        self.assertIsInstance(reader, PngScanlineImage)
+        decoder = stegapy.get_decoder([1, 1, 1])
+        decoder.band_pixels = 64
+        self.assertEqual(data, decoder.decode(reader))
+        self.assertLess(reader.next_row, 40)
+        self.assertIsNone(reader.image)
+
+    def test_length_prefixed(self):
+        image = random_image(self.rand, (16, 40))
+        data = random_data(self.rand, 30)
+        encoded = stegapy.encode(image, data, [2, 1, 1], length_prefixed=True)[0]
+        fp = StringIO()
+        encoded.save(fp, 'PNG')
+        fp.seek(0)
+        self.assertEqual(data, stegapy.decode(fp, [2, 1, 1], length_prefixed=True))
+
+    def test_falls_back_to_pil(self):
+        image = random_image(self.rand, (10, 10))
+        reader = PngScanlineImage(StringIO(make_png(image, [4])))
+        original = scanline.SCANLINE_MAX_BYTES
+        scanline.SCANLINE_MAX_BYTES = 30 * 5
+        try:
+            self.assertEqual(image.crop((0, 0, 10, 5)).tobytes(), reader.crop((0, 0, 10, 5)).tobytes())
+            self.assertIsNone(reader.image)
+            self.assertEqual(image.crop((0, 4, 10, 8)).tobytes(), reader.crop((0, 4, 10, 8)).tobytes())
+            self.assertIsNotNone(reader.image)
+        finally:
+            scanline.SCANLINE_MAX_BYTES = original
+
+    def test_unsupported(self):
+        image = random_image(self.rand, (5, 5))
+        for mode, image_format in (('RGB', 'BMP'), ('P', 'PNG'), ('1', 'PNG')):
+            fp = StringIO()
+            image.convert(mode).save(fp, image_format)
+            fp.seek(0)
+            opened = open_scanline_image(fp)
+            self.assertIsInstance(opened, Image.Image)
+            self.assertEqual(mode, opened.mode)
+
+    def test_whole_rows_only(self):
+        reader = PngScanlineImage(StringIO(make_png(random_image(self.rand, (5, 5)), [0])))
+        self.assertRaises(stegapy.SteganograpyException, reader.crop, (1, 0, 5, 5))
@@ -0,0 +1,60 @@
+from unittest import TestCase
+import random
+from stegapy import encode_sharded, decode_sharded, FileTooLargeException, SteganograpyException
+from stegapy.sharding import split_payload, get_shard_capacity
+from stegapy.test.test_numpy_steganography import random_image, random_data
+
+
+class TestSplitPayload(TestCase):
+
+    def test_proportional(self):
+        self.assertListEqual(['ab', 'cdef', ''], split_payload('abcdef', [10, 20, 0]))
+
+    def test_full(self):
+        self.assertListEqual(['abc', 'd'], split_payload('abcd', [3, 1]))
+
+    def test_too_large(self):
+        self.assertRaises(FileTooLargeException, split_payload, 'abcde', [3, 1])
+
+
+class TestSharding(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1122)
+        self.images = [random_image(self.rand, size) for size in ((10, 10), (16, 8), (5, 9))]
+
+    def test_round_trip(self):
+        capacity = sum(get_shard_capacity(image, [1, 1, 1]) for image in self.images)
+        data = random_data(self.rand, capacity)
+        for processes in (1, 2):
+            encoded = encode_sharded(self.images, data, processes=processes)
+            self.assertEqual(len(self.images), len(encoded))
+            self.assertEqual(data, decode_sharded(encoded, processes=processes))
+
+    def test_out_of_order(self):
+        data = random_data(self.rand, 50)
+        encoded = encode_sharded(self.images, data, [2, 1, 1], forward=False, processes=1)
+        self.assertEqual(data, decode_sharded(encoded[::-1], [2, 1, 1], forward=False, processes=1))
+
+    def test_too_large(self):
+        capacity = sum(get_shard_capacity(image, [1, 1, 1]) for image in self.images)
+        self.assertRaises(FileTooLargeException, encode_sharded, self.images, random_data(self.rand, capacity + 1),
+                          processes=1)
+
+    def test_missing_shard(self):
+        encoded = encode_sharded(self.images, random_data(self.rand, 50), processes=1)
+        self.assertRaises(SteganograpyException, decode_sharded, encoded[1:], processes=1)
+
+    def test_mixed_payloads(self):
+        first = encode_sharded(self.images[:2], random_data(self.rand, 30), processes=1)
+        second = encode_sharded(self.images[:2], random_data(self.rand, 30), processes=1)
+        self.assertRaises(SteganograpyException, decode_sharded, [first[0], second[1]], processes=1)
+
+    def test_mixed_modes(self):
+        # Each image defaults to 1 bit of each of its own channels
+        images = [self.images[0], self.images[1].convert('L'), self.images[2].convert('RGBA')]
+        capacity = sum(get_shard_capacity(image, [1] * len(image.getbands())) for image in images)
+        data = random_data(self.rand, capacity)
+        encoded = encode_sharded(images, data, processes=1)
+        self.assertEqual(['RGB', 'L', 'RGBA'], [image.mode for image in encoded])
+        self.assertEqual(data, decode_sharded(encoded, processes=1))
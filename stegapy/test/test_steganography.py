@@ -1,6 +1,8 @@
 from unittest import TestCase
 import itertools
-from stegapy import ForwardSteganography, FileTooLargeException, BackwardSteganography, dec_2_bin
+from stegapy import ForwardSteganography, FileTooLargeException, BackwardSteganography, dec_2_bin, \
+    SteganograpyException
+from stegapy.steganography import LRUCache, lookup_tables
 from PIL import Image
 
 
@@ -176,3 +178,86 @@ class TestBackwardSteganography(TestCase):
             out_bits.extend(dec_2_bin(ord(char)))
         expected_bits = ['0', '0', '1'] * 10 + ['0', '1']
         self.assertListEqual(expected_bits, out_bits)
+
+
+class TestLengthPrefixed(TestCase):
+
+    def setUp(self):
+        self.forward = ForwardSteganography(color_bits=[1, 1, 1], length_prefixed=True)
+        self.backward = BackwardSteganography(color_bits=[2, 0, 1], length_prefixed=True)
+
+    def test_encode_header(self):
+        # 4 byte header holding a length of 1 followed by the data byte
+        expected_out = [0] * 31 + [1] + [1, 0] * 4 + [0] * 8
+        out_image = self.forward.encode("\xaa", Image.new('RGB', (4, 4), color="black"))
+        for out, expected in zip(itertools.chain(*list(out_image.getdata())), expected_out):
+            self.assertEqual(out & 0x01, expected)
+
+    def test_round_trip_with_termination_sequence(self):
+        message = "ab\xaa\xaa\xaa\xaacd"
+        for steg in (self.forward, self.backward):
+            out_image = steg.encode(message, Image.new('RGB', (8, 8), color="white"))
+            self.assertEqual(message, steg.decode(out_image))
+
+    def test_round_trip_empty(self):
+        for steg in (self.forward, self.backward):
+            out_image = steg.encode("", Image.new('RGB', (4, 4), color="black"))
+            self.assertEqual("", steg.decode(out_image))
+
+    def test_encode_too_large(self):
+        # 16 pixels hold 6 bytes, 4 of which are the header
+        self.forward.encode("\xaa" * 2, Image.new('RGB', (4, 4), color="black"))
+        self.assertRaises(FileTooLargeException, self.forward.encode, "\xaa" * 3,
+                          Image.new('RGB', (4, 4), color="black"))
+
+    def test_decode_length_too_large(self):
+        # A header of all 1 bits describes far more data than fits
+        self.assertRaises(SteganograpyException, self.forward.decode, Image.new('RGB', (4, 4), color="white"))
+
+    def test_decode_image_too_small(self):
+        self.assertRaises(SteganograpyException, self.forward.decode, Image.new('RGB', (2, 2), color="black"))
+
+
+class TestLookupTables(TestCase):
+
+    def test_cache_eviction(self):
+        cache = LRUCache(2)
+        self.assertEqual(1, cache.get('a', lambda: 1))
+        self.assertEqual(2, cache.get('b', lambda: 2))
+        # Using a makes b the least recently used
+        self.assertEqual(1, cache.get('a', lambda: None))
+        self.assertEqual(3, cache.get('c', lambda: 3))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get('a', lambda: None))
+        self.assertIsNone(cache.get('b', lambda: None))
+
+    def test_cache_byte_bound(self):
+        cache = LRUCache(10, 6)
+        cache.get('a', lambda: 'aaa')
+        cache.get('b', lambda: 'bb')
+        cache.get('c', lambda: 'cc')
+        # a was evicted to make room for c
+        self.assertEqual(['b', 'c'], list(cache.items))
+        self.assertEqual(4, cache.size)
+        self.assertEqual('d' * 7, cache.get('d', lambda: 'd' * 7))
+        self.assertEqual(['b', 'c'], list(cache.items))
+        cache.clear()
+        self.assertEqual(0, cache.size)
+
+    def test_tables_cached_per_configuration(self):
+        lookup_tables.clear()
+        forward = ForwardSteganography(color_bits=[1, 2, 0]).get_lookup_tables()
+        self.assertIs(forward, ForwardSteganography(color_bits=[1, 2, 0]).get_lookup_tables())
+        self.assertIsNot(forward, BackwardSteganography(color_bits=[1, 2, 0]).get_lookup_tables())
+        self.assertIsNot(forward, ForwardSteganography(color_bits=[1, 2, 1]).get_lookup_tables())
+
+    def test_tables(self):
+        forward = ForwardSteganography(color_bits=[3, 0, 1]).get_lookup_tables()
+        backward = BackwardSteganography(color_bits=[3, 0, 1]).get_lookup_tables()
+        self.assertEqual(0xf8, forward[0][0])
+        self.assertEqual(0xff, forward[1][0])
+        self.assertEqual(0b110, forward[0][1]['110'])
+        self.assertEqual(0b011, backward[0][1]['110'])
+        self.assertListEqual(['1', '1', '0'], forward[0][2][0b11110110])
+        self.assertListEqual(['0', '1', '1'], backward[0][2][0b11110110])
+        self.assertListEqual([], forward[1][2][0xff])
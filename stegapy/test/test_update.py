@@ -0,0 +1,68 @@
+from unittest import TestCase
+import os
+import random
+import shutil
+import tempfile
+import stegapy
+from stegapy import FileTooLargeException
+from stegapy.keyed import KeyedBackwardSteganography
+from stegapy.mapped import MappedImage
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.test.test_numpy_steganography import random_image, random_data
+
+
+class TestUpdate(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(4669)
+        self.image = random_image(self.rand, (30, 20))
+        self.data = random_data(self.rand, 200)
+
+    def test_round_trip(self):
+        for numpy_class in (NumpyForwardSteganography, NumpyBackwardSteganography):
+            for length_prefixed in (False, True):
+                steg = numpy_class([2, 1, 2], length_prefixed=length_prefixed)
+                encoded = steg.encode(self.data, self.image)
+                for new_data in (self.data[:50] + 'changed' + self.data[57:], self.data[:120], self.data + 'more'):
+                    steg.update(new_data, encoded)
+                    self.assertEqual(new_data, steg.decode(encoded))
+
+    def test_only_changed_pixels(self):
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True)
+        encoded = steg.encode(self.data, self.image)
+        before = encoded.tobytes()
+        self.assertEqual(0, steg.update(self.data, encoded))
+        self.assertEqual(before, encoded.tobytes())
+        # Changing one byte changes at most the 3 or 4 pixels holding it
+        new_data = self.data[:100] + chr(ord(self.data[100]) ^ 0xff) + self.data[101:]
+        written = steg.update(new_data, encoded)
+        self.assertGreater(written, 0)
+        self.assertLessEqual(written, 4)
+        self.assertEqual(steg.encode(new_data, self.image).tobytes(), encoded.tobytes())
+
+    def test_keyed(self):
+        steg = KeyedBackwardSteganography([1, 2, 1], 'secret')
+        encoded = steg.encode(self.data, self.image)
+        new_data = self.data[:10] + 'x' + self.data[11:]
+        self.assertLessEqual(steg.update(new_data, encoded), 3)
+        self.assertEqual(new_data, steg.decode(encoded))
+
+    def test_public_api(self):
+        encoded = stegapy.encode(self.image, self.data, compression='zlib', config_header=True)[0]
+        image, written = stegapy.update(encoded, 'replaced', config_header=True)
+        self.assertIs(encoded, image)
+        self.assertEqual('replaced', stegapy.decode(encoded, config_header=True))
+        self.assertRaises(FileTooLargeException, stegapy.update, encoded, 'a' * 1000, [1, 1, 1])
+
+    def test_mapped(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'a.bmp')
+            self.image.save(path)
+            stegapy.encode_in_place(path, self.data, [2, 2, 1])[0].close()
+            new_data = 'new' + self.data[3:]
+            stegapy.update(path, new_data, [2, 2, 1])[0].close()
+            with MappedImage(path) as mapped:
+                self.assertEqual(new_data, stegapy.decode(mapped, [2, 2, 1]))
+        finally:
+            shutil.rmtree(directory)
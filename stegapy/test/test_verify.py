@@ -0,0 +1,101 @@
+from unittest import TestCase
+import random
+from StringIO import StringIO
+import numpy as np
+import stegapy
+from stegapy import SteganograpyException, ChecksumMismatch, BadLengthHeader, ForwardSteganography
+from stegapy.header import Config
+from stegapy.numpy_steganography import NumpyForwardSteganography, NumpyBackwardSteganography
+from stegapy.steganography import iter_checksummed, iter_verified
+from stegapy.test.test_numpy_steganography import random_image, random_data
+from PIL import Image
+
+
+def flip_bit(image, position):
+    """
+    Get a copy of an image with the lowest bit of one channel flipped
+    """
+    pixels = np.frombuffer(image.tobytes(), dtype=np.uint8).copy()
+    pixels[position] ^= 1
+    return Image.frombytes(image.mode, image.size, pixels.tobytes())
+
+
+class TestChecksum(TestCase):
+
+    def test_chunks(self):
+        data = 'checksummed data'
+        checksummed = ''.join(iter_checksummed(['check', '', 'summed data']))
+        self.assertEqual(len(data) + 4, len(checksummed))
+        self.assertEqual(data, ''.join(iter_verified([checksummed[:3], checksummed[3:18], checksummed[18:]])))
+        self.assertRaises(ChecksumMismatch, list, iter_verified([checksummed[:-1] + 'x']))
+        self.assertRaises(ChecksumMismatch, list, iter_verified(['abc']))
+
+    def test_encoders(self):
+        rand = random.Random(6174)
+        image = random_image(rand, (20, 20))
+        for encoder_class in (ForwardSteganography, NumpyForwardSteganography, NumpyBackwardSteganography):
+            for length_prefixed in (False, True):
+                data = 'checked ' * 10
+                steg = encoder_class([1, 1, 2], length_prefixed=length_prefixed, checksum=True)
+                encoded = steg.encode(data, image)
+                self.assertEqual(data, steg.decode(encoded))
+                self.assertRaises(ChecksumMismatch, steg.decode, flip_bit(encoded, 30))
+
+    def test_stream(self):
+        rand = random.Random(1729)
+        image = random_image(rand, (20, 20))
+        data = random_data(rand, 100)
+        steg = NumpyForwardSteganography([1, 1, 1], length_prefixed=True, checksum=True)
+        self.assertEqual(steg.encode(data, image).tobytes(), steg.encode_stream(StringIO(data), image, 100).tobytes())
+        steg.length_prefixed = False
+        self.assertRaises(SteganograpyException, steg.encode_stream, StringIO(data), image)
+
+
+class TestProbeVerify(TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1089)
+        self.image = random_image(self.rand, (40, 30))
+        self.data = random_data(self.rand, 300)
+
+    def test_probe(self):
+        self.assertIsNone(stegapy.probe(self.image))
+        encoded, color_bits = stegapy.encode(self.image, self.data, length_prefixed=True, config_header=True,
+                                             checksum=True)
+        self.assertEqual(Config(color_bits, True, True, False, False, True), stegapy.probe(encoded))
+        self.assertEqual(Config(color_bits, True, True, False, False, True),
+                         stegapy.probe(StringIO(stegapy.image_to_bytes(encoded))))
+
+    def test_probe_unsupported_modes(self):
+        for mode in ('P', '1', 'F'):
+            image = self.image.convert(mode)
+            self.assertIsNone(stegapy.probe(image), mode)
+        # As for a GIF or palette PNG read from a file
+        fileobj = StringIO()
+        self.image.convert('P').save(fileobj, 'GIF')
+        fileobj.seek(0)
+        self.assertIsNone(stegapy.probe(fileobj))
+
+    def test_verify(self):
+        encoded = stegapy.encode(self.image, self.data, compression='zlib', config_header=True, checksum=True)[0]
+        self.assertTrue(stegapy.verify(encoded, config_header=True))
+        self.assertFalse(stegapy.verify(flip_bit(encoded, 200), config_header=True))
+        self.assertEqual(self.data, stegapy.decode(encoded, config_header=True))
+        self.assertRaises(ChecksumMismatch, stegapy.decode, flip_bit(encoded, 200), config_header=True)
+
+        encoded = stegapy.encode(self.image, self.data, [2, 1, 1], forward=False, checksum=True, key='k')[0]
+        self.assertTrue(stegapy.verify(encoded, [2, 1, 1], forward=False, key='k'))
+        self.assertEqual(self.data, stegapy.decode(encoded, [2, 1, 1], forward=False, key='k', checksum=True))
+
+    def test_damaged_length_header(self):
+        encoded = stegapy.encode(self.image, self.data, [1, 1, 1], length_prefixed=True, checksum=True)[0]
+        self.assertTrue(stegapy.verify(encoded, [1, 1, 1], length_prefixed=True))
+        # The top bits of the length describe more data than the image holds, the low bits less data
+        for position in (3, 28):
+            self.assertFalse(stegapy.verify(flip_bit(encoded, position), [1, 1, 1], length_prefixed=True))
+        self.assertRaises(BadLengthHeader, stegapy.decode, flip_bit(encoded, 3), [1, 1, 1], length_prefixed=True,
+                          checksum=True)
+
+    def test_without_checksum(self):
+        encoded = stegapy.encode(self.image, self.data, config_header=True)[0]
+        self.assertRaises(SteganograpyException, stegapy.verify, encoded, config_header=True)